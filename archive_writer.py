@@ -0,0 +1,119 @@
+"""
+Empaquetado ZIP en streaming de los resultados
+Añade cada salida al archivo ZIP en cuanto se escribe, de modo que el
+empaquetado se solapa con el procesamiento en lugar de ser un paso final
+(`zip -r` sobre el directorio de salida). Las entradas se guardan sin
+recomprimir (ZIP_STORED): JPEG, WebP y AVIF ya están comprimidos.
+"""
+
+import os
+import zipfile
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class ArchiveWriter:
+    """Archivo ZIP que se va completando entrada a entrada"""
+
+    def __init__(self, path: str, compression: int = zipfile.ZIP_STORED):
+        """
+        Args:
+            path: Ruta final del ZIP; mientras se escribe se usa '<path>.partial'
+                  y se renombra al cerrar, así nunca se sirve un ZIP a medias
+            compression: Método de compresión de zipfile (por defecto sin recompresión)
+        """
+        self.path = path
+        self.partial_path = path + '.partial'
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._zip = zipfile.ZipFile(self.partial_path, 'w', compression=compression, allowZip64=True)
+        self._names = set()
+        self._lock = threading.Lock()
+        self.entries = 0
+        self.closed = False
+
+    def add_file(self, source_path: str, arcname: Optional[str] = None) -> bool:
+        """
+        Añade un archivo ya escrito (recién codificado, normalmente aún en la
+        caché de páginas del sistema)
+
+        Returns:
+            True si se añadió, False si ya había una entrada con ese nombre
+        """
+        arcname = arcname or os.path.basename(source_path)
+        with self._lock:
+            if arcname in self._names:
+                logger.warning(f"Entrada duplicada en el ZIP, se omite: {arcname}")
+                return False
+            self._zip.write(source_path, arcname)
+            self._names.add(arcname)
+            self.entries += 1
+        return True
+
+    def add_bytes(self, arcname: str, data: bytes) -> bool:
+        """Añade una entrada a partir de bytes en memoria"""
+        with self._lock:
+            if arcname in self._names:
+                logger.warning(f"Entrada duplicada en el ZIP, se omite: {arcname}")
+                return False
+            self._zip.writestr(arcname, data)
+            self._names.add(arcname)
+            self.entries += 1
+        return True
+
+    def add_result(self, file_result: Dict, buffers: Optional[Dict] = None) -> int:
+        """
+        Añade la salida de un archivo del lote y sus renditions
+
+        Args:
+            file_result: Resultado del archivo ('output_path', 'renditions')
+            buffers: Ruta -> bytes ya codificados; las rutas que no estén
+                     (p. ej. archivos reanudados) se leen de disco
+
+        Returns:
+            Entradas añadidas
+        """
+        buffers = buffers or {}
+        paths = [file_result['output_path']] + [r['path'] for r in file_result.get('renditions', [])]
+        added = 0
+        for path in paths:
+            if not path:
+                continue
+            if path in buffers:
+                added += self.add_bytes(os.path.basename(path), buffers[path])
+            else:
+                added += self.add_file(path)
+        return added
+
+    def close(self) -> Dict:
+        """Cierra el ZIP, lo mueve a su ruta final y devuelve un resumen"""
+        with self._lock:
+            if not self.closed:
+                self._zip.close()
+                os.replace(self.partial_path, self.path)
+                self.closed = True
+        return {
+            'path': self.path,
+            'entries': self.entries,
+            'size_bytes': os.path.getsize(self.path)
+        }
+
+    def abort(self):
+        """Descarta el ZIP parcial (p. ej. si el trabajo falla)"""
+        with self._lock:
+            if not self.closed:
+                self._zip.close()
+                self.closed = True
+            if os.path.exists(self.partial_path):
+                os.remove(self.partial_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
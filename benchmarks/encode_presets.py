@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark de presets de codificación JPEG
+Mide el tiempo de codificación y el tamaño de salida de cada preset de
+image_encoder con cada backend, frente a cv2.imencode sin parámetros (la
+escritura anterior con cv2.imwrite).
+
+Uso:
+    python benchmarks/encode_presets.py carpeta_muestras --repeat 3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_processor import ImageProcessor
+from image_encoder import ImageEncoder, ENCODER_PRESETS, BACKENDS
+
+def _time_encode(encode, repeat: int):
+    """Mejor tiempo de repeat codificaciones y bytes producidos"""
+    best = None
+    data = b''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = encode()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(data)
+
+def run_benchmark(sample_dir: str, repeat: int, backends) -> dict:
+    processor = ImageProcessor()
+    files = sorted(
+        os.path.join(sample_dir, f) for f in os.listdir(sample_dir)
+        if os.path.splitext(f)[1].lower() in processor.supported_formats
+    )
+
+    variants = {'cv2_default': lambda img: cv2.imencode('.jpg', img)[1].tobytes()}
+    for backend in backends:
+        for preset in ENCODER_PRESETS:
+            encoder = ImageEncoder(preset, backend)
+            variants[f"{backend}_{preset}"] = lambda img, encoder=encoder: encoder.encode(img, '.jpg')
+
+    report = {'files': [], 'summary': {}}
+    totals = {name: {'seconds': [], 'bytes': [], 'megapixels': []} for name in variants}
+
+    for path in files:
+        frame = processor.load_frame(path)
+        if frame is None:
+            continue
+        megapixels = frame.width * frame.height / 1e6
+        entry = {'file': os.path.basename(path),
+                 'resolution': f"{frame.width}x{frame.height}",
+                 'variants': {}}
+
+        for name, encode in variants.items():
+            seconds, size = _time_encode(lambda: encode(frame.image), repeat)
+            entry['variants'][name] = {'encode_seconds': round(seconds, 4), 'bytes': size}
+            totals[name]['seconds'].append(seconds)
+            totals[name]['bytes'].append(size)
+            totals[name]['megapixels'].append(megapixels)
+
+        report['files'].append(entry)
+
+    baseline = totals['cv2_default']
+    for name, data in totals.items():
+        if not data['seconds']:
+            continue
+        report['summary'][name] = {
+            'mean_encode_seconds': round(float(np.mean(data['seconds'])), 4),
+            'megapixels_per_second': round(float(np.sum(data['megapixels']) / np.sum(data['seconds'])), 2),
+            'total_bytes': int(np.sum(data['bytes'])),
+            'size_vs_cv2_default': round(float(np.sum(data['bytes']) / np.sum(baseline['bytes'])), 3),
+            'time_vs_cv2_default': round(float(np.sum(data['seconds']) / np.sum(baseline['seconds'])), 3)
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo de codificación frente a tamaño por preset')
+    parser.add_argument('sample_dir', help='Directorio con imágenes de muestra')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Codificaciones por variante (se reporta la más rápida)')
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sample_dir, args.repeat, args.backends)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
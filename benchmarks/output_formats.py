@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark de formatos de salida
+Mide la latencia de codificación y el tamaño de WebP y AVIF en cada nivel
+de velocidad frente al JPEG del mismo preset, para elegir formato por
+endpoint. Las imágenes se reducen antes a --max-side (tamaño de catálogo).
+
+Uso:
+    python benchmarks/output_formats.py carpeta_muestras --preset standard --max-side 1600
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_processor import ImageProcessor
+from image_encoder import ImageEncoder, ENCODER_PRESETS, ENCODER_SPEEDS, avif_available
+from image_stats import downscale_to
+from encode_presets import _time_encode
+
+def run_benchmark(sample_dir: str, preset: str, max_side: int, repeat: int) -> dict:
+    processor = ImageProcessor()
+    files = sorted(
+        os.path.join(sample_dir, f) for f in os.listdir(sample_dir)
+        if os.path.splitext(f)[1].lower() in processor.supported_formats
+    )
+
+    variants = {'jpeg': (ImageEncoder(preset), '.jpg')}
+    formats = ['.webp'] + (['.avif'] if avif_available() else [])
+    for ext in formats:
+        for speed in ENCODER_SPEEDS:
+            variants[f"{ext[1:]}_{speed}"] = (ImageEncoder(preset, speed=speed), ext)
+
+    report = {'preset': preset, 'max_side': max_side, 'files': [], 'summary': {}}
+    totals = {name: {'seconds': [], 'bytes': [], 'megapixels': []} for name in variants}
+
+    for path in files:
+        frame = processor.load_frame(path)
+        if frame is None:
+            continue
+        image = downscale_to(frame.image, max_side) if max_side else frame.image
+        megapixels = image.shape[0] * image.shape[1] / 1e6
+        entry = {'file': os.path.basename(path),
+                 'resolution': f"{image.shape[1]}x{image.shape[0]}",
+                 'variants': {}}
+
+        for name, (encoder, ext) in variants.items():
+            seconds, size = _time_encode(lambda: encoder.encode(image, ext), repeat)
+            entry['variants'][name] = {'encode_seconds': round(seconds, 4), 'bytes': size}
+            totals[name]['seconds'].append(seconds)
+            totals[name]['bytes'].append(size)
+            totals[name]['megapixels'].append(megapixels)
+
+        report['files'].append(entry)
+
+    baseline = totals['jpeg']
+    for name, data in totals.items():
+        if not data['seconds']:
+            continue
+        report['summary'][name] = {
+            'mean_encode_seconds': round(float(np.mean(data['seconds'])), 4),
+            'megapixels_per_second': round(float(np.sum(data['megapixels']) / np.sum(data['seconds'])), 2),
+            'total_bytes': int(np.sum(data['bytes'])),
+            'size_vs_jpeg': round(float(np.sum(data['bytes']) / np.sum(baseline['bytes'])), 3),
+            'time_vs_jpeg': round(float(np.sum(data['seconds']) / np.sum(baseline['seconds'])), 3)
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia y tamaño de WebP/AVIF frente a JPEG')
+    parser.add_argument('sample_dir', help='Directorio con imágenes de muestra')
+    parser.add_argument('--preset', choices=list(ENCODER_PRESETS), default='standard',
+                        help='Preset de calidad de los tres formatos')
+    parser.add_argument('--max-side', type=int, default=1600,
+                        help='Reducir antes de codificar (0 = resolución completa)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Codificaciones por variante (se reporta la más rápida)')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sample_dir, args.preset, args.max_side, args.repeat)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
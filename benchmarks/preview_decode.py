@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark de generación de previsualizaciones
+Compara decodificar a resolución completa y reducir después frente a la
+decodificación reducida en el dominio DCT de generate_previews (cv2 y
+Pillow draft), con la misma cadena de correcciones y los mismos tamaños.
+
+Uso:
+    python benchmarks/preview_decode.py carpeta_muestras --sizes 1600 800 320
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_processor import ImageProcessor, DEFAULT_PREVIEW_SIZES
+from image_encoder import ImageEncoder
+from image_stats import downscale_to
+
+def _full_decode_previews(processor: ImageProcessor, path: str, output_dir: str,
+                          sizes, quality: str) -> dict:
+    """Referencia: decodificación completa y cada tamaño reducido desde el original"""
+    img = cv2.imread(path)
+    processed = processor.professional_edit(img, quality)
+    encoder = ImageEncoder(quality)
+    name = os.path.splitext(os.path.basename(path))[0]
+    for max_side in sizes:
+        encoder.write(os.path.join(output_dir, f"{name}_{max_side}.jpg"),
+                      downscale_to(processed, max_side))
+    return {'decoded_size': [img.shape[1], img.shape[0]]}
+
+def run_benchmark(sample_dir: str, sizes, quality: str) -> dict:
+    processor = ImageProcessor()
+    files = sorted(
+        os.path.join(sample_dir, f) for f in os.listdir(sample_dir)
+        if os.path.splitext(f)[1].lower() in ('.jpg', '.jpeg')
+    )
+
+    variants = {
+        'full_decode': lambda path, out: _full_decode_previews(processor, path, out, sizes, quality),
+        'reduced_cv2': lambda path, out: processor.generate_previews(path, out, sizes, quality, decoder='cv2'),
+        'reduced_pillow': lambda path, out: processor.generate_previews(path, out, sizes, quality, decoder='pillow')
+    }
+
+    report = {'files': [], 'summary': {}}
+    totals = {name: [] for name in variants}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for path in files:
+            entry = {'file': os.path.basename(path), 'variants': {}}
+            for name, run in variants.items():
+                start = time.perf_counter()
+                result = run(path, output_dir)
+                elapsed = time.perf_counter() - start
+                totals[name].append(elapsed)
+                entry['variants'][name] = {
+                    'seconds': round(elapsed, 4),
+                    'decoded_size': result['decoded_size'] if result else None
+                }
+            report['files'].append(entry)
+
+    baseline = totals['full_decode']
+    for name, seconds in totals.items():
+        if not seconds:
+            continue
+        report['summary'][name] = {
+            'mean_seconds': round(float(np.mean(seconds)), 4),
+            'speedup_vs_full_decode': round(float(np.sum(baseline) / np.sum(seconds)), 2)
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Previsualizaciones con decodificación reducida')
+    parser.add_argument('sample_dir', help='Directorio con imágenes JPEG de muestra')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_PREVIEW_SIZES))
+    parser.add_argument('--quality', choices=['professional', 'standard', 'fast'], default='fast')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sample_dir, args.sizes, args.quality)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark de estimación de parámetros sobre proxy reducido
+Compara los parámetros de las correcciones adaptativas estimados a
+resolución completa contra los estimados sobre proxies de distintos
+tamaños, y mide la diferencia resultante en la imagen final.
+
+Uso:
+    python benchmarks/proxy_estimation.py carpeta_muestras --proxy-sizes 512 1024 2048
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_processor import ImageProcessor, DEFAULT_CORRECTIONS
+
+def _param_drift(full: dict, proxy: dict) -> dict:
+    """Diferencias entre dos planes de parámetros"""
+    drift = {}
+    for correction, full_params in full.items():
+        proxy_params = proxy.get(correction)
+        if correction == 'whiteBalance':
+            drift[correction] = round(float(np.max(np.abs(
+                np.array(full_params['scale']) - np.array(proxy_params['scale'])
+            ))), 4)
+        else:
+            # Decisiones discretas: coincide o no
+            drift[correction] = 'match' if full_params == proxy_params else 'mismatch'
+    return drift
+
+def run_benchmark(sample_dir: str, proxy_sizes, corrections, quality: str) -> dict:
+    processor = ImageProcessor()
+    files = sorted(
+        os.path.join(sample_dir, f) for f in os.listdir(sample_dir)
+        if os.path.splitext(f)[1].lower() in processor.supported_formats
+    )
+
+    report = {'files': [], 'summary': {}}
+    totals = {size: {'estimate_seconds': [], 'mean_abs_diff': [], 'mismatches': 0}
+              for size in proxy_sizes}
+    full_times = []
+
+    for path in files:
+        frame = processor.load_frame(path)
+        if frame is None:
+            continue
+
+        start = time.perf_counter()
+        full_plan = processor.estimate_parameters(frame, quality, corrections, proxy_size=None)
+        full_times.append(time.perf_counter() - start)
+        reference = processor.professional_edit(frame, quality, corrections, params=full_plan)
+
+        entry = {'file': os.path.basename(path),
+                 'resolution': f"{frame.width}x{frame.height}",
+                 'full_estimate_seconds': round(full_times[-1], 4),
+                 'proxies': {}}
+
+        for size in proxy_sizes:
+            start = time.perf_counter()
+            proxy_plan = processor.estimate_parameters(frame, quality, corrections, proxy_size=size)
+            elapsed = time.perf_counter() - start
+            output = processor.professional_edit(frame, quality, corrections, params=proxy_plan)
+            mad = float(np.mean(np.abs(output.astype(np.int16) - reference.astype(np.int16))))
+            drift = _param_drift(full_plan, proxy_plan)
+
+            entry['proxies'][str(size)] = {
+                'estimate_seconds': round(elapsed, 4),
+                'param_drift': drift,
+                'output_mean_abs_diff': round(mad, 3)
+            }
+            totals[size]['estimate_seconds'].append(elapsed)
+            totals[size]['mean_abs_diff'].append(mad)
+            totals[size]['mismatches'] += sum(1 for v in drift.values() if v == 'mismatch')
+
+        report['files'].append(entry)
+
+    for size, data in totals.items():
+        if not data['estimate_seconds']:
+            continue
+        report['summary'][str(size)] = {
+            'mean_estimate_seconds': round(float(np.mean(data['estimate_seconds'])), 4),
+            'speedup_vs_full': round(float(np.mean(full_times) / np.mean(data['estimate_seconds'])), 2),
+            'mean_output_abs_diff': round(float(np.mean(data['mean_abs_diff'])), 3),
+            'max_output_abs_diff': round(float(np.max(data['mean_abs_diff'])), 3),
+            'decision_mismatches': data['mismatches']
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Deriva de parámetros estimados sobre proxy')
+    parser.add_argument('sample_dir', help='Directorio con imágenes de muestra')
+    parser.add_argument('--proxy-sizes', type=int, nargs='+', default=[512, 1024, 2048])
+    parser.add_argument('--corrections', type=str, default=json.dumps(DEFAULT_CORRECTIONS),
+                        help='Lista de correcciones (JSON)')
+    parser.add_argument('--quality', choices=['professional', 'standard', 'fast'], default='standard')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sample_dir, args.proxy_sizes, json.loads(args.corrections), args.quality)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Tablas de consulta (LUT) para operaciones puntuales de color
+Las correcciones que solo dependen del valor de cada píxel (escalado por
+canal, curvas gamma, saturación) se compilan en LUTs de 256 entradas, se
+componen cuando son consecutivas y se aplican con una sola pasada de
+cv2.LUT sobre datos uint8, sin copias intermedias en float32.
+"""
+
+import cv2
+import numpy as np
+from typing import List, Sequence, Tuple
+
+# Espacios en los que se aplica una LUT
+SPACE_BGR = 'bgr'          # Una tabla por canal B, G, R
+SPACE_HSV_S = 'hsv_s'      # Una tabla para el canal S de HSV
+
+# Operación puntual: (espacio, tabla); en BGR la tabla es (3, 256), en S es (256,)
+PointOp = Tuple[str, np.ndarray]
+
+_LEVELS = np.arange(256, dtype=np.float32)
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+
+def _to_uint8(values: np.ndarray) -> np.ndarray:
+    # Mismo redondeo que las versiones en float32 (recorte y truncamiento)
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+def scale_lut(factor: float) -> np.ndarray:
+    """LUT de un canal que multiplica por un factor"""
+    return _to_uint8(_LEVELS * factor)
+
+def channel_scale_lut(scales: Sequence[float]) -> np.ndarray:
+    """LUT BGR (3, 256) con un factor de escala por canal"""
+    return np.stack([scale_lut(s) for s in scales])
+
+def gamma_lut(gamma: float) -> np.ndarray:
+    """LUT BGR (3, 256) de la curva v' = 255 * (v / 255) ** gamma"""
+    lut = _to_uint8(np.power(_LEVELS / 255.0, gamma) * 255)
+    return np.stack([lut, lut, lut])
+
+def compose(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """LUT equivalente a aplicar first y después second"""
+    if first.ndim == 1:
+        return second[first]
+    return np.stack([second[c][first[c]] for c in range(first.shape[0])])
+
+def fuse(ops: Sequence[PointOp]) -> List[PointOp]:
+    """Compone las operaciones consecutivas que comparten espacio"""
+    fused = []
+    for space, lut in ops:
+        if fused and fused[-1][0] == space:
+            fused[-1] = (space, compose(fused[-1][1], lut))
+        else:
+            fused.append((space, lut))
+    return fused
+
+def apply_lut(img: np.ndarray, space: str, lut: np.ndarray) -> np.ndarray:
+    """Aplica una LUT uint8 en una sola pasada"""
+    if space == SPACE_BGR:
+        return cv2.LUT(img, np.ascontiguousarray(lut.T).reshape(256, 1, 3))
+    if space == SPACE_HSV_S:
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        hsv_lut = np.stack([IDENTITY_LUT, lut, IDENTITY_LUT])
+        hsv = cv2.LUT(hsv, np.ascontiguousarray(hsv_lut.T).reshape(256, 1, 3))
+        return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    raise ValueError(f"Espacio de LUT desconocido: {space}")
+
+def apply_ops(img: np.ndarray, ops: Sequence[PointOp]) -> np.ndarray:
+    """Compone y aplica una secuencia de operaciones puntuales"""
+    for space, lut in fuse(ops):
+        img = apply_lut(img, space, lut)
+    return img
@@ -4,10 +4,16 @@ Maneja conversión de HEIC a JPG con calidad profesional
 """
 
 import os
+import io
 import glob
+import time
+import cv2
+import numpy as np
 from PIL import Image
 import pillow_heif
-from typing import List, Dict, Optional
+from image_encoder import ImageEncoder
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import logging
 
 # Configurar logging
@@ -23,8 +29,11 @@ class HEICConverter:
         self.supported_input_formats = {'.heic', '.heif'}
         self.output_format = 'JPEG'
         self.output_quality = 95
+        # Procesador de imágenes de convert_with_processing (se crea al primer uso)
+        self._image_processor = None
     
-    def convert_single_file(self, input_path: str, output_path: str, quality: int = 95) -> bool:
+    def convert_single_file(self, input_path: str, output_path: str, quality: int = 95,
+                            preset: str = 'standard') -> bool:
         """
         Convierte un archivo HEIC individual a JPG
         
@@ -32,6 +41,8 @@ class HEICConverter:
             input_path: Ruta del archivo HEIC de entrada
             output_path: Ruta del archivo JPG de salida
             quality: Calidad de compresión (1-100)
+            preset: Preset de codificación (ver image_encoder); 'fast' omite
+                    la optimización de Huffman
         
         Returns:
             True si la conversión fue exitosa
@@ -67,7 +78,8 @@ class HEICConverter:
                 img = img.convert('RGB')
             
             # Guardar como JPEG con calidad especificada
-            img.save(output_path, self.output_format, quality=quality, optimize=True)
+            encoder = ImageEncoder(preset, backend='pillow', quality=quality)
+            img.save(output_path, self.output_format, **encoder.pillow_jpeg_options())
             
             logger.info(f"Convertido exitosamente: {os.path.basename(input_path)} -> {os.path.basename(output_path)}")
             return True
@@ -76,7 +88,41 @@ class HEICConverter:
             logger.error(f"Error convirtiendo {input_path}: {e}")
             return False
     
-    def convert_batch(self, input_dir: str, output_dir: str, quality: int = 95) -> Dict:
+    def decode_to_array(self, input_path: str, data: Optional[bytes] = None) -> Optional[np.ndarray]:
+        """
+        Decodifica un archivo HEIC directamente a un array BGR uint8
+        
+        Evita el JPEG intermedio (codificación con pérdida, escritura en disco
+        y segunda decodificación): el resultado entra tal cual en el pipeline
+        de OpenCV.
+        
+        Args:
+            input_path: Ruta del archivo HEIC
+            data: Contenido del archivo si ya se leyó (evita volver a leer el disco)
+        
+        Returns:
+            Array BGR uint8 o None si hay error
+        """
+        try:
+            source = io.BytesIO(data) if data is not None else input_path
+            heif_file = pillow_heif.open_heif(source, convert_hdr_to_8bit=True)
+            pixels = np.asarray(heif_file)
+            
+            if heif_file.has_alpha:
+                # Componer sobre fondo blanco, como en la conversión a JPG
+                rgb = pixels[:, :, :3].astype(np.uint16)
+                alpha = pixels[:, :, 3:4].astype(np.uint16)
+                composed = (rgb * alpha + 255 * (255 - alpha) + 127) // 255
+                return cv2.cvtColor(composed.astype(np.uint8), cv2.COLOR_RGB2BGR)
+            
+            return cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR)
+            
+        except Exception as e:
+            logger.error(f"Error decodificando {input_path}: {e}")
+            return None
+    
+    def convert_batch(self, input_dir: str, output_dir: str, quality: int = 95,
+                      workers: int = 1) -> Dict:
         """
         Convierte todos los archivos HEIC en un directorio
         
@@ -84,6 +130,7 @@ class HEICConverter:
             input_dir: Directorio de entrada
             output_dir: Directorio de salida
             quality: Calidad de compresión (1-100)
+            workers: Procesos en paralelo (1 = secuencial, 0 o None = uno por núcleo)
         
         Returns:
             Diccionario con estadísticas de conversión
@@ -107,29 +154,29 @@ class HEICConverter:
             
             logger.info(f"Encontrados {len(heic_files)} archivos HEIC para convertir")
             
-            # Crear directorio de salida
-            os.makedirs(output_dir, exist_ok=True)
+            start_time = time.perf_counter()
+            input_bytes = 0
             
-            # Convertir cada archivo
-            for input_path in heic_files:
-                # Generar nombre de archivo de salida
-                filename = os.path.splitext(os.path.basename(input_path))[0]
-                output_path = os.path.join(output_dir, f"{filename}.jpg")
-                
-                # Verificar si ya existe
-                if os.path.exists(output_path):
-                    logger.info(f"Saltando {filename}.jpg - ya existe")
+            for result in self.iter_convert_batch(heic_files, output_dir, quality, workers):
+                if result['status'] == 'skipped':
                     stats['skipped'] += 1
                     continue
                 
-                # Convertir archivo
-                if self.convert_single_file(input_path, output_path, quality):
+                input_bytes += result['input_bytes']
+                if result['status'] == 'converted':
                     stats['converted_successfully'] += 1
                 else:
                     stats['failed'] += 1
-                    stats['errors'].append(f"Error convirtiendo: {os.path.basename(input_path)}")
+                    stats['errors'].append(f"Error convirtiendo: {os.path.basename(result['input_path'])}")
             
-            logger.info(f"Conversión completada: {stats['converted_successfully']}/{stats['total_files']} exitosos")
+            stats['throughput'] = self._throughput(
+                stats['converted_successfully'] + stats['failed'], input_bytes,
+                time.perf_counter() - start_time
+            )
+            
+            logger.info(f"Conversión completada: {stats['converted_successfully']}/{stats['total_files']} exitosos "
+                        f"({stats['throughput']['files_per_second']} archivos/s, "
+                        f"{stats['throughput']['mb_per_second']} MB/s)")
             return stats
             
         except Exception as e:
@@ -137,6 +184,125 @@ class HEICConverter:
             stats['errors'].append(str(e))
             return stats
     
+    def iter_convert_batch(self, heic_files: List[str], output_dir: str, quality: int = 95,
+                           workers: int = 1) -> Iterator[Dict]:
+        """
+        Convierte una lista de archivos HEIC y entrega cada resultado al terminar
+        
+        Con workers > 1 los archivos se convierten en un pool de procesos y
+        los resultados llegan en orden de finalización, no de entrada.
+        
+        Args:
+            heic_files: Rutas de los archivos HEIC
+            output_dir: Directorio de salida
+            quality: Calidad de compresión (1-100)
+            workers: Procesos en paralelo (1 = secuencial, 0 o None = uno por núcleo)
+        
+        Yields:
+            Diccionario por archivo ('input_path', 'output_path', 'status':
+            'converted', 'skipped' o 'failed', 'input_bytes', 'seconds');
+            una entrada cuya salida ya reclamó otra del lote (mismo nombre en
+            otro subdirectorio) se salta
+        """
+        # Crear directorio de salida
+        os.makedirs(output_dir, exist_ok=True)
+        
+        tasks = []
+        # Salidas ya asignadas: las conversiones en paralelo no deben escribir el mismo archivo
+        claimed = set()
+        for input_path in heic_files:
+            # Generar nombre de archivo de salida
+            filename = os.path.splitext(os.path.basename(input_path))[0]
+            output_path = os.path.join(output_dir, f"{filename}.jpg")
+            
+            if output_path in claimed:
+                logger.warning(f"Saltando {input_path} - otra entrada del lote ya escribe {filename}.jpg")
+                yield {
+                    'input_path': input_path,
+                    'output_path': output_path,
+                    'status': 'skipped',
+                    'input_bytes': 0,
+                    'seconds': 0.0
+                }
+                continue
+            claimed.add(output_path)
+            
+            # Verificar si ya existe
+            if os.path.exists(output_path):
+                logger.info(f"Saltando {filename}.jpg - ya existe")
+                yield {
+                    'input_path': input_path,
+                    'output_path': output_path,
+                    'status': 'skipped',
+                    'input_bytes': 0,
+                    'seconds': 0.0
+                }
+                continue
+            tasks.append((input_path, output_path, quality))
+        
+        yield from _run_tasks(self._convert_task, _pool_convert_task, tasks, workers)
+    
+    def _convert_task(self, input_path: str, output_path: str, quality: int) -> Dict:
+        """Convierte un archivo y devuelve su resultado con tiempos y tamaño"""
+        start_time = time.perf_counter()
+        converted = self.convert_single_file(input_path, output_path, quality)
+        return {
+            'input_path': input_path,
+            'output_path': output_path,
+            'status': 'converted' if converted else 'failed',
+            'input_bytes': _file_size(input_path),
+            'seconds': round(time.perf_counter() - start_time, 4)
+        }
+    
+    @staticmethod
+    def _throughput(files: int, input_bytes: int, elapsed: float) -> Dict:
+        """Rendimiento de un lote (archivos/s y MB/s de entrada)"""
+        elapsed = max(elapsed, 1e-9)
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'files_per_second': round(files / elapsed, 2),
+            'mb_per_second': round(input_bytes / (1024 * 1024) / elapsed, 2),
+            'input_bytes': input_bytes
+        }
+    
+    def _convert_and_process_task(self, input_path: str, temp_dir: str, final_dir: str,
+                                  quality: int) -> Dict:
+        """Convierte y procesa un archivo (ver convert_with_processing)"""
+        from image_processor import ImageProcessor
+        
+        if self._image_processor is None:
+            self._image_processor = ImageProcessor()
+        
+        result = {
+            'input_path': input_path,
+            'converted': False,
+            'processed': False,
+            'error': None,
+            'input_bytes': _file_size(input_path)
+        }
+        try:
+            # Generar nombres de archivo
+            filename = os.path.splitext(os.path.basename(input_path))[0]
+            temp_path = os.path.join(temp_dir, f"{filename}.jpg")
+            final_path = os.path.join(final_dir, f"{filename}.jpg")
+            
+            # Convertir HEIC a JPG
+            if self.convert_single_file(input_path, temp_path, quality):
+                result['converted'] = True
+                
+                # Procesar imagen convertida
+                if self._image_processor.process_image_file(temp_path, final_path, 'high'):
+                    result['processed'] = True
+                    logger.info(f"Procesado completamente: {filename}")
+                else:
+                    result['error'] = f"Error procesando: {filename}"
+            else:
+                result['error'] = f"Error convirtiendo: {filename}"
+                
+        except Exception as e:
+            result['error'] = f"Error procesando {os.path.basename(input_path)}: {e}"
+        return result
+    
     def find_heic_files(self, root_dir: str) -> List[str]:
         """
         Encuentra todos los archivos HEIC en un directorio recursivamente
@@ -169,7 +335,8 @@ class HEICConverter:
             logger.error(f"Error obteniendo info del archivo {file_path}: {e}")
             return None
     
-    def convert_with_processing(self, input_dir: str, output_dir: str, quality: int = 95) -> Dict:
+    def convert_with_processing(self, input_dir: str, output_dir: str, quality: int = 95,
+                                workers: int = 1) -> Dict:
         """
         Convierte HEIC a JPG y aplica procesamiento de imágenes
         
@@ -177,16 +344,16 @@ class HEICConverter:
             input_dir: Directorio de entrada
             output_dir: Directorio de salida
             quality: Calidad de compresión
+            workers: Procesos en paralelo (1 = secuencial, 0 o None = uno por núcleo)
         
         Returns:
             Estadísticas de conversión y procesamiento
         """
-        from image_processor import ImageProcessor
-        
         stats = {
             'total_files': 0,
             'converted_successfully': 0,
             'processed_successfully': 0,
+            'skipped': 0,
             'failed': 0,
             'errors': []
         }
@@ -206,36 +373,36 @@ class HEICConverter:
             os.makedirs(temp_dir, exist_ok=True)
             os.makedirs(final_dir, exist_ok=True)
             
-            # Inicializar procesador de imágenes
-            processor = ImageProcessor()
-            
             logger.info(f"Procesando {len(heic_files)} archivos HEIC...")
             
+            start_time = time.perf_counter()
+            input_bytes = 0
+            tasks = []
+            # Mismo nombre en distintos subdirectorios: solo el primero, para
+            # que dos procesos no escriban el mismo temporal ni la misma salida
+            claimed = set()
             for input_path in heic_files:
-                try:
-                    # Generar nombres de archivo
-                    filename = os.path.splitext(os.path.basename(input_path))[0]
-                    temp_path = os.path.join(temp_dir, f"{filename}.jpg")
-                    final_path = os.path.join(final_dir, f"{filename}.jpg")
-                    
-                    # Convertir HEIC a JPG
-                    if self.convert_single_file(input_path, temp_path, quality):
-                        stats['converted_successfully'] += 1
-                        
-                        # Procesar imagen convertida
-                        if processor.process_image_file(temp_path, final_path, 'high'):
-                            stats['processed_successfully'] += 1
-                            logger.info(f"Procesado completamente: {filename}")
-                        else:
-                            stats['failed'] += 1
-                            stats['errors'].append(f"Error procesando: {filename}")
-                    else:
-                        stats['failed'] += 1
-                        stats['errors'].append(f"Error convirtiendo: {filename}")
-                        
-                except Exception as e:
+                filename = os.path.splitext(os.path.basename(input_path))[0]
+                if filename in claimed:
+                    logger.warning(f"Saltando {input_path} - otra entrada del lote ya escribe {filename}.jpg")
+                    stats['skipped'] += 1
+                    continue
+                claimed.add(filename)
+                tasks.append((input_path, temp_dir, final_dir, quality))
+            
+            for result in _run_tasks(self._convert_and_process_task, _pool_convert_and_process_task,
+                                     tasks, workers):
+                input_bytes += result['input_bytes']
+                if result['converted']:
+                    stats['converted_successfully'] += 1
+                if result['processed']:
+                    stats['processed_successfully'] += 1
+                else:
                     stats['failed'] += 1
-                    stats['errors'].append(f"Error procesando {os.path.basename(input_path)}: {e}")
+                    stats['errors'].append(result['error'])
+            
+            stats['throughput'] = self._throughput(len(tasks), input_bytes,
+                                                   time.perf_counter() - start_time)
             
             # Limpiar archivos temporales
             try:
@@ -252,16 +419,64 @@ class HEICConverter:
             stats['errors'].append(str(e))
             return stats
 
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _run_tasks(run_local: Callable, run_pooled: Callable, tasks: List[Tuple],
+               workers: Optional[int]) -> Iterator[Dict]:
+    """
+    Ejecuta tareas por archivo, en secuencia o en un pool de procesos
+
+    Los resultados se entregan según terminan, para poder informar del
+    progreso mientras el resto del lote sigue en curso.
+    """
+    if not tasks:
+        return
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+
+    if workers == 1:
+        for task in tasks:
+            yield run_local(*task)
+        return
+
+    logger.info(f"Convirtiendo en paralelo con {workers} procesos")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_converter) as executor:
+        futures = [executor.submit(run_pooled, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+# Conversor por proceso del pool (se crea en el initializer)
+_pool_converter = None
+
+def _init_pool_converter():
+    """Inicializa un proceso del pool: un solo hilo de OpenCV por proceso"""
+    global _pool_converter
+    cv2.setNumThreads(1)
+    _pool_converter = HEICConverter()
+
+def _pool_convert_task(task: Tuple) -> Dict:
+    return _pool_converter._convert_task(*task)
+
+def _pool_convert_and_process_task(task: Tuple) -> Dict:
+    return _pool_converter._convert_and_process_task(*task)
+
 # Funciones de conveniencia
-def convert_heic_to_jpg(input_dir: str, output_dir: str, quality: int = 95) -> Dict:
+def convert_heic_to_jpg(input_dir: str, output_dir: str, quality: int = 95,
+                        workers: int = 1) -> Dict:
     """Función de conveniencia para conversión HEIC a JPG"""
     converter = HEICConverter()
-    return converter.convert_batch(input_dir, output_dir, quality)
+    return converter.convert_batch(input_dir, output_dir, quality, workers)
 
-def convert_and_process_heic(input_dir: str, output_dir: str, quality: int = 95) -> Dict:
+def convert_and_process_heic(input_dir: str, output_dir: str, quality: int = 95,
+                             workers: int = 1) -> Dict:
     """Función de conveniencia para conversión y procesamiento HEIC"""
     converter = HEICConverter()
-    return converter.convert_with_processing(input_dir, output_dir, quality)
+    return converter.convert_with_processing(input_dir, output_dir, quality, workers)
 
 if __name__ == "__main__":
     # Ejemplo de uso
@@ -0,0 +1,191 @@
+"""
+Codificación de imágenes de salida
+Centraliza la escritura de resultados con presets de calidad, submuestreo
+de croma, modo progresivo y optimización de Huffman ligados a los niveles
+de procesamiento ('professional', 'standard', 'fast'), con OpenCV o Pillow
+como backend. WebP y AVIF se codifican siempre con Pillow, con niveles de
+velocidad/esfuerzo explícitos.
+"""
+
+import io
+import os
+import logging
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('cv2', 'pillow')
+
+# Presets JPEG por nivel de procesamiento. optimize=True añade una pasada
+# extra de Huffman (~3-6% menos bytes) con un coste de CPU apreciable, por
+# eso 'fast' la desactiva
+ENCODER_PRESETS = {
+    'professional': {'quality': 95, 'subsampling': '4:4:4', 'progressive': True, 'optimize': True,
+                     'webp_quality': 90, 'avif_quality': 80, 'speed': 'best'},
+    'standard': {'quality': 92, 'subsampling': '4:2:0', 'progressive': False, 'optimize': True,
+                 'webp_quality': 85, 'avif_quality': 70, 'speed': 'balanced'},
+    'fast': {'quality': 85, 'subsampling': '4:2:0', 'progressive': False, 'optimize': False,
+             'webp_quality': 80, 'avif_quality': 60, 'speed': 'fast'}
+}
+
+# Niveles de velocidad/esfuerzo de WebP y AVIF. WebP: 'method' 0-6 (más
+# alto = más lento y más compacto); AVIF: 'speed' 0-10 (más alto = más rápido)
+ENCODER_SPEEDS = {
+    'fast': {'webp_method': 2, 'avif_speed': 9},
+    'balanced': {'webp_method': 4, 'avif_speed': 6},
+    'best': {'webp_method': 6, 'avif_speed': 5}
+}
+
+# Niveles heredados de process_images/process_batch
+PRESET_ALIASES = {'high': 'professional', 'medium': 'standard'}
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+# Formato de salida -> extensión del archivo
+OUTPUT_FORMATS = {
+    'jpg': '.jpg',
+    'jpeg': '.jpg',
+    'png': '.png',
+    'tiff': '.tiff',
+    'bmp': '.bmp',
+    'webp': '.webp',
+    'avif': '.avif'
+}
+
+# Formatos que solo se codifican con Pillow (niveles de velocidad propios)
+PILLOW_ONLY_EXTENSIONS = ('.webp', '.avif')
+
+_CV2_SAMPLING = {
+    '4:4:4': getattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR_444', None),
+    '4:2:2': getattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR_422', None),
+    '4:2:0': getattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR_420', None)
+}
+
+_PILLOW_FORMATS = {'.png': 'PNG', '.tiff': 'TIFF', '.tif': 'TIFF', '.bmp': 'BMP'}
+
+def avif_available() -> bool:
+    """Indica si hay codificador AVIF (Pillow >= 11.2 o el plugin de pillow_heif)"""
+    if features.check('avif'):
+        return True
+    try:
+        # Versiones antiguas de pillow_heif registran AVIF en Pillow
+        from pillow_heif import register_avif_opener
+        register_avif_opener()
+        return 'AVIF' in Image.SAVE
+    except ImportError:
+        return False
+
+def supported_output_formats() -> List[str]:
+    """Formatos de salida disponibles en esta instalación"""
+    formats = [fmt for fmt in OUTPUT_FORMATS if fmt != 'jpeg']
+    if not avif_available():
+        formats.remove('avif')
+    return formats
+
+def resolve_preset(preset: Optional[str]) -> str:
+    """Nombre de preset para un nivel de procesamiento (por defecto 'standard')"""
+    preset = PRESET_ALIASES.get(preset, preset)
+    return preset if preset in ENCODER_PRESETS else 'standard'
+
+class ImageEncoder:
+    """Codifica arrays BGR uint8 según un preset y un backend"""
+
+    def __init__(self, preset: Optional[str] = 'standard', backend: str = 'cv2', **overrides):
+        """
+        Args:
+            preset: Nivel de procesamiento del que se toma el preset
+            backend: 'cv2' o 'pillow'
+            overrides: Ajustes que sustituyen a los del preset (quality,
+                       subsampling, progressive, optimize, webp_quality,
+                       avif_quality, speed); None = del preset
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de codificación no soportado: {backend}")
+        if overrides.get('speed') is not None and overrides['speed'] not in ENCODER_SPEEDS:
+            raise ValueError(f"Nivel de velocidad no soportado: {overrides['speed']}")
+        self.preset = resolve_preset(preset)
+        self.backend = backend
+        self.settings = dict(ENCODER_PRESETS[self.preset])
+        self.settings.update({k: v for k, v in overrides.items() if v is not None})
+
+    def signature(self) -> Dict:
+        """Ajustes que determinan los bytes de salida (p. ej. para claves de caché)"""
+        return {'backend': self.backend, **self.settings}
+
+    def encode(self, img: np.ndarray, ext: str = '.jpg') -> bytes:
+        """
+        Codifica la imagen en memoria
+
+        Args:
+            img: Imagen BGR (o escala de grises) uint8
+            ext: Extensión del formato de salida
+
+        Returns:
+            Bytes del archivo codificado
+        """
+        ext = ext.lower()
+        if self.backend == 'pillow' or ext in PILLOW_ONLY_EXTENSIONS:
+            return self._encode_pillow(img, ext)
+        return self._encode_cv2(img, ext)
+
+    def write(self, path: str, img: np.ndarray) -> bool:
+        """Codifica y escribe la imagen; el formato sale de la extensión de path"""
+        try:
+            data = self.encode(img, os.path.splitext(path)[1])
+            with open(path, 'wb') as f:
+                f.write(data)
+            return True
+        except Exception as e:
+            logger.error(f"No se pudo codificar {path}: {e}")
+            return False
+
+    def _encode_cv2(self, img: np.ndarray, ext: str) -> bytes:
+        params = []
+        if ext in JPEG_EXTENSIONS:
+            params = [cv2.IMWRITE_JPEG_QUALITY, int(self.settings['quality']),
+                      cv2.IMWRITE_JPEG_PROGRESSIVE, int(bool(self.settings['progressive'])),
+                      cv2.IMWRITE_JPEG_OPTIMIZE, int(bool(self.settings['optimize']))]
+            sampling = _CV2_SAMPLING.get(self.settings['subsampling'])
+            if sampling is not None:
+                params += [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, sampling]
+
+        ok, buffer = cv2.imencode(ext, img, params)
+        if not ok:
+            raise ValueError(f"OpenCV no pudo codificar en {ext}")
+        return buffer.tobytes()
+
+    def pillow_jpeg_options(self) -> Dict:
+        """Argumentos de Image.save para JPEG con los ajustes del preset"""
+        return {
+            'quality': int(self.settings['quality']),
+            'subsampling': self.settings['subsampling'],
+            'progressive': bool(self.settings['progressive']),
+            'optimize': bool(self.settings['optimize'])
+        }
+
+    def _encode_pillow(self, img: np.ndarray, ext: str) -> bytes:
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        pil_image = Image.fromarray(img)
+
+        speed = ENCODER_SPEEDS[self.settings['speed']]
+        buffer = io.BytesIO()
+        if ext in JPEG_EXTENSIONS:
+            pil_image.save(buffer, 'JPEG', **self.pillow_jpeg_options())
+        elif ext == '.webp':
+            pil_image.save(buffer, 'WEBP', quality=int(self.settings['webp_quality']),
+                           method=speed['webp_method'])
+        elif ext == '.avif':
+            if not avif_available():
+                raise ValueError("Esta instalación de Pillow no incluye codificador AVIF")
+            pil_image.save(buffer, 'AVIF', quality=int(self.settings['avif_quality']),
+                           speed=speed['avif_speed'])
+        elif ext in _PILLOW_FORMATS:
+            pil_image.save(buffer, _PILLOW_FORMATS[ext])
+        else:
+            raise ValueError(f"Formato de salida no soportado con Pillow: {ext}")
+        return buffer.getvalue()
@@ -7,53 +7,191 @@ import cv2
 import numpy as np
 from skimage import exposure
 import os
-from typing import List, Tuple, Optional
+import math
+import time
+from typing import Callable, Dict, List, Sequence, Tuple, Optional, Union
 import logging
+from PIL import Image, ImageOps
+
+from image_stats import HistogramAnalysis, ImageStats, downscale_to, resize_pyramid
+import color_lut
+from color_lut import PointOp
+from image_encoder import ImageEncoder
+from stage_metrics import StageRecorder
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Correcciones por defecto y orden fijo de aplicación en professional_edit
+DEFAULT_CORRECTIONS = ['whiteBalance', 'exposureCorrection', 'contrastEnhancement', 'noiseReduction']
+CORRECTION_ORDER = [
+    'whiteBalance', 'exposureCorrection', 'contrastEnhancement', 'noiseReduction',
+    'colorGrading', 'saturationControl', 'toneMapping', 'sharpening', 'detailEnhancement'
+]
+
+# Correcciones cuyos parámetros dependen de estadísticas de la imagen
+ADAPTIVE_CORRECTIONS = {'whiteBalance', 'exposureCorrection', 'contrastEnhancement', 'noiseReduction'}
+
+CORRECTION_LOG_MESSAGES = {
+    'whiteBalance': "White balance aplicado",
+    'exposureCorrection': "Corrección de exposición aplicada",
+    'contrastEnhancement': "Mejora de contraste aplicada",
+    'noiseReduction': "Reducción de ruido aplicada",
+    'colorGrading': "Color grading aplicado",
+    'saturationControl': "Control de saturación aplicado",
+    'toneMapping': "Tone mapping aplicado",
+    'sharpening': "Enfoque aplicado",
+    'detailEnhancement': "Mejora de detalles aplicada"
+}
+
+# Lado mayor del proxy usado para estimar parámetros
+DEFAULT_PROXY_SIZE = 1024
+
+# Lados máximos por defecto de las previsualizaciones (galería y miniaturas)
+DEFAULT_PREVIEW_SIZES = (1600, 800, 320)
+
+# Decodificación JPEG reducida en el dominio DCT (1/2, 1/4, 1/8)
+REDUCED_DECODE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2
+}
+
+# Versión del pipeline de correcciones; cambiarla invalida la caché de
+# resultados, por lo que debe incrementarse con cualquier cambio en la salida
+PROCESSOR_VERSION = '3'
+
+class ImageFrame:
+    """
+    Imagen decodificada una sola vez y compartida por todo el pipeline
+
+    El análisis y las correcciones trabajan sobre este objeto en lugar de
+    volver a leer el archivo; los datos derivados (p. ej. escala de grises)
+    se calculan bajo demanda y se reutilizan.
+    """
+    
+    def __init__(self, image: np.ndarray, source_path: Optional[str] = None):
+        self.image = image
+        self.source_path = source_path
+        self._gray = None
+        self._histogram = None
+        self._stats = None
+    
+    @property
+    def height(self) -> int:
+        return self.image.shape[0]
+    
+    @property
+    def width(self) -> int:
+        return self.image.shape[1]
+    
+    @property
+    def gray(self) -> np.ndarray:
+        """Versión en escala de grises de la imagen original (en caché)"""
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+    
+    @property
+    def histogram(self) -> HistogramAnalysis:
+        """Histogramas por canal y 3D compacto de la imagen original (en caché)"""
+        if self._histogram is None:
+            self._histogram = HistogramAnalysis(self.image)
+        return self._histogram
+    
+    @property
+    def stats(self) -> ImageStats:
+        """Estadísticas de decisión de la imagen original, compartidas con el análisis"""
+        if self._stats is None:
+            self._stats = ImageStats(self.image, histogram=self.histogram, gray=self.gray)
+        return self._stats
+
+# Entradas aceptadas por el pipeline: ruta, array BGR o frame ya decodificado
+ImageSource = Union[str, np.ndarray, ImageFrame]
+
 class ImageProcessor:
     """Procesador de imágenes con algoritmos profesionales"""
     
     def __init__(self):
         self.supported_formats = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp'}
     
-    def white_patch_balance(self, img: np.ndarray) -> np.ndarray:
+    def load_frame(self, source: ImageSource) -> Optional[ImageFrame]:
         """
-        Balance de blancos White Patch: iguala el pixel más brillante de cada canal a 255
+        Obtiene un ImageFrame decodificando la imagen una sola vez
+        
+        Args:
+            source: Ruta del archivo, array BGR uint8 o ImageFrame existente
+        
+        Returns:
+            ImageFrame o None si la imagen no se pudo decodificar
         """
-        img_float = img.astype(np.float32)
-        max_vals = np.percentile(img_float.reshape(-1, 3), 99, axis=0)
-        scale = 255.0 / (max_vals + 1e-6)
-        for i in range(3):
-            img_float[:,:,i] *= scale[i]
-        img_float = np.clip(img_float, 0, 255)
-        return img_float.astype(np.uint8)
+        if isinstance(source, ImageFrame):
+            return source
+        if isinstance(source, np.ndarray):
+            return ImageFrame(source)
+        
+        img = cv2.imread(source)
+        if img is None:
+            logger.error(f"No se pudo cargar la imagen: {source}")
+            return None
+        return ImageFrame(img, source)
     
-    def gray_world_balance(self, img: np.ndarray) -> np.ndarray:
+    def load_frame_from_bytes(self, data: bytes, source_path: Optional[str] = None) -> Optional[ImageFrame]:
         """
-        Balance de blancos Gray World: asume que el promedio de la imagen es gris
+        Decodifica un archivo ya leído en memoria (sin volver a leer el disco)
+        
+        Args:
+            data: Contenido del archivo codificado
+            source_path: Ruta original, usada para nombrar la salida
+        
+        Returns:
+            ImageFrame o None si la imagen no se pudo decodificar
+        """
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            logger.error(f"No se pudo decodificar la imagen: {source_path}")
+            return None
+        return ImageFrame(img, source_path)
+    
+    def white_patch_params(self, stats: ImageStats) -> Dict:
+        """Factores de escala por canal del balance White Patch"""
+        scale = 255.0 / (stats.white_patch_max + 1e-6)
+        return {'scale': [float(v) for v in scale]}
+    
+    def white_patch_balance(self, img: np.ndarray, stats: Optional[ImageStats] = None,
+                            params: Optional[Dict] = None) -> np.ndarray:
+        """
+        Balance de blancos White Patch: iguala el pixel más brillante de cada canal a 255
+        
+        El percentil 99 se obtiene del histograma por canal de las estadísticas
+        compartidas en lugar de ordenar todos los píxeles.
         """
-        img_float = img.astype(np.float32)
-        avg = np.mean(img_float, axis=(0,1))
+        if params is None:
+            params = self.white_patch_params(stats or ImageStats(img))
+        return color_lut.apply_ops(img, self.point_ops('whiteBalance', params))
+    
+    def gray_world_params(self, stats: ImageStats) -> Dict:
+        """Factores de escala por canal del balance Gray World"""
+        avg = stats.channel_means
         mean_gray = np.mean(avg)
         scale = mean_gray / (avg + 1e-6)
-        for i in range(3):
-            img_float[:,:,i] *= scale[i]
-        img_float = np.clip(img_float, 0, 255)
-        return img_float.astype(np.uint8)
+        return {'scale': [float(v) for v in scale]}
     
-    def advanced_white_balance(self, img: np.ndarray) -> np.ndarray:
+    def gray_world_balance(self, img: np.ndarray, stats: Optional[ImageStats] = None,
+                           params: Optional[Dict] = None) -> np.ndarray:
         """
-        Balance de blancos avanzado combinando múltiples métodos
+        Balance de blancos Gray World: asume que el promedio de la imagen es gris
         """
-        img_wp = self.white_patch_balance(img)
-        img_gw = self.gray_world_balance(img)
+        if params is None:
+            params = self.gray_world_params(stats or ImageStats(img))
+        lut = color_lut.channel_scale_lut(params['scale'])
+        return color_lut.apply_lut(img, color_lut.SPACE_BGR, lut)
+    
+    def advanced_white_balance_params(self, stats: ImageStats) -> Dict:
+        """Parámetros de ambos métodos y pesos de la mezcla adaptativa"""
         # Mezcla adaptativa basada en la calidad de la imagen
-        img_float = img.astype(np.float32)
-        brightness = np.mean(img_float)
+        brightness = stats.brightness
         
         if brightness < 100:  # Imagen oscura
             weight_gw, weight_wp = 0.8, 0.2
@@ -62,17 +200,29 @@ class ImageProcessor:
         else:  # Imagen normal
             weight_gw, weight_wp = 0.7, 0.3
         
-        return cv2.addWeighted(img_gw, weight_gw, img_wp, weight_wp, 0)
+        return {
+            'white_patch': self.white_patch_params(stats),
+            'gray_world': self.gray_world_params(stats),
+            'weight_gw': weight_gw,
+            'weight_wp': weight_wp
+        }
     
-    def adaptive_clahe(self, img: np.ndarray) -> np.ndarray:
+    def advanced_white_balance(self, img: np.ndarray, stats: Optional[ImageStats] = None,
+                               params: Optional[Dict] = None) -> np.ndarray:
         """
-        CLAHE adaptativo en canal L de LAB con parámetros optimizados
+        Balance de blancos avanzado combinando múltiples métodos
         """
-        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        
+        # Ambos métodos y la mezcla usan las mismas estadísticas de la imagen
+        if params is None:
+            params = self.advanced_white_balance_params(stats or ImageStats(img))
+        img_wp = self.white_patch_balance(img, params=params['white_patch'])
+        img_gw = self.gray_world_balance(img, params=params['gray_world'])
+        return cv2.addWeighted(img_gw, params['weight_gw'], img_wp, params['weight_wp'], 0)
+    
+    def clahe_params(self, stats: ImageStats) -> Dict:
+        """Límite de recorte y rejilla de CLAHE según el contraste de la imagen"""
         # Parámetros adaptativos basados en el contraste de la imagen
-        contrast = np.std(l)
+        contrast = stats.lab_l_std
         if contrast < 30:  # Imagen de bajo contraste
             clip_limit = 2.0
             tile_size = (8, 8)
@@ -82,19 +232,28 @@ class ImageProcessor:
         else:  # Contraste normal
             clip_limit = 1.5
             tile_size = (8, 8)
+        return {'clip_limit': clip_limit, 'tile_size': tile_size}
+    
+    def adaptive_clahe(self, img: np.ndarray, stats: Optional[ImageStats] = None,
+                       params: Optional[Dict] = None) -> np.ndarray:
+        """
+        CLAHE adaptativo en canal L de LAB con parámetros optimizados
+        """
+        if params is None:
+            params = self.clahe_params(stats or ImageStats(img))
+        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+        l, a, b = cv2.split(lab)
         
-        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_size)
+        clahe = cv2.createCLAHE(clipLimit=params['clip_limit'],
+                                tileGridSize=tuple(params['tile_size']))
         l_clahe = clahe.apply(l)
         lab_clahe = cv2.merge((l_clahe, a, b))
         return cv2.cvtColor(lab_clahe, cv2.COLOR_LAB2BGR)
     
-    def adaptive_saturation(self, img: np.ndarray) -> np.ndarray:
-        """
-        Saturación adaptativa en HSV con análisis inteligente
-        """
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.float32)
-        mean_sat = np.mean(hsv[:,:,1])
-        std_sat = np.std(hsv[:,:,1])
+    def saturation_params(self, stats: ImageStats) -> Dict:
+        """Factor de saturación según las estadísticas del canal S"""
+        mean_sat = stats.saturation_mean
+        std_sat = stats.saturation_std
         
         # Ajuste adaptativo basado en estadísticas de saturación
         if mean_sat < 50:  # Imagen desaturada
@@ -105,98 +264,252 @@ class ImageProcessor:
             saturation_factor = 1.1
         else:  # Saturación normal
             saturation_factor = 1.0
-        
-        hsv[:,:,1] *= saturation_factor
-        hsv[:,:,1] = np.clip(hsv[:,:,1], 0, 255)
-        return cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
+        return {'factor': saturation_factor}
     
-    def noise_reduction(self, img: np.ndarray) -> np.ndarray:
+    def adaptive_saturation(self, img: np.ndarray, stats: Optional[ImageStats] = None,
+                            params: Optional[Dict] = None) -> np.ndarray:
         """
-        Reducción de ruido adaptativa
+        Saturación adaptativa en HSV con análisis inteligente
         """
+        if params is None:
+            params = self.saturation_params(stats or ImageStats(img))
+        lut = color_lut.scale_lut(params['factor'])
+        return color_lut.apply_lut(img, color_lut.SPACE_HSV_S, lut)
+    
+    def noise_params(self, stats: ImageStats) -> Dict:
+        """Parámetros del filtro bilateral según el nivel de ruido (d=0: sin filtro)"""
         # Detectar nivel de ruido
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        noise_level = np.std(cv2.Laplacian(gray, cv2.CV_64F))
+        noise_level = stats.laplacian_std
         
         if noise_level > 50:  # Imagen ruidosa
-            return cv2.bilateralFilter(img, 9, 75, 75)
+            return {'d': 9, 'sigma_color': 75, 'sigma_space': 75}
         elif noise_level > 25:  # Ruido moderado
-            return cv2.bilateralFilter(img, 5, 50, 50)
+            return {'d': 5, 'sigma_color': 50, 'sigma_space': 50}
         else:  # Imagen limpia
+            return {'d': 0}
+    
+    def noise_reduction(self, img: np.ndarray, stats: Optional[ImageStats] = None,
+                        params: Optional[Dict] = None) -> np.ndarray:
+        """
+        Reducción de ruido adaptativa
+        """
+        if params is None:
+            params = self.noise_params(stats or ImageStats(img))
+        if not params['d']:
             return img
+        return cv2.bilateralFilter(img, params['d'], params['sigma_color'], params['sigma_space'])
     
-    def professional_edit(self, image_path: str, quality: str = 'standard', 
-                         corrections: List[str] = None) -> Optional[np.ndarray]:
+    def estimate_stage_params(self, correction: str, stats: ImageStats) -> Optional[Dict]:
+        """
+        Parámetros de una corrección adaptativa a partir de estadísticas globales
+        
+        Returns:
+            Parámetros de la etapa o None si la corrección no es adaptativa
+        """
+        if correction == 'whiteBalance':
+            return self.white_patch_params(stats)
+        if correction in ('exposureCorrection', 'contrastEnhancement'):
+            return self.clahe_params(stats)
+        if correction == 'noiseReduction':
+            return self.noise_params(stats)
+        return None
+    
+    def point_ops(self, correction: str, params: Optional[Dict] = None) -> Optional[List[PointOp]]:
+        """
+        Representación como LUTs de una corrección puntual
+        
+        Returns:
+            Lista de operaciones LUT o None si la corrección no es puntual
+            (CLAHE, filtros espaciales)
+        """
+        if correction == 'whiteBalance':
+            return [(color_lut.SPACE_BGR, color_lut.channel_scale_lut(params['scale']))]
+        if correction == 'colorGrading':
+            # Curva gamma seguida de +10% de saturación
+            return [(color_lut.SPACE_BGR, color_lut.gamma_lut(0.8)),
+                    (color_lut.SPACE_HSV_S, color_lut.scale_lut(1.1))]
+        if correction == 'saturationControl':
+            return [(color_lut.SPACE_HSV_S, color_lut.scale_lut(1.05))]
+        if correction == 'toneMapping':
+            return [(color_lut.SPACE_BGR, color_lut.gamma_lut(0.7))]
+        return None
+    
+    def apply_stage(self, correction: str, img: np.ndarray, params: Optional[Dict],
+                    quality: str = 'standard') -> np.ndarray:
+        """Aplica una corrección con parámetros ya estimados"""
+        if correction == 'whiteBalance':
+            return self.white_patch_balance(img, params=params)
+        if correction in ('exposureCorrection', 'contrastEnhancement'):
+            return self.adaptive_clahe(img, params=params)
+        if correction == 'noiseReduction':
+            return self.noise_reduction(img, params=params)
+        if correction == 'colorGrading':
+            return self.color_grading(img)
+        if correction == 'saturationControl':
+            return self.saturation_control(img)
+        if correction == 'toneMapping':
+            return self.tone_mapping(img)
+        if correction == 'sharpening':
+            return self.smart_sharpening(img, quality)
+        if correction == 'detailEnhancement':
+            return self.detail_enhancement(img)
+        raise ValueError(f"Corrección desconocida: {correction}")
+    
+    def estimate_parameters(self, image: ImageSource, quality: str = 'standard',
+                            corrections: List[str] = None,
+                            proxy_size: Optional[int] = DEFAULT_PROXY_SIZE) -> Optional[Dict]:
+        """
+        Estima los parámetros de todas las correcciones adaptativas
+        
+        La cadena de correcciones se ejecuta sobre un proxy reducido (lado
+        mayor = proxy_size) para que cada etapa vea la imagen ya corregida
+        por las anteriores; solo se conservan los parámetros, que después se
+        aplican a la imagen a resolución completa.
+        
+        Args:
+            image: Ruta, array BGR o ImageFrame
+            quality: Nivel de procesamiento
+            corrections: Lista de correcciones a aplicar
+            proxy_size: Lado mayor del proxy (None = resolución completa)
+        
+        Returns:
+            Diccionario corrección -> parámetros, o None si hay error
+        """
+        if corrections is None:
+            corrections = DEFAULT_CORRECTIONS
+        
+        frame = self.load_frame(image)
+        if frame is None:
+            return None
+        
+        proxy = downscale_to(frame.image, proxy_size) if proxy_size else frame.image
+        selected = [c for c in CORRECTION_ORDER if c in corrections]
+        adaptive = [c for c in selected if c in ADAPTIVE_CORRECTIONS]
+        
+        plan = {}
+        for correction in selected:
+            # Después de la última etapa adaptativa ya no hace falta simular
+            if not adaptive:
+                break
+            if correction in ADAPTIVE_CORRECTIONS:
+                if proxy is frame.image:
+                    stats = self._stage_stats(frame, proxy)
+                else:
+                    stats = ImageStats(proxy)
+                plan[correction] = self.estimate_stage_params(correction, stats)
+                adaptive.remove(correction)
+            if adaptive:
+                proxy = self.apply_stage(correction, proxy, plan.get(correction), quality)
+        return plan
+    
+    def _stage_stats(self, frame: ImageFrame, img: np.ndarray,
+                     proxy_size: Optional[int] = None) -> ImageStats:
+        """Estadísticas del estado actual de la imagen dentro del pipeline"""
+        # Mientras la imagen no haya cambiado se reutilizan las del frame,
+        # ya compartidas con el análisis previo
+        if img is frame.image and proxy_size is None:
+            return frame.stats
+        return ImageStats(img, proxy_size=proxy_size)
+    
+    def professional_edit(self, image: ImageSource, quality: str = 'standard', 
+                         corrections: List[str] = None,
+                         stats_proxy_size: Optional[int] = None,
+                         parameter_proxy_size: Optional[int] = None,
+                         params: Optional[Dict] = None,
+                         on_stage: Optional[Callable[[str, float], None]] = None,
+                         recorder: Optional[StageRecorder] = None) -> Optional[np.ndarray]:
         """
         Edición profesional de imagen con correcciones específicas
         
         Args:
-            image_path: Ruta de la imagen
+            image: Ruta de la imagen, array BGR o ImageFrame ya decodificado
             quality: Nivel de procesamiento ('professional', 'standard', 'fast')
             corrections: Lista de correcciones a aplicar
+            stats_proxy_size: Si se indica, las estadísticas de decisión de
+                              cada etapa se calculan sobre un proxy con ese lado mayor
+            parameter_proxy_size: Si se indica, todos los parámetros se estiman
+                                  antes sobre un proxy (ver estimate_parameters)
+            params: Parámetros ya estimados por corrección (tienen prioridad)
+            on_stage: Callback (etapa, segundos) al terminar cada corrección;
+                      las correcciones puntuales se difieren, y la pasada que
+                      aplica sus LUTs compuestas se notifica como 'pointOps'
+            recorder: Registro de tiempo real, CPU y pico de memoria por
+                      corrección (ver stage_metrics); 'pointOps' aparte
             
         Returns:
             Imagen procesada o None si hay error
         """
         if corrections is None:
-            corrections = ['whiteBalance', 'exposureCorrection', 'contrastEnhancement', 'noiseReduction']
+            corrections = DEFAULT_CORRECTIONS
+        if recorder is None:
+            # Solo tiempos, para on_stage
+            recorder = StageRecorder(track_memory=False)
+        
+        def flush(img: np.ndarray, ops: List[PointOp]) -> np.ndarray:
+            with recorder.measure('pointOps') as span:
+                img = color_lut.apply_ops(img, ops)
+            if on_stage:
+                on_stage('pointOps', span.wall_seconds)
+            return img
         
         try:
-            # Cargar imagen
-            img = cv2.imread(image_path)
-            if img is None:
-                logger.error(f"No se pudo cargar la imagen: {image_path}")
+            # Cargar imagen (sin volver a decodificar si ya es un frame/array)
+            frame = self.load_frame(image)
+            if frame is None:
                 return None
             
             logger.info(f"Aplicando correcciones: {corrections}")
             
-            # Aplicar correcciones según la configuración
-            processed_img = img.copy()
-            
-            # Corrección de balance de blancos
-            if 'whiteBalance' in corrections:
-                processed_img = self.white_patch_balance(processed_img)
-                logger.info("White balance aplicado")
-            
-            # Corrección de exposición
-            if 'exposureCorrection' in corrections:
-                processed_img = self.adaptive_clahe(processed_img)
-                logger.info("Corrección de exposición aplicada")
-            
-            # Mejora de contraste
-            if 'contrastEnhancement' in corrections:
-                processed_img = self.adaptive_clahe(processed_img)
-                logger.info("Mejora de contraste aplicada")
-            
-            # Reducción de ruido
-            if 'noiseReduction' in corrections:
-                processed_img = self.noise_reduction(processed_img)
-                logger.info("Reducción de ruido aplicada")
+            if params is None and parameter_proxy_size:
+                params = self.estimate_parameters(frame, quality, corrections, parameter_proxy_size)
             
-            # Color grading
-            if 'colorGrading' in corrections:
-                processed_img = self.color_grading(processed_img)
-                logger.info("Color grading aplicado")
+            # Aplicar correcciones según la configuración; cada etapa devuelve
+            # una imagen nueva, por lo que el frame original no se modifica
+            processed_img = frame.image
             
-            # Control de saturación
-            if 'saturationControl' in corrections:
-                processed_img = self.saturation_control(processed_img)
-                logger.info("Control de saturación aplicado")
+            # Las correcciones puntuales consecutivas se acumulan como LUTs y
+            # se aplican compuestas en una sola pasada
+            pending_ops = []
             
-            # Tone mapping
-            if 'toneMapping' in corrections:
-                processed_img = self.tone_mapping(processed_img)
-                logger.info("Tone mapping aplicado")
-            
-            # Enfoque
-            if 'sharpening' in corrections:
-                processed_img = self.smart_sharpening(processed_img, quality)
-                logger.info("Enfoque aplicado")
+            for correction in CORRECTION_ORDER:
+                if correction not in corrections:
+                    continue
+                
+                # Cada etapa se mide por tramos para no atribuirle las
+                # pasadas LUT de las correcciones puntuales anteriores
+                stage_seconds = 0.0
+                stage_params = None
+                if correction in ADAPTIVE_CORRECTIONS:
+                    if params is not None and correction in params:
+                        stage_params = params[correction]
+                    else:
+                        # Las estadísticas requieren la imagen con las LUTs aplicadas
+                        if pending_ops:
+                            processed_img = flush(processed_img, pending_ops)
+                            pending_ops = []
+                        with recorder.measure(correction) as span:
+                            stats = self._stage_stats(frame, processed_img, stats_proxy_size)
+                            stage_params = self.estimate_stage_params(correction, stats)
+                        stage_seconds += span.wall_seconds
+                
+                with recorder.measure(correction) as span:
+                    ops = self.point_ops(correction, stage_params)
+                stage_seconds += span.wall_seconds
+                if ops is not None:
+                    pending_ops.extend(ops)
+                else:
+                    if pending_ops:
+                        processed_img = flush(processed_img, pending_ops)
+                        pending_ops = []
+                    with recorder.measure(correction) as span:
+                        processed_img = self.apply_stage(correction, processed_img, stage_params, quality)
+                    stage_seconds += span.wall_seconds
+                logger.info(CORRECTION_LOG_MESSAGES[correction])
+                if on_stage:
+                    on_stage(correction, stage_seconds)
             
-            # Mejora de detalles
-            if 'detailEnhancement' in corrections:
-                processed_img = self.detail_enhancement(processed_img)
-                logger.info("Mejora de detalles aplicada")
+            if pending_ops:
+                processed_img = flush(processed_img, pending_ops)
             
             return processed_img
             
@@ -206,31 +519,17 @@ class ImageProcessor:
 
     def color_grading(self, img: np.ndarray) -> np.ndarray:
         """Gradación profesional de colores"""
-        # Ajuste de curvas de color
-        img_float = img.astype(np.float32) / 255.0
-        
-        # Curva S para mejorar contraste
-        img_float = np.power(img_float, 0.8)
-        
-        # Ajuste de saturación
-        hsv = cv2.cvtColor(img_float, cv2.COLOR_BGR2HSV)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.1, 0, 1)
-        img_float = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
-        
-        return np.clip(img_float * 255, 0, 255).astype(np.uint8)
+        # Curva gamma para mejorar contraste y ajuste de saturación, como LUTs
+        return color_lut.apply_ops(img, self.point_ops('colorGrading'))
 
     def saturation_control(self, img: np.ndarray) -> np.ndarray:
         """Control preciso de saturación"""
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).astype(np.float32)
-        hsv[:, :, 1] = np.clip(hsv[:, :, 1] * 1.05, 0, 255)
-        return cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
+        return color_lut.apply_ops(img, self.point_ops('saturationControl'))
 
     def tone_mapping(self, img: np.ndarray) -> np.ndarray:
         """Mapeo de tonos HDR"""
-        # Simular mapeo de tonos HDR
-        img_float = img.astype(np.float32) / 255.0
-        img_float = np.power(img_float, 0.7)
-        return np.clip(img_float * 255, 0, 255).astype(np.uint8)
+        # Simular mapeo de tonos HDR con una curva gamma precalculada
+        return color_lut.apply_ops(img, self.point_ops('toneMapping'))
 
     def smart_sharpening(self, img: np.ndarray, quality: str = 'standard') -> np.ndarray:
         """Enfoque selectivo inteligente"""
@@ -248,12 +547,13 @@ class ImageProcessor:
         # Usar filtro bilateral para preservar bordes
         return cv2.bilateralFilter(img, 9, 75, 75)
     
-    def process_image_file(self, input_path: str, output_path: str, quality: str = 'high') -> bool:
+    def process_image_file(self, input_path: ImageSource, output_path: str, quality: str = 'high') -> bool:
         """
         Procesa un archivo de imagen individual
         
         Args:
-            input_path: Ruta del archivo de entrada
+            input_path: Ruta del archivo de entrada, o imagen ya decodificada
+                        (array BGR o ImageFrame, p. ej. desde HEIC)
             output_path: Ruta del archivo de salida
             quality: Calidad del procesamiento
         
@@ -261,20 +561,20 @@ class ImageProcessor:
             True si el procesamiento fue exitoso
         """
         try:
-            # Leer imagen
-            img = cv2.imread(input_path)
-            if img is None:
-                logger.error(f"No se pudo leer la imagen: {input_path}")
+            # Leer imagen (si no viene ya decodificada)
+            frame = self.load_frame(input_path)
+            if frame is None:
+                logger.error(f"No se pudo leer la imagen: {output_path}")
                 return False
             
             # Procesar imagen
-            processed_img = self.professional_edit(img, quality)
+            processed_img = self.professional_edit(frame, quality)
             
             # Crear directorio de salida si no existe
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            # Guardar imagen procesada
-            success = cv2.imwrite(output_path, processed_img)
+            # Guardar imagen procesada con el preset de codificación del nivel
+            success = ImageEncoder(quality).write(output_path, processed_img)
             if not success:
                 logger.error(f"No se pudo guardar la imagen: {output_path}")
                 return False
@@ -283,7 +583,7 @@ class ImageProcessor:
             return True
             
         except Exception as e:
-            logger.error(f"Error procesando {input_path}: {e}")
+            logger.error(f"Error procesando {output_path}: {e}")
             return False
     
     def process_batch(self, input_dir: str, output_dir: str, quality: str = 'high') -> dict:
@@ -348,6 +648,127 @@ class ImageProcessor:
                     image_paths.append(rel_path)
         return image_paths
     
+    def decode_reduced(self, image_path: str, max_side: int,
+                       decoder: str = 'cv2') -> Tuple[Optional[np.ndarray], int]:
+        """
+        Decodifica a la menor escala DCT (1/2, 1/4, 1/8) que aún cubre max_side
+        
+        El decodificador JPEG omite directamente los coeficientes que no
+        necesita, por lo que es varias veces más rápido y ligero que
+        decodificar a resolución completa y reducir después. En formatos sin
+        decodificación reducida el resultado es equivalente a decodificar y
+        reducir.
+        
+        Args:
+            image_path: Ruta de la imagen
+            max_side: Lado mayor mínimo que debe tener la imagen decodificada
+            decoder: 'cv2' (IMREAD_REDUCED_COLOR_*) o 'pillow' (modo draft)
+        
+        Returns:
+            (imagen BGR o None, factor de reducción aplicado)
+        """
+        try:
+            # Solo se lee la cabecera
+            with Image.open(image_path) as header:
+                longest = max(header.size)
+        except Exception:
+            longest = 0
+        
+        scale = 1
+        for factor in sorted(REDUCED_DECODE_FLAGS, reverse=True):
+            if longest and math.ceil(longest / factor) >= max_side:
+                scale = factor
+                break
+        
+        if decoder == 'pillow':
+            with Image.open(image_path) as pil_image:
+                # draft elige la mayor reducción que no baja del tamaño pedido
+                width, height = pil_image.size
+                pil_image.draft('RGB', (math.ceil(width / scale), math.ceil(height / scale)))
+                pil_image = ImageOps.exif_transpose(pil_image).convert('RGB')
+                img = cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
+        else:
+            img = cv2.imread(image_path, REDUCED_DECODE_FLAGS.get(scale, cv2.IMREAD_COLOR))
+        
+        if img is None:
+            logger.error(f"No se pudo cargar la imagen: {image_path}")
+        return img, scale
+    
+    def generate_previews(self, source: ImageSource, output_dir: str,
+                          sizes: Sequence[int] = DEFAULT_PREVIEW_SIZES,
+                          quality: str = 'fast', corrections: List[str] = None,
+                          decoder: str = 'cv2') -> Optional[Dict]:
+        """
+        Genera previsualizaciones corregidas de varios tamaños en una pasada
+        
+        La imagen se decodifica directamente al tamaño reducido adecuado
+        para la mayor previsualización, la cadena de correcciones se aplica
+        una vez a ese tamaño y el resto de tamaños se obtienen por reducciones
+        sucesivas.
+        
+        Args:
+            source: Ruta de la imagen (decodificación reducida), array BGR o ImageFrame
+            output_dir: Directorio de salida
+            sizes: Lados máximos de las previsualizaciones
+            quality: Nivel de procesamiento (y preset de codificación)
+            corrections: Lista de correcciones a aplicar
+            decoder: 'cv2' o 'pillow' (ver decode_reduced)
+        
+        Returns:
+            Diccionario con las previsualizaciones generadas o None si hay error
+        """
+        start_time = time.perf_counter()
+        sizes = sorted(set(sizes), reverse=True)
+        
+        try:
+            if isinstance(source, str):
+                img, scale = self.decode_reduced(source, sizes[0], decoder)
+                if img is None:
+                    return None
+                source_path = source
+            else:
+                frame = self.load_frame(source)
+                if frame is None:
+                    return None
+                img, scale = frame.image, 1
+                source_path = frame.source_path or 'preview'
+            decoded_size = [img.shape[1], img.shape[0]]
+            
+            # El decodificador reducido deja la imagen a <= 2x del tamaño pedido
+            img = downscale_to(img, sizes[0])
+            processed = self.professional_edit(img, quality, corrections)
+            if processed is None:
+                return None
+            
+            os.makedirs(output_dir, exist_ok=True)
+            name = os.path.splitext(os.path.basename(source_path))[0]
+            encoder = ImageEncoder(quality)
+            
+            previews = []
+            for max_side, level in resize_pyramid(processed, sizes):
+                output_path = os.path.join(output_dir, f"{name}_{max_side}.jpg")
+                if not encoder.write(output_path, level):
+                    return None
+                previews.append({
+                    'max_side': max_side,
+                    'path': output_path,
+                    'width': level.shape[1],
+                    'height': level.shape[0],
+                    'size_bytes': os.path.getsize(output_path)
+                })
+            
+            return {
+                'source': source_path,
+                'decode_scale': scale,
+                'decoded_size': decoded_size,
+                'previews': previews,
+                'seconds': round(time.perf_counter() - start_time, 4)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error generando previsualizaciones: {e}")
+            return None
+    
     def get_image_info(self, image_path: str) -> dict:
         """
         Obtiene información de una imagen
@@ -387,6 +808,13 @@ def process_images(input_dir: str, output_dir: str, quality: str = 'high') -> di
     processor = ImageProcessor()
     return processor.process_batch(input_dir, output_dir, quality)
 
+def generate_previews(input_path: str, output_dir: str,
+                      sizes: Sequence[int] = DEFAULT_PREVIEW_SIZES,
+                      quality: str = 'fast') -> Optional[Dict]:
+    """Función de conveniencia para generar previsualizaciones de una imagen"""
+    processor = ImageProcessor()
+    return processor.generate_previews(input_path, output_dir, sizes, quality)
+
 if __name__ == "__main__":
     # Ejemplo de uso
     processor = ImageProcessor()
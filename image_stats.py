@@ -0,0 +1,277 @@
+"""
+Estadísticas de imagen basadas en histogramas
+Calcula histogramas compactos por canal y un histograma 3D de pocos bins
+para que el análisis y las correcciones reutilicen las mismas estadísticas
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Percentiles reportados en el análisis
+DEFAULT_PERCENTILES = (1, 5, 50, 95, 99)
+
+def histogram_percentile(hist: np.ndarray, q: float) -> float:
+    """
+    Percentil a partir de un histograma de 256 bins
+
+    Igual que np.percentile (interpolación lineal entre rangos) sobre los
+    píxeles originales de 8 bits, sin recorrer ni ordenar la imagen: los
+    valores de los rangos floor(h) y floor(h)+1, con h = (total-1)*q/100,
+    se buscan en el histograma acumulado.
+    """
+    cdf = np.cumsum(hist, dtype=np.float64)
+    total = cdf[-1]
+    if total <= 0:
+        return 0.0
+    h = (total - 1) * (q / 100.0)
+    lower_rank = np.floor(h)
+    upper_rank = min(lower_rank + 1, total - 1)
+    # Valor del rango r (desde 0): primer nivel con más de r píxeles acumulados
+    lower = float(np.searchsorted(cdf, lower_rank + 1, side='left'))
+    upper = float(np.searchsorted(cdf, upper_rank + 1, side='left'))
+    # Misma fórmula de interpolación que np.percentile (exacta en ambos extremos)
+    t = h - lower_rank
+    if t >= 0.5:
+        return upper - (upper - lower) * (1 - t)
+    return lower + (upper - lower) * t
+
+def histogram_entropy(hist: np.ndarray) -> float:
+    """Entropía de Shannon (bits) de un histograma"""
+    total = float(np.sum(hist))
+    if total <= 0:
+        return 0.0
+    p = hist[hist > 0].astype(np.float64) / total
+    return float(-np.sum(p * np.log2(p)))
+
+class HistogramAnalysis:
+    """
+    Histogramas por canal (256 bins) y 3D de baja resolución (p. ej. 16³)
+
+    Sustituye al histograma 3D de 256³ bins (~64MB por imagen): los
+    histogramas se calculan en C con cv2.calcHist sin copias intermedias
+    de la imagen, y todas las estadísticas se derivan de ellos.
+    """
+
+    def __init__(self, image: np.ndarray, coarse_bins: Optional[int] = 16):
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        self.channels = channels
+        self.total_pixels = int(image.shape[0] * image.shape[1])
+        self.channel_hists = np.stack([
+            cv2.calcHist([image], [c], None, [256], [0, 256]).ravel()
+            for c in range(channels)
+        ])
+
+        self.coarse_bins = coarse_bins if channels == 3 else None
+        self.coarse_hist = None
+        if self.coarse_bins:
+            self.coarse_hist = cv2.calcHist(
+                [image], [0, 1, 2], None,
+                [self.coarse_bins] * 3, [0, 256, 0, 256, 0, 256]
+            )
+
+    def mean(self) -> np.ndarray:
+        """Media por canal"""
+        levels = np.arange(256, dtype=np.float64)
+        return self.channel_hists @ levels / max(self.total_pixels, 1)
+
+    def std(self) -> np.ndarray:
+        """Desviación estándar por canal"""
+        levels = np.arange(256, dtype=np.float64)
+        mean = self.mean()
+        second = self.channel_hists @ (levels ** 2) / max(self.total_pixels, 1)
+        return np.sqrt(np.maximum(second - mean ** 2, 0))
+
+    def percentile(self, q: float) -> np.ndarray:
+        """Percentil q por canal"""
+        return np.array([histogram_percentile(h, q) for h in self.channel_hists])
+
+    def clipping(self) -> Dict[str, np.ndarray]:
+        """Fracción de píxeles recortados en negro (0) y en blanco (255) por canal"""
+        total = max(self.total_pixels, 1)
+        return {
+            'shadows': self.channel_hists[:, 0] / total,
+            'highlights': self.channel_hists[:, 255] / total
+        }
+
+    def entropy(self) -> np.ndarray:
+        """Entropía por canal en bits (máximo 8)"""
+        return np.array([histogram_entropy(h) for h in self.channel_hists])
+
+    def coarse_entropy(self) -> Optional[float]:
+        """Entropía del histograma 3D de color"""
+        if self.coarse_hist is None:
+            return None
+        return histogram_entropy(self.coarse_hist)
+
+    def to_dict(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict:
+        """Resumen serializable en JSON para el resultado del análisis"""
+        names = ('b', 'g', 'r') if self.channels == 3 else tuple(f'c{i}' for i in range(self.channels))
+        mean = self.mean()
+        std = self.std()
+        clipping = self.clipping()
+        entropy = self.entropy()
+        pct = {q: self.percentile(q) for q in percentiles}
+
+        summary = {
+            'channels': self.channels,
+            'total_pixels': self.total_pixels,
+            'per_channel': {}
+        }
+        for i, name in enumerate(names):
+            summary['per_channel'][name] = {
+                'mean': round(float(mean[i]), 2),
+                'std': round(float(std[i]), 2),
+                'percentiles': {str(q): int(pct[q][i]) for q in percentiles},
+                'clipped_shadows': round(float(clipping['shadows'][i]), 5),
+                'clipped_highlights': round(float(clipping['highlights'][i]), 5),
+                'entropy': round(float(entropy[i]), 3)
+            }
+
+        if self.coarse_hist is not None:
+            summary['color'] = {
+                'bins_per_channel': self.coarse_bins,
+                'occupied_bins': int(np.count_nonzero(self.coarse_hist)),
+                'entropy': round(self.coarse_entropy(), 3)
+            }
+        return summary
+
+class ImageStats:
+    """
+    Estadísticas de decisión de las correcciones adaptativas
+
+    Se calculan una sola vez por estado de la imagen, bajo demanda, y las
+    comparten todas las etapas adaptativas (balance de blancos, CLAHE,
+    saturación, reducción de ruido) en lugar de que cada una recorra la
+    imagen completa. Opcionalmente se calculan sobre un proxy reducido.
+    """
+
+    def __init__(self, image: np.ndarray, proxy_size: Optional[int] = None,
+                 histogram: Optional[HistogramAnalysis] = None,
+                 gray: Optional[np.ndarray] = None):
+        """
+        Args:
+            image: Imagen BGR uint8
+            proxy_size: Lado mayor del proxy reducido (None = resolución completa)
+            histogram: Histograma ya calculado de la misma imagen (a resolución completa)
+            gray: Escala de grises ya calculada de la misma imagen
+        """
+        self.proxy_size = proxy_size
+        self.source_shape = image.shape
+        self.image = downscale_to(image, proxy_size) if proxy_size else image
+
+        # Los datos precalculados solo son válidos si no se reduce la imagen
+        same_resolution = self.image is image
+        self._histogram = histogram if same_resolution else None
+        self._gray = gray if same_resolution else None
+        self._lab_l_hist = None
+        self._saturation_hist = None
+        self._laplacian_std = None
+
+    @property
+    def histogram(self) -> HistogramAnalysis:
+        if self._histogram is None:
+            self._histogram = HistogramAnalysis(self.image, coarse_bins=None)
+        return self._histogram
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def channel_means(self) -> np.ndarray:
+        """
+        Media por canal BGR, exacta (float64 sobre el histograma); la media
+        float32 de la versión sin histogramas acumulaba error, así que gray
+        world puede diferir de ella en un nivel
+        """
+        return self.histogram.mean()
+
+    @property
+    def brightness(self) -> float:
+        """Brillo medio sobre todos los canales"""
+        return float(np.mean(self.channel_means))
+
+    @property
+    def white_patch_max(self) -> np.ndarray:
+        """Percentil 99 por canal, basado en histograma"""
+        return self.histogram.percentile(99)
+
+    @property
+    def lab_l_std(self) -> float:
+        """Desviación estándar del canal L de LAB (contraste)"""
+        if self._lab_l_hist is None:
+            lab = cv2.cvtColor(self.image, cv2.COLOR_BGR2LAB)
+            self._lab_l_hist = cv2.calcHist([lab], [0], None, [256], [0, 256]).ravel()
+        return float(_hist_std(self._lab_l_hist))
+
+    def _saturation(self) -> np.ndarray:
+        if self._saturation_hist is None:
+            hsv = cv2.cvtColor(self.image, cv2.COLOR_BGR2HSV)
+            self._saturation_hist = cv2.calcHist([hsv], [1], None, [256], [0, 256]).ravel()
+        return self._saturation_hist
+
+    @property
+    def saturation_mean(self) -> float:
+        """Media del canal S de HSV"""
+        return float(_hist_mean(self._saturation()))
+
+    @property
+    def saturation_std(self) -> float:
+        """Desviación estándar del canal S de HSV"""
+        return float(_hist_std(self._saturation()))
+
+    @property
+    def laplacian_std(self) -> float:
+        """Desviación estándar del Laplaciano de la luminancia (nivel de ruido)"""
+        if self._laplacian_std is None:
+            # CV_16S es exacto para un Laplaciano 3x3 de uint8 y ocupa 4 veces
+            # menos memoria que CV_64F
+            lap = cv2.Laplacian(self.gray, cv2.CV_16S)
+            _, std = cv2.meanStdDev(lap)
+            self._laplacian_std = float(std[0][0])
+        return self._laplacian_std
+
+def downscale_to(image: np.ndarray, max_side: int) -> np.ndarray:
+    """Reduce la imagen (INTER_AREA) para que su lado mayor no supere max_side"""
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if longest <= max_side:
+        return image
+    scale = max_side / longest
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+def resize_pyramid(image: np.ndarray, max_sides: Sequence[int]) -> List[Tuple[int, np.ndarray]]:
+    """
+    Reducciones sucesivas (INTER_AREA) para varios lados máximos
+
+    Cada nivel se obtiene del anterior, no de la imagen original, de modo
+    que el coste total es poco más que el de la primera reducción.
+
+    Returns:
+        Lista (lado máximo, imagen) de mayor a menor
+    """
+    levels = []
+    current = image
+    for max_side in sorted(set(max_sides), reverse=True):
+        current = downscale_to(current, max_side)
+        levels.append((max_side, current))
+    return levels
+
+def _hist_mean(hist: np.ndarray) -> float:
+    total = float(np.sum(hist))
+    if total <= 0:
+        return 0.0
+    return float(np.dot(hist, np.arange(len(hist), dtype=np.float64)) / total)
+
+def _hist_std(hist: np.ndarray) -> float:
+    total = float(np.sum(hist))
+    if total <= 0:
+        return 0.0
+    levels = np.arange(len(hist), dtype=np.float64)
+    mean = np.dot(hist, levels) / total
+    second = np.dot(hist, levels ** 2) / total
+    return float(np.sqrt(max(second - mean ** 2, 0.0)))
@@ -0,0 +1,198 @@
+"""
+Manifiesto persistente de trabajos de procesamiento
+Registra en disco el estado de cada archivo de un lote (pendiente,
+completado o fallido), el hash de su entrada, la ruta de salida y los
+tiempos, actualizado de forma atómica a medida que terminan los archivos.
+Permite reanudar un lote interrumpido saltando los archivos ya completados
+cuya entrada no ha cambiado.
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import tempfile
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Nombre por defecto del manifiesto dentro del directorio de salida
+MANIFEST_FILENAME = '.job_manifest.json'
+
+# Estados de un archivo
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash SHA-256 del contenido de un archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def params_fingerprint(params: Dict) -> str:
+    """Huella de los parámetros que determinan las salidas de un trabajo"""
+    data = json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+class JobManifest:
+    """Estado por archivo de un lote, persistido como JSON"""
+
+    def __init__(self, path: str, job_id: Optional[str] = None):
+        """
+        Args:
+            path: Ruta del manifiesto; si ya existe se carga (reanudación)
+            job_id: Identificador para un manifiesto nuevo (por defecto uno aleatorio)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self._load()
+        if self.data is None:
+            self.data = {
+                'version': MANIFEST_VERSION,
+                'job_id': job_id or str(uuid.uuid4()),
+                'created_at': _now(),
+                'updated_at': _now(),
+                'params': {},
+                'fingerprint': None,
+                'files': {}
+            }
+
+    @classmethod
+    def load(cls, path: str) -> 'JobManifest':
+        """Carga un manifiesto existente (FileNotFoundError si no existe)"""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Manifiesto no encontrado: {path}")
+        return cls(path)
+
+    def _load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            # Un manifiesto ilegible no debe impedir el trabajo: se rehace
+            logger.warning(f"Manifiesto ilegible, se empieza de cero: {self.path} ({str(e)})")
+            return None
+        if data.get('version') != MANIFEST_VERSION:
+            logger.warning(f"Versión de manifiesto no soportada, se empieza de cero: {self.path}")
+            return None
+        return data
+
+    @property
+    def job_id(self) -> str:
+        return self.data['job_id']
+
+    @property
+    def params(self) -> Dict:
+        """Parámetros del trabajo necesarios para reanudarlo"""
+        return self.data['params']
+
+    def set_params(self, **params):
+        """Guarda los parámetros del trabajo (deben ser serializables a JSON)"""
+        with self._lock:
+            self.data['params'].update(params)
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self.data.get('fingerprint')
+
+    def set_fingerprint(self, fingerprint: str):
+        """
+        Fija la huella de parámetros del trabajo; las entradas registradas con
+        otra huella (el manifiesto se reutiliza con otros parámetros) dejan de
+        contar como completadas
+        """
+        with self._lock:
+            previous = self.data.get('fingerprint')
+            if previous and previous != fingerprint:
+                logger.info(f"Parámetros del trabajo cambiados, se reprocesarán sus archivos: {self.path}")
+            self.data['fingerprint'] = fingerprint
+
+    def entry(self, input_path: str) -> Optional[Dict]:
+        return self.data['files'].get(input_path)
+
+    def is_complete(self, input_path: str, input_hash: str) -> bool:
+        """
+        Indica si el archivo ya se completó con la misma entrada y los mismos
+        parámetros, y su salida sigue en disco
+        """
+        entry = self.entry(input_path)
+        return bool(
+            entry
+            and entry['status'] == STATUS_DONE
+            and entry['input_hash'] == input_hash
+            and entry.get('fingerprint') == self.fingerprint
+            and entry.get('output_path')
+            and os.path.exists(entry['output_path'])
+        )
+
+    def mark_pending(self, input_path: str, input_hash: str):
+        """Registra un archivo por procesar (sin guardar todavía)"""
+        with self._lock:
+            self.data['files'][input_path] = {
+                'status': STATUS_PENDING,
+                'input_hash': input_hash,
+                'fingerprint': self.data.get('fingerprint'),
+                'output_path': None,
+                'size_bytes': 0,
+                'seconds': None,
+                'error': None,
+                'renditions': [],
+                'updated_at': _now()
+            }
+
+    def record(self, input_path: str, input_hash: str, success: bool,
+               output_path: Optional[str] = None, size_bytes: int = 0,
+               seconds: Optional[float] = None, error: Optional[str] = None,
+               renditions: Optional[List[Dict]] = None):
+        """Registra el resultado de un archivo y guarda el manifiesto"""
+        with self._lock:
+            self.data['files'][input_path] = {
+                'status': STATUS_DONE if success else STATUS_FAILED,
+                'input_hash': input_hash,
+                'fingerprint': self.data.get('fingerprint'),
+                'output_path': output_path,
+                'size_bytes': size_bytes,
+                'seconds': seconds,
+                'error': error,
+                'renditions': renditions or [],
+                'updated_at': _now()
+            }
+        self.save()
+
+    def summary(self) -> Dict:
+        """Número de archivos por estado"""
+        counts = {STATUS_PENDING: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+        for entry in self.data['files'].values():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return counts
+
+    def save(self):
+        """Escribe el manifiesto de forma atómica (temporal + os.replace)"""
+        with self._lock:
+            self.data['updated_at'] = _now()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
@@ -8,94 +8,229 @@ import sys
 import os
 import json
 import argparse
+import logging
 from pathlib import Path
+from typing import Dict, List, Optional
 from processing_service import ProcessingService
+from result_cache import DEFAULT_CACHE_MAX_MB
+from progress_events import ProgressEmitter
+from image_encoder import ENCODER_SPEEDS, supported_output_formats
+from renditions import parse_rendition_specs
+from job_manifest import JobManifest
+from staged_pipeline import DEFAULT_QUEUE_SIZE, parse_stage_workers
 
-def main():
-    """Función principal para procesar imágenes desde la API"""
-    
-    # Configurar argumentos de línea de comandos
-    parser = argparse.ArgumentParser(description='Procesar imágenes desde la API')
-    parser.add_argument('--quality', choices=['professional', 'standard', 'fast'], default='standard',
-                       help='Nivel de procesamiento')
-    parser.add_argument('--convert-heic', action='store_true',
-                       help='Convertir archivos HEIC a JPG')
-    parser.add_argument('--corrections', type=str, default='[]',
-                       help='Lista de correcciones a aplicar (JSON)')
-    parser.add_argument('--analysis', type=str, default='[]',
-                       help='Lista de análisis a realizar (JSON)')
-    parser.add_argument('input_dir', help='Directorio de entrada')
-    parser.add_argument('output_dir', help='Directorio de salida')
-    
-    args = parser.parse_args()
-    
+# Extensiones aceptadas en el directorio de entrada
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.heic', '.heif', '.tiff', '.bmp']
+
+def collect_input_files(input_dir: str) -> List[str]:
+    """Obtiene la lista de archivos de imagen del directorio de entrada"""
+    input_files = []
+    for file_path in Path(input_dir).iterdir():
+        if file_path.is_file():
+            # Verificar que es un archivo de imagen
+            ext = file_path.suffix.lower()
+            if ext in IMAGE_EXTENSIONS:
+                input_files.append(str(file_path))
+    return input_files
+
+def run_job(service: ProcessingService, input_dir: str, output_dir: str,
+            quality: str = 'standard', convert_heic: bool = False,
+            corrections: List[str] = None, analysis: List[str] = None,
+            workers: int = 1, proxy_size: Optional[int] = None,
+            memory_budget_mb: Optional[float] = None,
+            progress: Optional[ProgressEmitter] = None,
+            encoder_backend: str = 'cv2', renditions: Optional[List] = None,
+            output_format: Optional[str] = None,
+            encoder_speed: Optional[str] = None,
+            archive_path: Optional[str] = None,
+            manifest_path: Optional[str] = None,
+            pipeline: bool = False,
+            pipeline_workers: Optional[List[int]] = None,
+            pipeline_queue_size: int = DEFAULT_QUEUE_SIZE,
+            instrumentation: bool = True) -> Dict:
+    """
+    Ejecuta un trabajo de procesamiento completo
+
+    Usado tanto por la CLI como por el worker persistente, de modo que
+    ambos devuelven exactamente el mismo JSON de resultado.
+
+    Returns:
+        Diccionario con la respuesta ('success', 'result' o 'error')
+    """
     try:
-        # Parsear configuración profesional
-        try:
-            corrections = json.loads(args.corrections)
-            analysis = json.loads(args.analysis)
-        except json.JSONDecodeError as e:
-            print(json.dumps({
-                "success": False,
-                "error": f"Error parseando configuración: {str(e)}"
-            }))
-            sys.exit(1)
-        
-        print(f"INFO: Configuración profesional:")
-        print(f"INFO:   - Calidad: {args.quality}")
-        print(f"INFO:   - Correcciones: {corrections}")
-        print(f"INFO:   - Análisis: {analysis}")
-        
         # Verificar que el directorio de entrada existe
-        if not os.path.exists(args.input_dir):
-            print(json.dumps({
+        if not os.path.exists(input_dir):
+            return {
                 "success": False,
-                "error": f"Directorio de entrada no existe: {args.input_dir}"
-            }))
-            sys.exit(1)
-        
+                "error": f"Directorio de entrada no existe: {input_dir}"
+            }
+
         # Crear directorio de salida si no existe
-        os.makedirs(args.output_dir, exist_ok=True)
-        
+        os.makedirs(output_dir, exist_ok=True)
+
         # Obtener lista de archivos de entrada
-        input_files = []
-        for file_path in Path(args.input_dir).iterdir():
-            if file_path.is_file():
-                # Verificar que es un archivo de imagen
-                ext = file_path.suffix.lower()
-                if ext in ['.jpg', '.jpeg', '.png', '.heic', '.heif', '.tiff', '.bmp']:
-                    input_files.append(str(file_path))
-        
+        input_files = collect_input_files(input_dir)
+
         if not input_files:
-            print(json.dumps({
+            return {
                 "success": False,
                 "error": "No se encontraron archivos de imagen en el directorio de entrada"
-            }))
-            sys.exit(1)
-        
-        # Crear servicio de procesamiento
-        service = ProcessingService()
-        
+            }
+
         # Procesar imágenes con configuración profesional
         result = service.process_images_professional(
             input_paths=input_files,
-            output_dir=args.output_dir,
-            quality=args.quality,
-            convert_heic=args.convert_heic,
+            output_dir=output_dir,
+            quality=quality,
+            convert_heic=convert_heic,
             corrections=corrections,
-            analysis=analysis
+            analysis=analysis,
+            workers=workers,
+            proxy_size=proxy_size,
+            memory_budget_mb=memory_budget_mb,
+            progress=progress,
+            encoder_backend=encoder_backend,
+            renditions=renditions,
+            output_format=output_format,
+            encoder_speed=encoder_speed,
+            archive_path=archive_path,
+            manifest_path=manifest_path,
+            pipeline=pipeline,
+            pipeline_workers=pipeline_workers,
+            pipeline_queue_size=pipeline_queue_size,
+            instrumentation=instrumentation
         )
-        
-        # Imprimir resultado en formato JSON
-        print(json.dumps({
+
+        return {
             "success": True,
             "result": result,
             "input_files": input_files,
-            "output_dir": args.output_dir,
-            "quality": args.quality,
-            "convert_heic": args.convert_heic
+            "output_dir": output_dir,
+            "quality": quality,
+            "convert_heic": convert_heic
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error en el procesamiento: {str(e)}"
+        }
+
+def run_resume(service: ProcessingService, manifest_path: str,
+               workers: Optional[int] = None,
+               progress: Optional[ProgressEmitter] = None) -> Dict:
+    """
+    Reanuda un trabajo interrumpido a partir de su manifiesto
+
+    Returns:
+        Diccionario con la respuesta, con el mismo formato que run_job
+    """
+    try:
+        params = JobManifest.load(manifest_path).params
+        result = service.resume_job(manifest_path, workers=workers, progress=progress)
+
+        return {
+            "success": True,
+            "result": result,
+            "input_files": params.get('input_paths', []),
+            "output_dir": params.get('output_dir'),
+            "quality": params.get('quality'),
+            "convert_heic": params.get('convert_heic'),
+            "resumed_from": manifest_path
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error reanudando el trabajo: {str(e)}"
+        }
+
+def main():
+    """Función principal para procesar imágenes desde la API"""
+
+    # Configurar argumentos de línea de comandos
+    parser = argparse.ArgumentParser(description='Procesar imágenes desde la API')
+    parser.add_argument('--quality', choices=['professional', 'standard', 'fast'], default='standard',
+                       help='Nivel de procesamiento')
+    parser.add_argument('--convert-heic', action='store_true',
+                       help='Convertir archivos HEIC a JPG')
+    parser.add_argument('--corrections', type=str, default='[]',
+                       help='Lista de correcciones a aplicar (JSON)')
+    parser.add_argument('--analysis', type=str, default='[]',
+                       help='Lista de análisis a realizar (JSON)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Procesos en paralelo (0 = uno por núcleo; por defecto 1 o, con --resume, el guardado)')
+    parser.add_argument('--proxy-size', type=int, default=None,
+                       help='Estimar parámetros sobre un proxy con este lado mayor (p. ej. 1024)')
+    parser.add_argument('--memory-budget-mb', type=float, default=None,
+                       help='Procesar cada imagen por franjas con este presupuesto de memoria (MB)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Directorio de la caché de resultados (sin caché si se omite)')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_CACHE_MAX_MB,
+                       help='Tamaño máximo de la caché de resultados (MB)')
+    parser.add_argument('--encoder-backend', choices=['cv2', 'pillow'], default='cv2',
+                       help='Backend de codificación de salida (preset según --quality)')
+    parser.add_argument('--output-format', choices=supported_output_formats(), default=None,
+                       help='Formato de salida (por defecto el de la entrada; HEIC como JPG)')
+    parser.add_argument('--encoder-speed', choices=list(ENCODER_SPEEDS), default=None,
+                       help='Velocidad/esfuerzo de WebP y AVIF (por defecto según --quality)')
+    parser.add_argument('--renditions', type=str, default='[]',
+                       help='Versiones reducidas por imagen (JSON), p. ej. ["1600:jpg", "320:jpg:fast"]')
+    parser.add_argument('--archive', type=str, default=None,
+                       help='Empaquetar las salidas en este ZIP a medida que se escriben')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Solapar lectura, correcciones y escritura en un pipeline de hilos con colas acotadas')
+    parser.add_argument('--pipeline-workers', type=str, default=None,
+                       help='Hilos de lectura,proceso,escritura del pipeline (p. ej. 2,4,2)')
+    parser.add_argument('--pipeline-queue', type=int, default=DEFAULT_QUEUE_SIZE,
+                       help='Imágenes en espera entre etapas del pipeline')
+    parser.add_argument('--no-instrumentation', action='store_true',
+                       help='No medir tiempo, CPU y memoria por corrección y análisis')
+    parser.add_argument('--manifest', type=str, default=None,
+                       help='Manifiesto del trabajo: guarda el estado por archivo y salta lo ya completado')
+    parser.add_argument('--resume', type=str, default=None, metavar='MANIFEST',
+                       help='Reanudar el trabajo de este manifiesto con sus parámetros guardados')
+    parser.add_argument('--progress-fd', type=int, default=None,
+                       help='Descriptor de archivo heredado en el que emitir eventos de progreso NDJSON')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                       help='Nivel de los logs (con --progress-fd no hace falta INFO)')
+    parser.add_argument('--list-formats', action='store_true',
+                       help='Imprimir en JSON los formatos de salida y velocidades disponibles y salir')
+    parser.add_argument('input_dir', nargs='?', help='Directorio de entrada')
+    parser.add_argument('output_dir', nargs='?', help='Directorio de salida')
+
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+    if args.list_formats:
+        print(json.dumps({
+            "outputFormats": supported_output_formats(),
+            "encoderSpeeds": list(ENCODER_SPEEDS)
         }))
-        
+        sys.exit(0)
+    if not args.resume and not (args.input_dir and args.output_dir):
+        parser.error('se requieren input_dir y output_dir (o --resume)')
+
+    # Parsear configuración profesional
+    try:
+        corrections = json.loads(args.corrections)
+        analysis = json.loads(args.analysis)
+        renditions = parse_rendition_specs(json.loads(args.renditions))
+        pipeline_workers = parse_stage_workers(args.pipeline_workers, None)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(json.dumps({
+            "success": False,
+            "error": f"Error parseando configuración: {str(e)}"
+        }))
+        sys.exit(1)
+
+    print(f"INFO: Configuración profesional:")
+    print(f"INFO:   - Calidad: {args.quality}")
+    print(f"INFO:   - Correcciones: {corrections}")
+    print(f"INFO:   - Análisis: {analysis}")
+
+    try:
+        # Crear servicio de procesamiento
+        service = ProcessingService(cache_dir=args.cache_dir, cache_max_mb=args.cache_max_mb)
     except Exception as e:
         print(json.dumps({
             "success": False,
@@ -103,5 +238,41 @@ def main():
         }))
         sys.exit(1)
 
+    if args.resume:
+        response = run_resume(service, args.resume, workers=args.workers,
+                              progress=ProgressEmitter(args.progress_fd))
+        print(json.dumps(response))
+        sys.exit(0 if response["success"] else 1)
+
+    response = run_job(
+        service,
+        input_dir=args.input_dir,
+        output_dir=args.output_dir,
+        quality=args.quality,
+        convert_heic=args.convert_heic,
+        corrections=corrections,
+        analysis=analysis,
+        workers=args.workers if args.workers is not None else 1,
+        proxy_size=args.proxy_size,
+        memory_budget_mb=args.memory_budget_mb,
+        progress=ProgressEmitter(args.progress_fd),
+        encoder_backend=args.encoder_backend,
+        renditions=renditions,
+        output_format=args.output_format,
+        encoder_speed=args.encoder_speed,
+        archive_path=args.archive,
+        manifest_path=args.manifest,
+        pipeline=args.pipeline,
+        pipeline_workers=pipeline_workers,
+        pipeline_queue_size=args.pipeline_queue,
+        instrumentation=not args.no_instrumentation
+    )
+
+    # Imprimir resultado en formato JSON
+    print(json.dumps(response))
+
+    if not response["success"]:
+        sys.exit(1)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Script para comprimir videos desde la API
+Recibe un video o una carpeta de videos y los comprime con FFmpeg usando
+los presets del compresor (ver video_engine.py)
+"""
+
+import sys
+import os
+import json
+import argparse
+import logging
+from typing import Dict, List, Optional
+from video_engine import COMPRESSION_PRESETS, DEFAULT_PRESET, VideoEngine, find_videos
+from video_queue import VideoQueue
+from video_preset_selector import AUTO_PRESET, DEFAULT_CANDIDATES, PresetSelector
+from progress_events import ProgressEmitter
+
+def collect_input_videos(input_path: str) -> List[str]:
+    """Un video suelto o los videos de un directorio"""
+    if os.path.isdir(input_path):
+        return find_videos(input_path)
+    return [input_path]
+
+def run_video_job(engine: VideoEngine, input_path: str, output_dir: str,
+                  preset: str = DEFAULT_PRESET, max_jobs: Optional[int] = None,
+                  threads: Optional[int] = None,
+                  progress: Optional[ProgressEmitter] = None,
+                  segments: Optional[int] = None,
+                  compare_single: bool = False,
+                  selector: Optional[PresetSelector] = None,
+                  auto_targets: Optional[Dict] = None) -> Dict:
+    """
+    Ejecuta un trabajo de compresión completo
+
+    Los videos se comprimen en paralelo con VideoQueue (trabajos e hilos
+    según los núcleos y el preset, salvo que se fijen max_jobs/threads).
+    Con segments, cada video se corta y codifica por segmentos en paralelo
+    (ver video_segments.py). Con preset 'auto' el preset de cada video se
+    elige con codificaciones de muestra (ver video_preset_selector.py).
+
+    Returns:
+        Diccionario con la respuesta ('success', 'result' o 'error')
+    """
+    try:
+        if not os.path.exists(input_path):
+            return {
+                "success": False,
+                "error": f"Entrada no existe: {input_path}"
+            }
+
+        if preset not in COMPRESSION_PRESETS and preset != AUTO_PRESET:
+            return {
+                "success": False,
+                "error": f"Preset no soportado: {preset}"
+            }
+
+        if not engine.is_available():
+            return {
+                "success": False,
+                "error": "FFmpeg no está instalado o no se puede ejecutar"
+            }
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        input_files = collect_input_videos(input_path)
+        if not input_files:
+            return {
+                "success": False,
+                "error": "No se encontraron videos en el directorio de entrada"
+            }
+
+        video_queue = VideoQueue(engine, max_jobs=max_jobs, threads=threads,
+                                 segments=segments, compare_single=compare_single,
+                                 selector=selector, auto_targets=auto_targets)
+        video_queue.extend(input_files)
+        result = video_queue.run(output_dir, preset, progress=progress)
+
+        return {
+            "success": True,
+            "result": result,
+            "input_files": input_files,
+            "output_dir": output_dir,
+            "preset": preset
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error en la compresión: {str(e)}"
+        }
+
+def main():
+    """Función principal para comprimir videos desde la API"""
+
+    parser = argparse.ArgumentParser(description='Comprimir videos desde la API')
+    parser.add_argument('--preset', choices=list(COMPRESSION_PRESETS) + [AUTO_PRESET], default=DEFAULT_PRESET,
+                       help="Preset de compresión ('auto' = elegir por video con codificaciones de muestra)")
+    parser.add_argument('--auto-candidates', type=str, default=','.join(DEFAULT_CANDIDATES),
+                       help="Candidatos de --preset auto: 'preset' o 'preset:crf' separados por comas")
+    parser.add_argument('--target-size-mb', type=float, default=None,
+                       help='Con --preset auto, tamaño máximo de cada video comprimido (MB)')
+    parser.add_argument('--target-ratio', type=float, default=None,
+                       help='Con --preset auto, tamaño máximo como fracción de la entrada (p. ej. 0.3)')
+    parser.add_argument('--time-budget', type=float, default=None,
+                       help='Con --preset auto, tiempo máximo de codificación por video (s)')
+    parser.add_argument('--jobs', type=int, default=None,
+                       help='Máximo de videos comprimidos a la vez (por defecto según núcleos y preset)')
+    parser.add_argument('--threads', type=int, default=None,
+                       help='Hilos de FFmpeg por video (por defecto los núcleos repartidos entre trabajos)')
+    parser.add_argument('--segments', type=int, default=None,
+                       help='Codificar cada video en N segmentos en paralelo (0 = según núcleos y duración)')
+    parser.add_argument('--compare-single', action='store_true',
+                       help='Con --segments, codificar también en un solo proceso e informar de la aceleración')
+    parser.add_argument('--progress-fd', type=int, default=None,
+                       help='Descriptor de archivo heredado en el que emitir eventos de progreso NDJSON')
+    parser.add_argument('--ffmpeg', type=str, default='ffmpeg',
+                       help='Ejecutable de FFmpeg')
+    parser.add_argument('--ffprobe', type=str, default='ffprobe',
+                       help='Ejecutable de FFprobe')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                       help='Nivel de los logs')
+    parser.add_argument('input_path', help='Video o directorio de entrada')
+    parser.add_argument('output_dir', help='Directorio de salida')
+
+    args = parser.parse_args()
+    # Los logs van a stderr: stdout queda reservado para el JSON de respuesta
+    logging.basicConfig(level=args.log_level, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    engine = VideoEngine(ffmpeg=args.ffmpeg, ffprobe=args.ffprobe)
+    try:
+        selector = PresetSelector(engine, candidates=args.auto_candidates.split(','))
+    except ValueError as e:
+        print(json.dumps({
+            "success": False,
+            "error": f"Error parseando configuración: {str(e)}"
+        }))
+        sys.exit(1)
+    auto_targets = {
+        'target_size_bytes': int(args.target_size_mb * 1024 * 1024) if args.target_size_mb else None,
+        'target_ratio': args.target_ratio,
+        'time_budget_seconds': args.time_budget
+    }
+    response = run_video_job(engine, args.input_path, args.output_dir, preset=args.preset,
+                             max_jobs=args.jobs, threads=args.threads,
+                             progress=ProgressEmitter(args.progress_fd),
+                             segments=args.segments, compare_single=args.compare_single,
+                             selector=selector, auto_targets=auto_targets)
+
+    # Imprimir resultado en formato JSON
+    print(json.dumps(response))
+
+    if not response["success"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,24 @@ Integra conversión HEIC y procesamiento profesional
 import os
 import tempfile
 import shutil
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 import logging
 from datetime import datetime
-import uuid
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from image_processor import ImageProcessor
+from image_processor import (ImageProcessor, ImageFrame, ImageSource, CORRECTION_ORDER,
+                             DEFAULT_PROXY_SIZE, PROCESSOR_VERSION)
+from tiled_processing import TiledProcessor
+from result_cache import ResultCache, DEFAULT_CACHE_MAX_MB
+from image_encoder import ImageEncoder, ENCODER_SPEEDS, OUTPUT_FORMATS, supported_output_formats
+from renditions import parse_rendition_specs, write_renditions
+from archive_writer import ArchiveWriter
+from job_manifest import JobManifest, MANIFEST_FILENAME, file_sha256, params_fingerprint
+from stage_metrics import StageRecorder, aggregate_stage_metrics, stop_memory_tracking
+from staged_pipeline import StagedPipeline, PipelineStage, DEFAULT_QUEUE_SIZE, parse_stage_workers
+from progress_events import ProgressEmitter, ProgressRelay, QueueProgressEmitter, NULL_EMITTER
 from heic_converter import HEICConverter
 
 # Configurar logging
@@ -21,11 +33,24 @@ logger = logging.getLogger(__name__)
 class ProcessingService:
     """Servicio principal de procesamiento de imágenes"""
     
-    def __init__(self, temp_dir: str = None):
+    def __init__(self, temp_dir: str = None, cache_dir: str = None,
+                 cache_max_mb: float = DEFAULT_CACHE_MAX_MB):
+        """
+        Args:
+            temp_dir: Directorio temporal
+            cache_dir: Directorio de la caché de resultados (None = sin caché)
+            cache_max_mb: Tamaño máximo de la caché de resultados
+        """
         self.temp_dir = temp_dir or tempfile.gettempdir()
         self.image_processor = ImageProcessor()
         self.heic_converter = HEICConverter()
         
+        self.cache_dir = cache_dir
+        self.cache_max_mb = cache_max_mb
+        self.result_cache = None
+        if cache_dir:
+            self.result_cache = ResultCache(cache_dir, int(cache_max_mb * 1024 * 1024))
+        
         # Crear directorio temporal si no existe
         os.makedirs(self.temp_dir, exist_ok=True)
     
@@ -33,7 +58,8 @@ class ProcessingService:
                       input_paths: List[str], 
                       output_dir: str,
                       quality: str = 'high',
-                      convert_heic: bool = True) -> Dict:
+                      convert_heic: bool = True,
+                      manifest_path: Optional[str] = None) -> Dict:
         """
         Procesa una lista de imágenes con opciones avanzadas
         
@@ -42,11 +68,15 @@ class ProcessingService:
             output_dir: Directorio de salida
             quality: Calidad del procesamiento ('high', 'medium', 'fast')
             convert_heic: Si debe convertir archivos HEIC automáticamente
+            manifest_path: Manifiesto del trabajo (por defecto en output_dir);
+                           los archivos ya completados con la misma entrada
+                           se saltan
         
         Returns:
             Diccionario con estadísticas del procesamiento
         """
-        job_id = str(uuid.uuid4())
+        manifest = JobManifest(manifest_path or os.path.join(output_dir, MANIFEST_FILENAME))
+        job_id = manifest.job_id
         job_temp_dir = os.path.join(self.temp_dir, f"job_{job_id}")
         
         stats = {
@@ -69,6 +99,12 @@ class ProcessingService:
             os.makedirs(output_dir, exist_ok=True)
             
             logger.info(f"Iniciando procesamiento de {len(input_paths)} archivos (Job: {job_id})")
+            manifest.set_params(mode='basic', input_paths=input_paths, output_dir=output_dir,
+                                quality=quality, convert_heic=convert_heic)
+            manifest.set_fingerprint(params_fingerprint({
+                'mode': 'basic', 'quality': quality, 'convert_heic': convert_heic,
+                'processor_version': PROCESSOR_VERSION
+            }))
             
             # Procesar cada archivo
             for input_path in input_paths:
@@ -84,23 +120,28 @@ class ProcessingService:
                     output_filename = os.path.splitext(filename)[0] + '.jpg'
                     output_path = os.path.join(output_dir, output_filename)
                     
-                    # Verificar si ya existe
-                    if os.path.exists(output_path):
-                        logger.info(f"Saltando {output_filename} - ya existe")
+                    # Saltar solo lo completado con esta misma entrada, según el manifiesto
+                    input_hash = file_sha256(input_path)
+                    if manifest.is_complete(input_path, input_hash):
+                        logger.info(f"Saltando {output_filename} - ya completado")
                         stats['skipped'] += 1
-                        stats['output_files'].append(output_path)
+                        stats['output_files'].append(manifest.entry(input_path)['output_path'])
                         continue
                     
+                    file_start = time.perf_counter()
+                    failed_before = stats['failed']
+                    
                     # Procesar según el tipo de archivo
                     if ext in {'.heic', '.heif'} and convert_heic:
-                        # Convertir HEIC y procesar
-                        temp_path = os.path.join(job_temp_dir, f"temp_{filename}.jpg")
+                        # Decodificar HEIC en memoria y procesar, sin JPEG intermedio
+                        heic_image = self.heic_converter.decode_to_array(input_path)
                         
-                        if self.heic_converter.convert_single_file(input_path, temp_path, 95):
+                        if heic_image is not None:
                             stats['converted_heic'] += 1
                             
-                            # Procesar imagen convertida
-                            if self.image_processor.process_image_file(temp_path, output_path, quality):
+                            # Procesar imagen decodificada
+                            frame = ImageFrame(heic_image, input_path)
+                            if self.image_processor.process_image_file(frame, output_path, quality):
                                 stats['processed_successfully'] += 1
                                 stats['output_files'].append(output_path)
                                 logger.info(f"HEIC procesado exitosamente: {output_filename}")
@@ -125,6 +166,14 @@ class ProcessingService:
                         stats['skipped'] += 1
                         stats['errors'].append(f"Formato no soportado: {ext}")
                         logger.warning(f"Formato no soportado: {ext} en {filename}")
+                        continue
+                    
+                    success = stats['failed'] == failed_before
+                    manifest.record(input_path, input_hash, success,
+                                    output_path=output_path if success else None,
+                                    size_bytes=os.path.getsize(output_path) if success else 0,
+                                    seconds=round(time.perf_counter() - file_start, 4),
+                                    error=None if success else stats['errors'][-1])
                 
                 except Exception as e:
                     stats['failed'] += 1
@@ -204,6 +253,8 @@ class ProcessingService:
                 'heic': ['.heic', '.heif']
             },
             'output_format': '.jpg',
+            'output_formats': supported_output_formats(),
+            'encoder_speeds': list(ENCODER_SPEEDS),
             'quality_levels': ['high', 'medium', 'fast']
         }
     
@@ -249,7 +300,21 @@ class ProcessingService:
 # Funciones de conveniencia
     def process_images_professional(self, input_paths: List[str], output_dir: str, 
                                   quality: str = 'standard', convert_heic: bool = True,
-                                  corrections: List[str] = None, analysis: List[str] = None) -> Dict:
+                                  corrections: List[str] = None, analysis: List[str] = None,
+                                  workers: int = 1, cv2_threads: int = 1,
+                                  proxy_size: Optional[int] = None,
+                                  memory_budget_mb: Optional[float] = None,
+                                  progress: Optional[ProgressEmitter] = None,
+                                  encoder_backend: str = 'cv2',
+                                  renditions: Optional[List] = None,
+                                  output_format: Optional[str] = None,
+                                  encoder_speed: Optional[str] = None,
+                                  archive_path: Optional[str] = None,
+                                  manifest_path: Optional[str] = None,
+                                  pipeline: bool = False,
+                                  pipeline_workers: Optional[Sequence[int]] = None,
+                                  pipeline_queue_size: int = DEFAULT_QUEUE_SIZE,
+                                  instrumentation: bool = True) -> Dict:
         """
         Procesar múltiples imágenes con configuración profesional
         
@@ -260,6 +325,39 @@ class ProcessingService:
             convert_heic: Si convertir archivos HEIC a JPG
             corrections: Lista de correcciones a aplicar
             analysis: Lista de análisis a realizar
+            workers: Número de procesos en paralelo (1 = secuencial,
+                     0 o None = uno por núcleo disponible)
+            cv2_threads: Hilos internos de OpenCV por proceso del pool
+            proxy_size: Si se indica, los parámetros de las correcciones
+                        adaptativas se estiman sobre un proxy con ese lado mayor
+            memory_budget_mb: Si se indica, cada imagen se procesa por franjas
+                              con este presupuesto de memoria (ver tiled_processing)
+            progress: Emisor de eventos de progreso NDJSON (ver progress_events)
+            encoder_backend: Backend de codificación de salida ('cv2' o 'pillow');
+                             el preset se toma del nivel de calidad
+            renditions: Versiones reducidas adicionales de cada imagen
+                        (lado máximo, formato, calidad; ver renditions)
+            output_format: Formato de la salida completa ('jpg', 'webp', 'avif',
+                           ...; None = el de la entrada, HEIC como JPG)
+            encoder_speed: Nivel de velocidad/esfuerzo de WebP y AVIF ('fast',
+                           'balanced', 'best'; None = el del nivel de calidad)
+            archive_path: Si se indica, cada salida (y sus renditions) se añade
+                          a este ZIP en cuanto se escribe (ver archive_writer)
+            manifest_path: Si se indica, el estado de cada archivo se guarda en
+                           este manifiesto y los ya completados con la misma
+                           entrada se saltan (ver job_manifest y resume_job)
+            pipeline: Procesar en un pipeline de hilos por etapas (lectura y
+                      decodificación -> correcciones -> codificación y
+                      escritura) con colas acotadas, en lugar de archivo a
+                      archivo o con el pool de procesos (ver staged_pipeline)
+            pipeline_workers: Hilos de lectura, proceso y escritura (por
+                              defecto 2, uno por núcleo y 2)
+            pipeline_queue_size: Imágenes en espera entre dos etapas
+            instrumentation: Medir tiempo real, CPU y pico de memoria de cada
+                             corrección y análisis por imagen, y agregarlos en
+                             percentiles en 'stage_metrics' (ver stage_metrics;
+                             en modo pipeline sin pico de memoria y con el
+                             tiempo de CPU del hilo)
             
         Returns:
             Diccionario con estadísticas del procesamiento
@@ -273,37 +371,155 @@ class ProcessingService:
         logger.info(f"Configuración: calidad={quality}, correcciones={corrections}, análisis={analysis}")
         
         start_time = datetime.now()
-        processed_count = 0
-        failed_count = 0
-        total_size = 0
-        
+
+        if output_format is not None and output_format not in supported_output_formats():
+            raise ValueError(f"Formato de salida no soportado: {output_format}")
+        if encoder_speed is not None and encoder_speed not in ENCODER_SPEEDS:
+            raise ValueError(f"Nivel de velocidad no soportado: {encoder_speed}")
+
         # Crear directorio de salida si no existe
         os.makedirs(output_dir, exist_ok=True)
-        
-        for input_path in input_paths:
-            try:
-                logger.info(f"Procesando: {os.path.basename(input_path)}")
-                
-                # Análisis pre-processing
-                analysis_results = self._perform_analysis(input_path, analysis)
-                logger.info(f"Análisis completado: {analysis_results}")
-                
-                # Procesar imagen con correcciones específicas
-                output_path = self._process_single_image_professional(
-                    input_path, output_dir, quality, convert_heic, corrections
-                )
-                
-                if output_path:
-                    processed_count += 1
-                    total_size += os.path.getsize(output_path)
-                    logger.info(f"Imagen procesada exitosamente: {os.path.basename(output_path)}")
-                else:
-                    failed_count += 1
-                    logger.error(f"Error procesando: {os.path.basename(input_path)}")
-                    
-            except Exception as e:
-                failed_count += 1
-                logger.error(f"Error procesando {os.path.basename(input_path)}: {str(e)}")
+
+        # Opciones comunes a todos los archivos del lote
+        options = {
+            'quality': quality,
+            'convert_heic': convert_heic,
+            'corrections': corrections,
+            'analysis': analysis,
+            'proxy_size': proxy_size,
+            'memory_budget_mb': memory_budget_mb,
+            'encoder_backend': encoder_backend,
+            'renditions': parse_rendition_specs(renditions),
+            'output_format': output_format,
+            'encoder_speed': encoder_speed,
+            'instrumentation': instrumentation,
+            'pipeline': pipeline,
+            # Conservar los bytes codificados para el ZIP en lugar de releerlos
+            'archive': archive_path is not None
+        }
+        if not instrumentation or pipeline:
+            # Sin mediciones de memoria en este trabajo: no seguir trazando
+            # reservas que dejara activado uno anterior del mismo proceso
+            stop_memory_tracking()
+
+        progress = progress or NULL_EMITTER
+        progress.emit('job_started', total_files=len(input_paths))
+
+        manifest = None
+        input_hashes = {}
+        if manifest_path:
+            manifest = JobManifest(manifest_path)
+            manifest.set_params(
+                mode='professional', input_paths=list(input_paths), output_dir=output_dir, quality=quality,
+                convert_heic=convert_heic, corrections=corrections, analysis=analysis,
+                workers=workers, cv2_threads=cv2_threads, proxy_size=proxy_size,
+                memory_budget_mb=memory_budget_mb, encoder_backend=encoder_backend,
+                renditions=options['renditions'], output_format=output_format,
+                encoder_speed=encoder_speed, archive_path=archive_path,
+                pipeline=pipeline,
+                pipeline_workers=list(pipeline_workers) if pipeline_workers else None,
+                pipeline_queue_size=pipeline_queue_size, instrumentation=instrumentation
+            )
+            manifest.set_fingerprint(self._job_fingerprint(options))
+            for input_path in input_paths:
+                if os.path.exists(input_path):
+                    input_hashes[input_path] = file_sha256(input_path)
+
+        # El ZIP se completa a medida que llegan los resultados, en el
+        # proceso principal (único escritor del archivo y del manifiesto)
+        archive = ArchiveWriter(archive_path) if archive_path else None
+
+        def collect(file_result: Dict) -> Dict:
+            # Bytes codificados de la salida y sus renditions (también desde
+            # los procesos del pool): no se releen de disco ni van en el resultado
+            encoded = file_result.pop('encoded', None)
+            if archive is not None and file_result['success']:
+                archive.add_result(file_result, encoded)
+            if manifest is not None and not file_result.get('resumed'):
+                manifest.record(file_result['input_path'],
+                                input_hashes.get(file_result['input_path']),
+                                file_result['success'],
+                                output_path=file_result['output_path'],
+                                size_bytes=file_result['size_bytes'],
+                                seconds=file_result.get('seconds'),
+                                error=file_result['error'],
+                                renditions=file_result['renditions'])
+            return file_result
+
+        # Archivos ya completados con la misma entrada: se reutiliza su salida
+        file_results = [None] * len(input_paths)
+        pending = []
+        for index, input_path in enumerate(input_paths):
+            input_hash = input_hashes.get(input_path)
+            if manifest is not None and input_hash and manifest.is_complete(input_path, input_hash):
+                file_results[index] = self._resumed_result(input_path, manifest.entry(input_path), progress)
+            else:
+                if manifest is not None:
+                    manifest.mark_pending(input_path, input_hash)
+                pending.append(index)
+        if manifest is not None:
+            manifest.save()
+            logger.info(f"Manifiesto {manifest.job_id}: {len(input_paths) - len(pending)} archivos ya completados")
+
+        workers = self._resolve_workers(workers, max(len(pending), 1))
+        file_args = {index: (input_paths[index], output_dir, options) for index in pending}
+
+        pipeline_metrics = None
+        try:
+            for file_result in file_results:
+                if file_result is not None:
+                    collect(file_result)
+
+            if pipeline:
+                readers, processors, writers = parse_stage_workers(
+                    pipeline_workers, (2, os.cpu_count() or 1, 2))
+                logger.info(f"Procesando en pipeline: {readers} lectura, {processors} proceso, {writers} escritura")
+                staged = StagedPipeline([
+                    PipelineStage('read', self._read_stage, readers),
+                    PipelineStage('process', self._process_stage, processors),
+                    PipelineStage('write', self._write_stage, writers)
+                ], pipeline_queue_size)
+                # Las tareas se crean a medida que entran en el pipeline
+                tasks = (dict(self._new_task(*args, progress=progress), index=index)
+                         for index, args in file_args.items())
+                for task in staged.run(tasks):
+                    file_results[task['index']] = collect(self._finish_task(task))
+                pipeline_metrics = staged.metrics()
+            elif workers > 1:
+                logger.info(f"Procesando en paralelo con {workers} procesos")
+                # Los procesos del pool envían sus eventos al principal, único
+                # escritor del canal de progreso
+                relay = ProgressRelay(progress) if progress.enabled else nullcontext()
+                with relay:
+                    event_queue = relay.queue if progress.enabled else None
+                    with ProcessPoolExecutor(max_workers=workers,
+                                             initializer=_init_pool_worker,
+                                             initargs=(self.temp_dir, cv2_threads,
+                                                       self.cache_dir, self.cache_max_mb,
+                                                       event_queue)) as executor:
+                        futures = {executor.submit(_pool_process_file, args): index
+                                   for index, args in file_args.items()}
+                        # Los resultados se empaquetan según terminan y se
+                        # devuelven en el orden de entrada
+                        for future in as_completed(futures):
+                            file_results[futures[future]] = collect(future.result())
+            else:
+                for index, args in file_args.items():
+                    file_results[index] = collect(self._process_file_professional(*args, progress=progress))
+        except BaseException:
+            if archive is not None:
+                archive.abort()
+            raise
+        finally:
+            stop_memory_tracking()
+
+        processed_count = sum(1 for r in file_results if r['success'])
+        failed_count = len(file_results) - processed_count
+        total_size = sum(r['size_bytes'] for r in file_results)
+        cache_hits = sum(1 for r in file_results if r['cache'] == 'hit')
+        cache_misses = sum(1 for r in file_results if r['cache'] == 'miss')
+        rendition_results = [{'input_path': r['input_path'], **rendition}
+                             for r in file_results for rendition in r['renditions']]
         
         end_time = datetime.now()
         processing_time = (end_time - start_time).total_seconds()
@@ -316,92 +532,484 @@ class ProcessingService:
             'total_size_bytes': total_size,
             'quality': quality,
             'corrections_applied': corrections,
-            'analysis_performed': analysis
+            'analysis_performed': analysis,
+            'cache_hits': cache_hits,
+            'cache_misses': cache_misses
         }
+        if options['renditions']:
+            result['renditions'] = rendition_results
+            result['renditions_size_bytes'] = sum(r['size_bytes'] for r in rendition_results)
+        if instrumentation:
+            result['stage_metrics'] = aggregate_stage_metrics([r.get('metrics') for r in file_results])
+        if pipeline_metrics is not None:
+            result['pipeline'] = pipeline_metrics
+        if manifest is not None:
+            result['job_id'] = manifest.job_id
+            result['manifest_path'] = manifest_path
+            result['resumed_files'] = sum(1 for r in file_results if r.get('resumed'))
+        if archive is not None:
+            result['archive'] = archive.close()
+            progress.emit('archive_written', output=os.path.basename(archive_path),
+                          entries=result['archive']['entries'],
+                          size_bytes=result['archive']['size_bytes'])
         
+        progress.emit('job_done', processed=processed_count, failed=failed_count,
+                      seconds=round(processing_time, 3))
         logger.info(f"Procesamiento completado: {processed_count}/{len(input_paths)} exitosos en {processing_time:.2f}s")
         return result
 
-    def _perform_analysis(self, image_path: str, analysis_types: List[str]) -> Dict:
-        """Realizar análisis pre-processing de la imagen"""
+    def _process_file_professional(self, input_path: str, output_dir: str,
+                                   options: Dict, progress=NULL_EMITTER) -> Dict:
+        """
+        Procesa un archivo del lote profesional
+        
+        Args:
+            input_path: Ruta del archivo de entrada
+            output_dir: Directorio de salida
+            options: Opciones del lote (ver process_images_professional)
+            progress: Emisor de eventos de progreso
+
+        Returns:
+            Resultado por archivo ('input_path', 'output_path', 'success',
+            'size_bytes', 'error', 'cache': 'hit', 'miss' o None sin caché,
+            'renditions': renditions escritas)
+        """
+        # Las mismas etapas que el modo pipeline, en secuencia
+        task = self._new_task(input_path, output_dir, options, progress)
+        for stage in (self._read_stage, self._process_stage, self._write_stage):
+            task = stage(task)
+        return self._finish_task(task)
+
+    def _new_task(self, input_path: str, output_dir: str, options: Dict,
+                  progress=NULL_EMITTER) -> Dict:
+        """Estado de un archivo a lo largo de las etapas lectura -> proceso -> escritura"""
+        return {
+            'input_path': input_path,
+            'output_dir': output_dir,
+            'options': options,
+            'progress': progress,
+            'file_name': os.path.basename(input_path),
+            'start': time.perf_counter(),
+            'done': False,
+            'cache_key': None,
+            'frame': None,
+            'image': None,
+            'output_path': None,
+            'recorder': (StageRecorder(concurrent=bool(options.get('pipeline')))
+                         if options.get('instrumentation') else None),
+            'result': {
+                'input_path': input_path,
+                'output_path': None,
+                'success': False,
+                'size_bytes': 0,
+                'error': None,
+                'cache': None,
+                'renditions': [],
+                'seconds': None
+            }
+        }
+
+    @staticmethod
+    def _fail_task(task: Dict, error: str) -> Dict:
+        task['result']['error'] = error
+        task['done'] = True
+        task['frame'] = task['image'] = None
+        logger.error(error)
+        task['progress'].emit('file_failed', file=task['file_name'], error=error)
+        return task
+
+    @staticmethod
+    def _measure(task: Dict, stage: str, category: str):
+        """Mide un tramo del archivo si la instrumentación está activa"""
+        if task['recorder'] is None:
+            return nullcontext()
+        return task['recorder'].measure(stage, category)
+
+    @staticmethod
+    def _finish_task(task: Dict) -> Dict:
+        """Resultado final de un archivo"""
+        file_result = task['result']
+        file_result['seconds'] = round(time.perf_counter() - task['start'], 4)
+        if task['recorder'] is not None and task['recorder'].stages:
+            file_result['metrics'] = task['recorder'].to_dict()
+        return file_result
+
+    def _read_stage(self, task: Dict) -> Dict:
+        """Etapa de E/S: caché de resultados y decodificación"""
+        if task['done']:
+            return task
+        input_path, options, progress = task['input_path'], task['options'], task['progress']
+        file_result = task['result']
+
+        try:
+            logger.info(f"Procesando: {task['file_name']}")
+            progress.emit('file_started', file=task['file_name'])
+            
+            data = None
+            if self.result_cache is not None:
+                # Consultar la caché antes de decodificar; los bytes leídos se
+                # reutilizan para decodificar si no hay entrada
+                with open(input_path, 'rb') as f:
+                    data = f.read()
+                task['cache_key'] = self._cache_key(data, options)
+                output_path = self._output_path(input_path, task['output_dir'], options.get('output_format'))
+                cached = self.result_cache.read(task['cache_key'], os.path.splitext(output_path)[1])
+                if cached is not None:
+                    with open(output_path, 'wb') as f:
+                        f.write(cached)
+                    file_result['cache'] = 'hit'
+                    file_result['output_path'] = output_path
+                    file_result['size_bytes'] = len(cached)
+                    buffers = {output_path: cached} if options.get('archive') else None
+                    if options['renditions']:
+                        # La caché guarda solo la salida completa: las
+                        # renditions se derivan de ella sin reprocesar
+                        cached_frame = self.image_processor.load_frame_from_bytes(cached, output_path)
+                        if cached_frame is None:
+                            raise IOError(f"No se pudo leer la salida en caché: {output_path}")
+                        file_result['renditions'] = self._write_renditions(
+                            cached_frame.image, output_path, options, buffers)
+                    if buffers is not None:
+                        file_result['encoded'] = buffers
+                    file_result['success'] = True
+                    task['done'] = True
+                    logger.info(f"Imagen procesada exitosamente: {os.path.basename(output_path)} (caché)")
+                    self._emit_file_written(progress, task['file_name'], file_result, task['start'])
+                    return task
+                file_result['cache'] = 'miss'
+            
+            # Decodificar una sola vez; análisis y correcciones comparten el frame
+            with self._measure(task, 'decode', 'io'):
+                task['frame'] = self._load_frame(input_path, options['convert_heic'], data)
+            if task['frame'] is None:
+                return self._fail_task(task, f"No se pudo cargar: {task['file_name']}")
+        
+        except Exception as e:
+            return self._fail_task(task, f"Error procesando {task['file_name']}: {str(e)}")
+        
+        return task
+
+    def _process_stage(self, task: Dict) -> Dict:
+        """Etapa de cálculo: análisis y correcciones"""
+        if task['done']:
+            return task
+        options, progress, file_name = task['options'], task['progress'], task['file_name']
+        frame = task['frame']
+
+        try:
+            # Análisis pre-processing
+            analysis_start = time.perf_counter()
+            analysis_results = self._perform_analysis(frame, options['analysis'], task['recorder'])
+            logger.info(f"Análisis completado: {analysis_results}")
+            progress.emit('analysis_done', file=file_name,
+                          seconds=round(time.perf_counter() - analysis_start, 4))
+            
+            def on_stage(stage: str, seconds: float):
+                progress.emit('stage_done', file=file_name, stage=stage, seconds=round(seconds, 4))
+            
+            # Procesar imagen con correcciones específicas
+            task['image'] = self._correct_frame(frame, options,
+                                                on_stage=on_stage if progress.enabled else None,
+                                                recorder=task['recorder'])
+            task['frame'] = None
+            if task['image'] is None:
+                return self._fail_task(task, f"Error procesando: {file_name}")
+        
+        except Exception as e:
+            return self._fail_task(task, f"Error procesando {file_name}: {str(e)}")
+        
+        return task
+
+    def _write_stage(self, task: Dict) -> Dict:
+        """Etapa de salida: codificación, renditions y caché"""
+        if task['done']:
+            return task
+        options, file_result = task['options'], task['result']
+
+        try:
+            output_path = self._output_path(task['input_path'], task['output_dir'],
+                                            options.get('output_format'))
+            with self._measure(task, 'encode', 'io'):
+                data = self._encoder(options).encode(task['image'], os.path.splitext(output_path)[1])
+                with open(output_path, 'wb') as f:
+                    f.write(data)
+            # Con ZIP, los bytes ya codificados se empaquetan sin releer la salida
+            buffers = {output_path: data} if options.get('archive') else None
+            
+            # Todas las renditions salen de la imagen ya en memoria
+            if options['renditions']:
+                with self._measure(task, 'renditions', 'io'):
+                    file_result['renditions'] = self._write_renditions(task['image'], output_path,
+                                                                       options, buffers)
+            task['image'] = None
+            
+            file_result['success'] = True
+            file_result['output_path'] = output_path
+            file_result['size_bytes'] = len(data)
+            if buffers is not None:
+                file_result['encoded'] = buffers
+            task['done'] = True
+            if task['cache_key'] is not None:
+                self.result_cache.put(task['cache_key'], os.path.splitext(output_path)[1], output_path)
+            logger.info(f"Imagen procesada exitosamente: {os.path.basename(output_path)}")
+            self._emit_file_written(task['progress'], task['file_name'], file_result, task['start'])
+        
+        except Exception as e:
+            return self._fail_task(task, f"Error procesando {task['file_name']}: {str(e)}")
+        
+        return task
+
+    @staticmethod
+    def _resumed_result(input_path: str, entry: Dict, progress=NULL_EMITTER) -> Dict:
+        """Resultado de un archivo ya completado según el manifiesto"""
+        file_result = {
+            'input_path': input_path,
+            'output_path': entry['output_path'],
+            'success': True,
+            'size_bytes': entry['size_bytes'],
+            'error': None,
+            'cache': None,
+            'renditions': entry.get('renditions', []),
+            'seconds': 0.0,
+            'resumed': True
+        }
+        logger.info(f"Saltando {os.path.basename(input_path)} - ya completado")
+        progress.emit('file_written', file=os.path.basename(input_path),
+                      output=os.path.basename(entry['output_path']),
+                      size_bytes=entry['size_bytes'], seconds=0.0, cache=None, resumed=True)
+        return file_result
+
+    def resume_job(self, manifest_path: str, workers: Optional[int] = None,
+                   progress: Optional[ProgressEmitter] = None) -> Dict:
+        """
+        Reanuda un lote a partir de su manifiesto
+        
+        Se repiten los parámetros guardados (de process_images_professional
+        o de process_images) y solo se procesan los archivos pendientes,
+        fallidos o cuya entrada ha cambiado.
+        
+        Args:
+            manifest_path: Ruta del manifiesto del trabajo
+            workers: Sustituye al número de procesos guardado
+            progress: Emisor de eventos de progreso
+        
+        Returns:
+            Diccionario con estadísticas del procesamiento
+        """
+        params = dict(JobManifest.load(manifest_path).params)
+        mode = params.pop('mode', None)
+        if mode not in ('professional', 'basic'):
+            raise ValueError(f"El manifiesto no tiene parámetros de trabajo: {manifest_path}")
+        input_paths = params.pop('input_paths')
+        output_dir = params.pop('output_dir')
+        if mode == 'basic':
+            return self.process_images(input_paths, output_dir, params['quality'],
+                                       params['convert_heic'], manifest_path)
+        if workers is not None:
+            params['workers'] = workers
+        return self.process_images_professional(input_paths, output_dir, progress=progress,
+                                                manifest_path=manifest_path, **params)
+
+    @staticmethod
+    def _emit_file_written(progress, file_name: str, file_result: Dict, file_start: float):
+        progress.emit('file_written', file=file_name,
+                      output=os.path.basename(file_result['output_path']),
+                      size_bytes=file_result['size_bytes'],
+                      seconds=round(time.perf_counter() - file_start, 4),
+                      cache=file_result['cache'])
+
+    @staticmethod
+    def _resolve_workers(workers: Optional[int], total_files: int) -> int:
+        """Calcula el número efectivo de procesos para un lote"""
+        if not workers:
+            workers = os.cpu_count() or 1
+        return max(1, min(workers, total_files))
+
+    @classmethod
+    def _cache_key(cls, data: bytes, options: Dict) -> str:
+        """Clave de caché de un archivo con las opciones que afectan al resultado"""
+        # Las correcciones se aplican siempre en CORRECTION_ORDER
+        ordered = [c for c in CORRECTION_ORDER if c in options['corrections']]
+        return ResultCache.make_key(data, options['quality'], ordered, PROCESSOR_VERSION,
+                                    extra=cls._output_options(options))
+
+    @classmethod
+    def _output_options(cls, options: Dict) -> Dict:
+        """Opciones del lote, además de calidad y correcciones, que afectan a la salida"""
+        return {
+            # Tamaño del proxy con el que realmente se estiman los parámetros
+            'proxy_size': cls._effective_proxy_size(options),
+            'convert_heic': options['convert_heic'],
+            'encoder': cls._encoder(options).signature(),
+            'output_format': options.get('output_format')
+        }
+
+    @classmethod
+    def _job_fingerprint(cls, options: Dict) -> str:
+        """
+        Huella de manifiesto: lo mismo que la clave de caché (sin la entrada,
+        que se compara por su hash) más las renditions
+        """
+        return params_fingerprint({
+            'mode': 'professional',
+            'processor_version': PROCESSOR_VERSION,
+            'quality': options['quality'],
+            'corrections': [c for c in CORRECTION_ORDER if c in options['corrections']],
+            'renditions': options['renditions'],
+            **cls._output_options(options)
+        })
+
+    @staticmethod
+    def _effective_proxy_size(options: Dict) -> Optional[int]:
+        """
+        Proxy de estimación de parámetros que usa _correct_frame: por franjas
+        (memory_budget_mb) siempre hay proxy; sin él, None es resolución completa
+        """
+        if options.get('memory_budget_mb'):
+            return options.get('proxy_size') or DEFAULT_PROXY_SIZE
+        return options.get('proxy_size')
+
+    @staticmethod
+    def _encoder(options: Dict) -> ImageEncoder:
+        """Codificador de salida del lote: preset del nivel de calidad"""
+        return ImageEncoder(options['quality'], options.get('encoder_backend', 'cv2'),
+                            speed=options.get('encoder_speed'))
+
+    def _write_renditions(self, image, output_path: str, options: Dict,
+                          buffers: Optional[Dict] = None) -> List[Dict]:
+        """Renditions de una imagen procesada, junto a su salida completa"""
+        name = os.path.splitext(os.path.basename(output_path))[0]
+        return write_renditions(image, os.path.dirname(output_path), name,
+                                options['renditions'], options['quality'],
+                                options.get('encoder_backend', 'cv2'),
+                                options.get('encoder_speed'), buffers)
+
+    @staticmethod
+    def _output_path(input_path: str, output_dir: str, output_format: Optional[str] = None) -> str:
+        """Ruta de salida de un archivo del lote"""
+        filename = os.path.basename(input_path)
+        name, ext = os.path.splitext(filename)
+        if output_format:
+            filename = name + OUTPUT_FORMATS[output_format]
+        # OpenCV no codifica HEIC: las entradas HEIC se guardan como JPG
+        elif ext.lower() in ('.heic', '.heif'):
+            filename = name + '.jpg'
+        return os.path.join(output_dir, filename)
+
+    def _load_frame(self, input_path: str, convert_heic: bool,
+                    data: Optional[bytes] = None) -> Optional[ImageFrame]:
+        """Decodifica el archivo de entrada (o sus bytes ya leídos) en un ImageFrame"""
+        # HEIC: decodificación en memoria directamente a BGR
+        if convert_heic and input_path.lower().endswith(('.heic', '.heif')):
+            image = self.heic_converter.decode_to_array(input_path, data)
+            if image is None:
+                return None
+            return ImageFrame(image, input_path)
+        if data is not None:
+            return self.image_processor.load_frame_from_bytes(data, input_path)
+        return self.image_processor.load_frame(input_path)
+
+    def _perform_analysis(self, image: ImageSource, analysis_types: List[str],
+                          recorder: Optional[StageRecorder] = None) -> Dict:
+        """Realizar análisis pre-processing de la imagen ya decodificada"""
         results = {}
+        measure = recorder.measure if recorder is not None else (lambda *args: nullcontext())
         
         try:
             import cv2
             import numpy as np
             
-            # Cargar imagen
-            image = cv2.imread(image_path)
-            if image is None:
+            # Reutilizar el frame decodificado (o decodificar si se pasa una ruta)
+            frame = self.image_processor.load_frame(image)
+            if frame is None:
                 return results
+            image = frame.image
             
             # Análisis de histograma
             if 'histogramAnalysis' in analysis_types:
-                hist = cv2.calcHist([image], [0, 1, 2], None, [256, 256, 256], [0, 256, 0, 256, 0, 256])
-                results['histogram'] = {
-                    'channels': len(hist),
-                    'total_pixels': np.sum(hist)
-                }
+                with measure('histogramAnalysis', 'analysis'):
+                    # Histogramas compactos compartidos con las correcciones
+                    results['histogram'] = frame.histogram.to_dict()
             
             # Análisis de exposición
             if 'exposureAnalysis' in analysis_types:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                mean_brightness = np.mean(gray)
-                results['exposure'] = {
-                    'mean_brightness': round(mean_brightness, 2),
-                    'overexposed': mean_brightness > 200,
-                    'underexposed': mean_brightness < 50
-                }
+                with measure('exposureAnalysis', 'analysis'):
+                    gray = frame.gray
+                    mean_brightness = np.mean(gray)
+                    results['exposure'] = {
+                        'mean_brightness': round(mean_brightness, 2),
+                        'overexposed': mean_brightness > 200,
+                        'underexposed': mean_brightness < 50
+                    }
             
             # Análisis de color
             if 'colorAnalysis' in analysis_types:
-                mean_color = np.mean(image, axis=(0, 1))
-                results['color'] = {
-                    'mean_bgr': [round(c, 2) for c in mean_color],
-                    'color_temperature': 'warm' if mean_color[2] > mean_color[0] else 'cool'
-                }
+                with measure('colorAnalysis', 'analysis'):
+                    # La media por canal se deriva del histograma ya calculado
+                    mean_color = frame.histogram.mean()
+                    results['color'] = {
+                        'mean_bgr': [round(c, 2) for c in mean_color],
+                        'color_temperature': 'warm' if mean_color[2] > mean_color[0] else 'cool'
+                    }
             
             # Análisis de ruido
             if 'noiseAnalysis' in analysis_types:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                noise_level = np.std(gray)
-                results['noise'] = {
-                    'level': round(noise_level, 2),
-                    'high_noise': noise_level > 30
-                }
-                
+                with measure('noiseAnalysis', 'analysis'):
+                    gray = frame.gray
+                    noise_level = np.std(gray)
+                    results['noise'] = {
+                        'level': round(noise_level, 2),
+                        'high_noise': noise_level > 30
+                    }
+                    
         except Exception as e:
             logger.error(f"Error en análisis: {str(e)}")
         
         return results
 
-    def _process_single_image_professional(self, input_path: str, output_dir: str, 
-                                         quality: str, convert_heic: bool, 
-                                         corrections: List[str]) -> Optional[str]:
-        """Procesar una sola imagen con configuración profesional"""
-        try:
-            # Convertir HEIC si es necesario
-            if convert_heic and input_path.lower().endswith(('.heic', '.heif')):
-                input_path = self.heic_converter.convert_heic_to_jpg(input_path)
-            
-            # Procesar con correcciones específicas
-            output_path = os.path.join(output_dir, os.path.basename(input_path))
-            
-            # Aplicar correcciones según la configuración
-            processed_image = self.image_processor.professional_edit(
-                input_path, quality, corrections
+    def _correct_frame(self, frame: ImageFrame, options: Dict, on_stage=None,
+                       recorder: Optional[StageRecorder] = None):
+        """Aplica las correcciones del lote a una imagen ya decodificada"""
+        if options.get('memory_budget_mb'):
+            # Imágenes muy grandes: franjas con memoria acotada, escribiendo
+            # sobre el propio frame (el análisis ya se hizo)
+            tiled = TiledProcessor(self.image_processor, options['memory_budget_mb'])
+            tiled_on_stage = on_stage
+            if recorder is not None:
+                # Por franjas solo se registra el tiempo real de cada pasada
+                def tiled_on_stage(stage: str, seconds: float):
+                    recorder.record(stage, seconds)
+                    if on_stage:
+                        on_stage(stage, seconds)
+            return tiled.process(
+                frame, options['quality'], options['corrections'],
+                proxy_size=self._effective_proxy_size(options),
+                in_place=True, on_stage=tiled_on_stage
             )
-            
-            if processed_image is not None:
-                # Guardar imagen procesada
-                import cv2
-                cv2.imwrite(output_path, processed_image)
-                return output_path
-            
-        except Exception as e:
-            logger.error(f"Error procesando imagen {input_path}: {str(e)}")
-        
-        return None
+        return self.image_processor.professional_edit(
+            frame, options['quality'], options['corrections'],
+            parameter_proxy_size=options.get('proxy_size'),
+            on_stage=on_stage, recorder=recorder
+        )
+
+# Servicio y emisor de progreso por proceso del pool paralelo (se crean en el initializer)
+_pool_service = None
+_pool_progress = NULL_EMITTER
+
+def _init_pool_worker(temp_dir: str, cv2_threads: int, cache_dir: Optional[str] = None,
+                      cache_max_mb: float = DEFAULT_CACHE_MAX_MB, event_queue=None):
+    """Inicializa un proceso del pool limitando los hilos internos de OpenCV"""
+    global _pool_service, _pool_progress
+    import cv2
+    # Evitar sobresuscripción: cada proceso ya ocupa un núcleo
+    cv2.setNumThreads(max(1, cv2_threads))
+    _pool_service = ProcessingService(temp_dir, cache_dir=cache_dir, cache_max_mb=cache_max_mb)
+    if event_queue is not None:
+        _pool_progress = QueueProgressEmitter(event_queue)
+
+def _pool_process_file(args: Tuple) -> Dict:
+    """Procesa un archivo dentro de un proceso del pool"""
+    return _pool_service._process_file_professional(*args, progress=_pool_progress)
 
 def process_images(input_paths: List[str], output_dir: str, quality: str = 'high') -> Dict:
     """Función de conveniencia para procesar imágenes"""
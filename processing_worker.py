@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Worker persistente de procesamiento de imágenes
+Mantiene ProcessingService (ImageProcessor + HEICConverter) cargado en memoria
+y atiende trabajos con un protocolo JSON delimitado por líneas, vía stdin/stdout
+o mediante un socket Unix local.
+
+Protocolo (una petición JSON por línea):
+    {"id": "1", "command": "process", "input_dir": "...", "output_dir": "...",
+     "quality": "standard", "convert_heic": true,
+     "corrections": [...], "analysis": [...], "workers": 1,
+     "proxy_size": null, "memory_budget_mb": null, "encoder_backend": "cv2",
+     "renditions": ["1600:jpg", "320:jpg:fast"], "output_format": "webp",
+     "encoder_speed": "balanced", "archive_path": null,
+     "pipeline": false, "pipeline_workers": [2, 4, 2]}
+    {"id": "2", "command": "resume", "manifest_path": "..."}
+    {"id": "3", "command": "health"}
+    {"id": "4", "command": "shutdown"}
+
+Cada respuesta es una línea JSON con el mismo "id" de la petición. Las
+respuestas de "process" tienen exactamente el mismo formato que la salida
+de process_images_api.py. Con --progress-fd, los eventos de progreso de
+cada trabajo (ver progress_events) se emiten por ese descriptor con el
+campo "job_id".
+"""
+
+import sys
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import socketserver
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from processing_service import ProcessingService
+from process_images_api import run_job, run_resume
+from staged_pipeline import DEFAULT_QUEUE_SIZE, parse_stage_workers
+from result_cache import DEFAULT_CACHE_MAX_MB
+from progress_events import ProgressEmitter
+from image_encoder import ENCODER_SPEEDS, supported_output_formats
+from renditions import parse_rendition_specs
+
+logger = logging.getLogger(__name__)
+
+class ProcessingWorker:
+    """Worker de larga duración que reutiliza un ProcessingService ya inicializado"""
+
+    def __init__(self, temp_dir: str = None, cache_dir: str = None,
+                 cache_max_mb: float = DEFAULT_CACHE_MAX_MB,
+                 progress_fd: Optional[int] = None):
+        self.started_at = time.time()
+        # Eventos de progreso NDJSON de todos los trabajos, etiquetados con su id
+        self.progress_fd = progress_fd
+        # Las importaciones pesadas (cv2, numpy, skimage, PIL, pillow_heif) ya
+        # se pagaron al importar processing_service; aquí solo se construye
+        # el servicio una única vez
+        self.service = ProcessingService(temp_dir=temp_dir, cache_dir=cache_dir,
+                                         cache_max_mb=cache_max_mb)
+        self.jobs_processed = 0
+        self.jobs_failed = 0
+        self.current_job = None
+        self._job_lock = threading.Lock()
+        self._shutdown = threading.Event()
+
+    def health(self) -> Dict:
+        """Estado del worker para sondas de salud/disponibilidad"""
+        return {
+            # El lock indica si hay un trabajo en curso aunque no traiga 'id'
+            'status': 'busy' if self._job_lock.locked() else 'ready',
+            'ready': True,
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 2),
+            'jobs_processed': self.jobs_processed,
+            'jobs_failed': self.jobs_failed,
+            'current_job': self.current_job
+        }
+
+    def process(self, request: Dict) -> Dict:
+        """Ejecuta un trabajo con los mismos campos que la CLI de process_images_api.py"""
+        for field in ('input_dir', 'output_dir'):
+            if not request.get(field):
+                return {
+                    "success": False,
+                    "error": f"Campo requerido ausente: {field}"
+                }
+
+        quality = request.get('quality', 'standard')
+        if quality not in ('professional', 'standard', 'fast'):
+            return {
+                "success": False,
+                "error": f"Calidad no soportada: {quality}"
+            }
+
+        try:
+            corrections = self._parse_list(request.get('corrections', []))
+            analysis = self._parse_list(request.get('analysis', []))
+        except json.JSONDecodeError as e:
+            return {
+                "success": False,
+                "error": f"Error parseando configuración: {str(e)}"
+            }
+
+        convert_heic = bool(request.get('convert_heic', request.get('convert-heic', False)))
+
+        try:
+            workers = int(request.get('workers', 1))
+        except (TypeError, ValueError):
+            return {
+                "success": False,
+                "error": f"Número de workers inválido: {request.get('workers')}"
+            }
+
+        proxy_size = request.get('proxy_size', request.get('proxy-size'))
+        memory_budget_mb = request.get('memory_budget_mb', request.get('memory-budget-mb'))
+        encoder_backend = request.get('encoder_backend', request.get('encoder-backend', 'cv2'))
+        if encoder_backend not in ('cv2', 'pillow'):
+            return {
+                "success": False,
+                "error": f"Backend de codificación no soportado: {encoder_backend}"
+            }
+
+        output_format = request.get('output_format', request.get('output-format'))
+        if output_format is not None and output_format not in supported_output_formats():
+            return {
+                "success": False,
+                "error": f"Formato de salida no soportado: {output_format}"
+            }
+        encoder_speed = request.get('encoder_speed', request.get('encoder-speed'))
+        if encoder_speed is not None and encoder_speed not in ENCODER_SPEEDS:
+            return {
+                "success": False,
+                "error": f"Nivel de velocidad no soportado: {encoder_speed}"
+            }
+
+        try:
+            renditions = parse_rendition_specs(self._parse_list(request.get('renditions', [])))
+            pipeline_workers = parse_stage_workers(request.get('pipeline_workers'), None)
+            pipeline_queue_size = int(request.get('pipeline_queue_size', DEFAULT_QUEUE_SIZE))
+            if proxy_size is not None:
+                proxy_size = int(proxy_size)
+                if proxy_size <= 0:
+                    raise ValueError(f"proxy_size debe ser mayor que 0: {proxy_size}")
+            if memory_budget_mb is not None:
+                memory_budget_mb = float(memory_budget_mb)
+                if not 0 < memory_budget_mb < float('inf'):
+                    raise ValueError(f"memory_budget_mb debe ser mayor que 0: {memory_budget_mb}")
+        except (TypeError, ValueError) as e:
+            return {
+                "success": False,
+                "error": f"Error parseando configuración: {str(e)}"
+            }
+
+        # Un solo trabajo a la vez: el servicio se comparte entre conexiones
+        with self._job_lock:
+            self.current_job = request.get('id')
+            try:
+                response = run_job(
+                    self.service,
+                    input_dir=request['input_dir'],
+                    output_dir=request['output_dir'],
+                    quality=quality,
+                    convert_heic=convert_heic,
+                    corrections=corrections,
+                    analysis=analysis,
+                    workers=workers,
+                    proxy_size=proxy_size,
+                    memory_budget_mb=memory_budget_mb,
+                    progress=ProgressEmitter(self.progress_fd, job_id=request.get('id')),
+                    encoder_backend=encoder_backend,
+                    renditions=renditions,
+                    output_format=output_format,
+                    encoder_speed=encoder_speed,
+                    archive_path=request.get('archive_path', request.get('archive')),
+                    manifest_path=request.get('manifest_path', request.get('manifest')),
+                    pipeline=bool(request.get('pipeline', False)),
+                    pipeline_workers=pipeline_workers,
+                    pipeline_queue_size=pipeline_queue_size,
+                    instrumentation=bool(request.get('instrumentation', True))
+                )
+            finally:
+                self.current_job = None
+
+        if response['success']:
+            self.jobs_processed += 1
+        else:
+            self.jobs_failed += 1
+        return response
+
+    def resume(self, request: Dict) -> Dict:
+        """Reanuda un trabajo interrumpido a partir de su manifiesto"""
+        manifest_path = request.get('manifest_path', request.get('manifest'))
+        if not manifest_path:
+            return {
+                "success": False,
+                "error": "Campo requerido ausente: manifest_path"
+            }
+
+        try:
+            workers = request.get('workers')
+            workers = int(workers) if workers is not None else None
+        except (TypeError, ValueError):
+            return {
+                "success": False,
+                "error": f"Número de workers inválido: {request.get('workers')}"
+            }
+
+        with self._job_lock:
+            self.current_job = request.get('id')
+            try:
+                response = run_resume(
+                    self.service, manifest_path, workers=workers,
+                    progress=ProgressEmitter(self.progress_fd, job_id=request.get('id'))
+                )
+            finally:
+                self.current_job = None
+
+        if response['success']:
+            self.jobs_processed += 1
+        else:
+            self.jobs_failed += 1
+        return response
+
+    def handle(self, request: Dict) -> Dict:
+        """Despacha una petición ya decodificada y devuelve la respuesta"""
+        command = request.get('command', 'process')
+
+        if command in ('health', 'ready'):
+            response = self.health()
+        elif command == 'process':
+            response = self.process(request)
+        elif command == 'resume':
+            response = self.resume(request)
+        elif command == 'shutdown':
+            self._shutdown.set()
+            response = {'status': 'shutting_down'}
+        else:
+            response = {
+                "success": False,
+                "error": f"Comando desconocido: {command}"
+            }
+
+        if 'id' in request:
+            response = {'id': request['id'], **response}
+        return response
+
+    def parse_line(self, line: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Decodifica una línea del protocolo
+
+        Returns:
+            Tupla (petición, respuesta de error): la petición si la línea es
+            válida, la respuesta de error si no lo es; ambas None si la
+            línea está vacía
+        """
+        line = line.strip()
+        if not line:
+            return None, None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("la petición debe ser un objeto JSON")
+        except ValueError as e:
+            return None, {
+                "success": False,
+                "error": f"Petición inválida: {str(e)}"
+            }
+        return request, None
+
+    def handle_line(self, line: str) -> Optional[Dict]:
+        """Decodifica una línea del protocolo y la atiende"""
+        request, error = self.parse_line(line)
+        if request is None:
+            return error
+        return self.handle(request)
+
+    @property
+    def should_stop(self) -> bool:
+        return self._shutdown.is_set()
+
+    @staticmethod
+    def _parse_list(value):
+        """Acepta listas JSON o su representación en texto (como en la CLI)"""
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+def _ready_event(worker: ProcessingWorker) -> Dict:
+    return {'event': 'ready', **worker.health()}
+
+def serve_stdio(worker: ProcessingWorker):
+    """
+    Atiende peticiones por stdin y responde por stdout
+
+    Las sondas de salud se responden de inmediato desde el hilo lector,
+    aunque haya un trabajo en curso; los trabajos se ejecutan en orden.
+    """
+    protocol_out = sys.stdout
+    # Cualquier print accidental durante el procesamiento va a stderr para
+    # no corromper el canal del protocolo
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    def send(message: Dict):
+        with write_lock:
+            protocol_out.write(json.dumps(message) + '\n')
+            protocol_out.flush()
+
+    jobs = queue.Queue()
+
+    def reader():
+        for line in sys.stdin:
+            request, error = worker.parse_line(line)
+            if error is not None:
+                send(error)
+                continue
+            if request is None:
+                continue
+            if request.get('command', 'process') == 'process':
+                jobs.put(request)
+                continue
+            send(worker.handle(request))
+            if worker.should_stop:
+                break
+        jobs.put(None)
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    send(_ready_event(worker))
+
+    while True:
+        request = jobs.get()
+        if request is None:
+            break
+        send(worker.handle(request))
+
+class _WorkerRequestHandler(socketserver.StreamRequestHandler):
+    """Atiende una conexión del socket: una petición JSON por línea"""
+
+    def handle(self):
+        worker = self.server.worker
+        for raw_line in self.rfile:
+            response = worker.handle_line(raw_line.decode('utf-8'))
+            if response is not None:
+                self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+                self.wfile.flush()
+            if worker.should_stop:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                break
+
+class _WorkerSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve_socket(worker: ProcessingWorker, socket_path: str,
+                 on_ready: Callable[[Dict], None] = None):
+    """Atiende peticiones en un socket Unix local"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = _WorkerSocketServer(socket_path, _WorkerRequestHandler)
+    server.worker = worker
+    try:
+        if on_ready:
+            on_ready(_ready_event(worker))
+        logger.info(f"Worker escuchando en {socket_path}")
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+def main():
+    """Punto de entrada del worker persistente"""
+    parser = argparse.ArgumentParser(description='Worker persistente de procesamiento de imágenes')
+    parser.add_argument('--socket', type=str, default=None,
+                       help='Ruta de socket Unix; si se omite se usa stdin/stdout')
+    parser.add_argument('--temp-dir', type=str, default=None,
+                       help='Directorio temporal del servicio')
+    parser.add_argument('--progress-fd', type=int, default=None,
+                       help='Descriptor de archivo heredado en el que emitir eventos de progreso NDJSON')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Directorio de la caché de resultados (sin caché si se omite)')
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_CACHE_MAX_MB,
+                       help='Tamaño máximo de la caché de resultados (MB)')
+
+    args = parser.parse_args()
+
+    worker = ProcessingWorker(temp_dir=args.temp_dir, cache_dir=args.cache_dir,
+                              cache_max_mb=args.cache_max_mb,
+                              progress_fd=args.progress_fd)
+
+    if args.socket:
+        def announce(event):
+            print(json.dumps(event), flush=True)
+        serve_socket(worker, args.socket, on_ready=announce)
+    else:
+        serve_stdio(worker)
+
+if __name__ == "__main__":
+    main()
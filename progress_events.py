@@ -0,0 +1,104 @@
+"""
+Eventos de progreso estructurados
+Emite eventos JSON delimitados por líneas (NDJSON) por un descriptor de
+archivo dedicado, separado de los logs, para que el proceso que lanza el
+procesamiento (routes/image_processing.js) siga el avance sin analizar texto.
+
+Eventos (campo "event"):
+    job_started     total_files
+    file_started    file
+    analysis_done   file, seconds
+    stage_done      file, stage, seconds
+    file_written    file, output, size_bytes, seconds, cache
+    file_failed     file, error
+    job_done        processed, failed, seconds
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+import multiprocessing
+from typing import Optional
+
+class ProgressEmitter:
+    """Escribe eventos de progreso NDJSON en un descriptor de archivo"""
+
+    def __init__(self, fd: Optional[int] = None, **context):
+        """
+        Args:
+            fd: Descriptor de archivo de destino (None = eventos desactivados)
+            context: Campos añadidos a todos los eventos (p. ej. id del trabajo)
+        """
+        self.fd = fd
+        self.context = context
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.fd is not None
+
+    def emit(self, event: str, **fields):
+        """Emite un evento como una sola línea JSON"""
+        if self.fd is None:
+            return
+        message = {'event': event, 'ts': round(time.time(), 3), **self.context, **fields}
+        self.write_message(message)
+
+    def write_message(self, message: dict):
+        """Escribe un evento ya construido (p. ej. reenviado desde otro proceso)"""
+        data = (json.dumps(message) + '\n').encode('utf-8')
+        # Una línea por write(); el bucle cubre escrituras parciales en pipes llenos
+        with self._lock:
+            while data:
+                written = os.write(self.fd, data)
+                data = data[written:]
+
+class QueueProgressEmitter:
+    """
+    Emisor para procesos del pool paralelo
+
+    Los procesos hijos no escriben en el descriptor directamente: envían los
+    eventos al proceso principal, que los serializa en el canal de progreso.
+    """
+
+    def __init__(self, event_queue):
+        self.event_queue = event_queue
+
+    @property
+    def enabled(self) -> bool:
+        return True
+
+    def emit(self, event: str, **fields):
+        self.event_queue.put({'event': event, 'ts': round(time.time(), 3), **fields})
+
+class ProgressRelay:
+    """Reenvía al ProgressEmitter los eventos que llegan de los procesos del pool"""
+
+    def __init__(self, emitter: ProgressEmitter):
+        self.emitter = emitter
+        self.queue = multiprocessing.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> 'ProgressRelay':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.queue.put(None)
+        self._thread.join()
+        self.queue.close()
+
+    def _run(self):
+        while True:
+            try:
+                message = self.queue.get()
+            except (EOFError, OSError, queue.Empty):
+                break
+            if message is None:
+                break
+            self.emitter.write_message({**message, **self.emitter.context})
+
+# Emisor nulo compartido cuando no se solicita progreso
+NULL_EMITTER = ProgressEmitter(None)
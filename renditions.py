@@ -0,0 +1,145 @@
+"""
+Renditions de salida a varias resoluciones
+Describe las versiones reducidas (lado máximo, formato, calidad) que se
+generan a partir de la imagen procesada en memoria, sin volver a decodificar,
+mediante una pirámide de reducciones INTER_AREA (cada nivel desde el anterior).
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from image_encoder import ImageEncoder, ENCODER_PRESETS, PRESET_ALIASES, OUTPUT_FORMATS
+from image_stats import resize_pyramid
+
+logger = logging.getLogger(__name__)
+
+# Formato de la spec -> extensión del archivo de salida
+RENDITION_FORMATS = OUTPUT_FORMATS
+
+DEFAULT_RENDITION_FORMAT = 'jpg'
+
+RenditionSpec = Union[Dict, str, int]
+
+def parse_rendition_specs(specs: Optional[Sequence[RenditionSpec]]) -> List[Dict]:
+    """
+    Normaliza y valida una lista de specs de rendition
+
+    Cada spec puede ser un diccionario {'max_side', 'format', 'quality'},
+    un texto 'lado[:formato[:calidad]]' (p. ej. '800:jpg:fast' o '320::70')
+    o solo el lado máximo. La calidad es un nivel/preset de codificación
+    o un valor 1-100; si se omite se usa el preset del lote.
+
+    Returns:
+        Lista de specs {'max_side': int, 'format': str, 'quality': str, int o None}
+
+    Raises:
+        ValueError: Si alguna spec no es válida o hay dos con el mismo
+                    lado y formato (escribirían el mismo archivo)
+    """
+    parsed = []
+    seen = set()
+    for spec in specs or []:
+        if isinstance(spec, str):
+            parts = spec.split(':')
+            if len(parts) > 3:
+                raise ValueError(f"Rendition inválida: {spec}")
+            spec = dict(zip(('max_side', 'format', 'quality'), parts))
+        elif isinstance(spec, int):
+            spec = {'max_side': spec}
+        elif not isinstance(spec, dict):
+            raise ValueError(f"Rendition inválida: {spec}")
+
+        try:
+            max_side = int(spec.get('max_side'))
+        except (TypeError, ValueError):
+            raise ValueError(f"Lado máximo inválido en rendition: {spec}")
+        if max_side <= 0:
+            raise ValueError(f"Lado máximo inválido en rendition: {spec}")
+
+        fmt = str(spec.get('format') or DEFAULT_RENDITION_FORMAT).lower().lstrip('.')
+        if fmt not in RENDITION_FORMATS:
+            raise ValueError(f"Formato de rendition no soportado: {fmt}")
+
+        quality = spec.get('quality')
+        if quality in ('', None):
+            quality = None
+        elif str(quality).isdigit():
+            quality = int(quality)
+            if not 1 <= quality <= 100:
+                raise ValueError(f"Calidad de rendition fuera de rango: {quality}")
+        elif quality not in ENCODER_PRESETS and quality not in PRESET_ALIASES:
+            raise ValueError(f"Calidad de rendition no soportada: {quality}")
+
+        key = (max_side, RENDITION_FORMATS[fmt])
+        if key in seen:
+            raise ValueError(f"Rendition duplicada: {max_side} {fmt}")
+        seen.add(key)
+
+        parsed.append({'max_side': max_side, 'format': fmt, 'quality': quality})
+    return parsed
+
+def rendition_encoder(spec: Dict, preset: Optional[str], backend: str = 'cv2',
+                      speed: Optional[str] = None) -> ImageEncoder:
+    """Codificador de una rendition: su calidad o, si no la indica, el preset del lote"""
+    quality = spec.get('quality')
+    if isinstance(quality, int):
+        # Una calidad numérica vale para cualquier formato de salida
+        return ImageEncoder(preset, backend, quality=quality, webp_quality=quality,
+                            avif_quality=quality, speed=speed)
+    return ImageEncoder(quality or preset, backend, speed=speed)
+
+def write_renditions(image: np.ndarray, output_dir: str, name: str, specs: List[Dict],
+                     preset: Optional[str] = 'standard', backend: str = 'cv2',
+                     speed: Optional[str] = None, buffers: Optional[Dict] = None) -> List[Dict]:
+    """
+    Escribe todas las renditions de una imagen procesada
+
+    Args:
+        image: Imagen procesada BGR a resolución completa
+        output_dir: Directorio de salida
+        name: Nombre base de los archivos ('<name>_<lado><ext>')
+        specs: Specs ya normalizadas (ver parse_rendition_specs)
+        preset: Nivel de procesamiento del lote (calidad por defecto)
+        backend: Backend de codificación ('cv2' o 'pillow')
+        speed: Nivel de velocidad de WebP/AVIF (None = el del preset)
+        buffers: Si se indica, recibe ruta -> bytes codificados de cada
+                 rendition (p. ej. para añadirlas al ZIP sin releerlas)
+
+    Returns:
+        Lista con 'max_side', 'format', 'path', 'width', 'height' y
+        'size_bytes' de cada rendition escrita
+
+    Raises:
+        IOError: Si alguna rendition no se puede codificar
+    """
+    if not specs:
+        return []
+
+    # Una reducción por lado distinto; los formatos del mismo lado la comparten
+    levels = dict(resize_pyramid(image, [spec['max_side'] for spec in specs]))
+
+    written = []
+    for spec in sorted(specs, key=lambda s: s['max_side'], reverse=True):
+        level = levels[spec['max_side']]
+        ext = RENDITION_FORMATS[spec['format']]
+        output_path = os.path.join(output_dir, f"{name}_{spec['max_side']}{ext}")
+        try:
+            data = rendition_encoder(spec, preset, backend, speed).encode(level, ext)
+            with open(output_path, 'wb') as f:
+                f.write(data)
+        except Exception as e:
+            raise IOError(f"No se pudo escribir la rendition {os.path.basename(output_path)}: {e}")
+        if buffers is not None:
+            buffers[output_path] = data
+        written.append({
+            'max_side': spec['max_side'],
+            'format': spec['format'],
+            'path': output_path,
+            'width': level.shape[1],
+            'height': level.shape[0],
+            'size_bytes': len(data)
+        })
+    return written
@@ -0,0 +1,178 @@
+"""
+Caché de resultados direccionada por contenido
+Guarda en disco local las imágenes ya procesadas, indexadas por el hash de
+los bytes de entrada y de la configuración que determina el resultado
+(calidad, correcciones en orden de aplicación, versión del procesador), con
+un límite de tamaño y expulsión LRU.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tamaño máximo por defecto de la caché (MB)
+DEFAULT_CACHE_MAX_MB = 2048
+
+# La caché se comparte entre procesos (una CLI por subida, el pool, el
+# worker) y el índice en memoria no ve lo que escriben los demás: se vuelve
+# a recorrer el directorio antes de decidir si expulsar cuando el total
+# conocido se acerca al límite o el último recorrido tiene más de
+# INDEX_RESCAN_SECONDS
+INDEX_RESCAN_FRACTION = 0.9
+INDEX_RESCAN_SECONDS = 30.0
+
+class ResultCache:
+    """Caché LRU en disco de imágenes procesadas"""
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directorio de la caché (se crea si no existe)
+            max_bytes: Tamaño máximo total de las entradas
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Índice en memoria: ruta -> (tamaño, último acceso); el mtime del
+        # archivo es el último acceso y se comparte entre procesos
+        self._index = None
+        self._scanned_at = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data: bytes, quality: str, corrections: List[str],
+                 processor_version: str, extra: Optional[Dict] = None) -> str:
+        """
+        Clave de una entrada
+
+        Args:
+            data: Bytes del archivo de entrada
+            quality: Nivel de procesamiento
+            corrections: Correcciones en orden de aplicación
+            processor_version: Versión del pipeline de correcciones
+            extra: Otras opciones que cambian el resultado (p. ej. proxy_size)
+        """
+        config = {
+            'quality': quality,
+            'corrections': list(corrections),
+            'processor_version': processor_version,
+            'extra': extra or {}
+        }
+        digest = hashlib.sha256(data)
+        digest.update(b'\0')
+        digest.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + extension.lower())
+
+    def read(self, key: str, extension: str) -> Optional[bytes]:
+        """
+        Bytes del resultado en caché; quien llama escribe la salida y los
+        reutiliza en memoria (renditions, ZIP)
+
+        Returns:
+            Bytes de la entrada o None si no la hay (miss)
+        """
+        entry = self._entry_path(key, extension)
+        try:
+            with open(entry, 'rb') as f:
+                data = f.read()
+            os.utime(entry)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"No se pudo leer la entrada de caché {key}: {str(e)}")
+            return None
+
+        self._touched(entry)
+        return data
+
+    def _touched(self, entry: str):
+        """Actualiza el último acceso de una entrada en el índice en memoria"""
+        with self._lock:
+            if self._index is not None and entry in self._index:
+                self._index[entry] = (self._index[entry][0], os.path.getmtime(entry))
+
+    def put(self, key: str, extension: str, source_path: str):
+        """Guarda una copia de source_path en la caché (escritura atómica)"""
+        entry = self._entry_path(key, extension)
+        try:
+            if os.path.getsize(source_path) > self.max_bytes:
+                # Expulsaría toda la caché sin llegar a caber
+                return
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry), suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, entry)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la entrada de caché {key}: {str(e)}")
+            return
+
+        with self._lock:
+            index = self._load_index()
+            index[entry] = (os.path.getsize(entry), os.path.getmtime(entry))
+            if self._index_stale(index):
+                index = self._load_index(rescan=True)
+            self._evict(index)
+
+    def size_bytes(self) -> int:
+        """Tamaño total actual de las entradas (incluidas las de otros procesos)"""
+        with self._lock:
+            return sum(size for size, _ in self._load_index(rescan=True).values())
+
+    def _index_stale(self, index: Dict) -> bool:
+        """Indica si hay que volver a recorrer el directorio antes de expulsar"""
+        total = sum(size for size, _ in index.values())
+        return (total >= self.max_bytes * INDEX_RESCAN_FRACTION
+                or time.monotonic() - self._scanned_at >= INDEX_RESCAN_SECONDS)
+
+    def _load_index(self, rescan: bool = False) -> Dict:
+        """Índice de entradas: ruta -> (tamaño, último acceso)"""
+        if self._index is None or rescan:
+            index = {}
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith('.tmp'):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    index[path] = (stat.st_size, stat.st_mtime)
+            self._index = index
+            self._scanned_at = time.monotonic()
+        return self._index
+
+    def _evict(self, index: Dict):
+        """Elimina las entradas menos usadas hasta respetar el límite"""
+        total = sum(size for size, _ in index.values())
+        if total <= self.max_bytes:
+            return
+
+        # Por encima del límite el índice está recién recorrido (ver
+        # _index_stale): tamaños y accesos incluyen los de otros procesos
+        for path, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Ya expulsada por otro proceso
+                pass
+            except OSError as e:
+                logger.warning(f"No se pudo expulsar {path}: {str(e)}")
+                continue
+            total -= size
+            del index[path]
+        logger.info(f"Caché de resultados reducida a {total / (1024 * 1024):.1f} MB")
@@ -5,9 +5,6 @@ const path = require("path");
 const fs = require("fs");
 const { spawn } = require("child_process");
 const { v4: uuidv4 } = require("uuid");
-const { exec } = require("child_process");
-const util = require("util");
-const execAsync = util.promisify(exec);
 // Socket.IO se obtiene de la instancia de la app
 
 // Middleware de autenticación deshabilitado para pruebas
@@ -86,7 +83,9 @@ router.post("/process", upload.array("images", 20), async (req, res) => {
       quality = "standard", 
       convertHeic = true,
       corrections = "[]",
-      analysis = "[]"
+      analysis = "[]",
+      outputFormat,
+      encoderSpeed
     } = req.body;
     const userId = TEST_USER_ID; // Usar userId fijo para pruebas
     const io = req.app.get('io'); // Obtener instancia de Socket.IO
@@ -174,80 +173,82 @@ router.post("/process", upload.array("images", 20), async (req, res) => {
       currentFile: 0
     });
     
-    // Ejecutar procesamiento con progreso en tiempo real
+    // Python empaqueta cada resultado en el ZIP en cuanto lo escribe, sin
+    // un paso posterior de `zip -r` sobre el directorio de salida
+    const zipPath = path.join(__dirname, "../uploads/zips", `${jobId}.zip`);
+    fs.mkdirSync(path.dirname(zipPath), { recursive: true });
+
+    // Ejecutar procesamiento con progreso en tiempo real. Python emite
+    // eventos NDJSON por el descriptor 3, separado de stdout/stderr (logs)
     const pythonProcess = spawn('./venv/bin/python', [
       pythonScript,
       '--quality', quality,
       ...(convertHeic === 'true' ? ['--convert-heic'] : []),
       '--corrections', JSON.stringify(selectedCorrections),
       '--analysis', JSON.stringify(selectedAnalysis),
+      ...(outputFormat ? ['--output-format', outputFormat] : []),
+      ...(encoderSpeed ? ['--encoder-speed', encoderSpeed] : []),
+      '--cache-dir', path.join(__dirname, '../uploads/cache'),
+      '--archive', zipPath,
+      '--progress-fd', '3',
+      '--log-level', 'WARNING',
       tempDir,
       outputDir
     ], {
-      cwd: path.join(__dirname, '..')
+      cwd: path.join(__dirname, '..'),
+      stdio: ['ignore', 'pipe', 'pipe', 'pipe']
     });
 
     let processingOutput = '';
     let currentFileIndex = 0;
 
-    pythonProcess.stdout.on('data', (data) => {
-      const output = data.toString();
-      processingOutput += output;
-      
-      console.log('🐍 Salida de Python:', output);
-      
-      // Buscar patrones de progreso en la salida de Python
-      console.log('🔍 Buscando patrón en:', output);
-      console.log('🔍 ¿Contiene "Imagen procesada exitosamente:"?', output.includes('Imagen procesada exitosamente:'));
-      
-      if (output.includes('Imagen procesada exitosamente:')) {
-        console.log('✅ Patrón detectado! Enviando progreso...');
-        currentFileIndex++;
-        const progress = Math.round((currentFileIndex / req.files.length) * 100);
-        
-        const processingProgressData = {
-          message: `Procesando imagen ${currentFileIndex} de ${req.files.length}`,
-          progress: progress,
-          totalFiles: req.files.length,
-          currentFile: currentFileIndex,
-          fileName: output.match(/Imagen procesada exitosamente: (.+)/)?.[1] || `Imagen ${currentFileIndex}`,
-          fileIndex: currentFileIndex - 1 // Índice basado en 0
-        };
-        
-        console.log(`📤 Enviando progreso de procesamiento para archivo ${currentFileIndex - 1}:`, processingProgressData);
-        emitProgress(io, jobId, 'file-progress', processingProgressData);
-      } else {
-        console.log('❌ Patrón no detectado en esta salida');
+    const handleProgressEvent = (event) => {
+      if (event.event !== 'file_written' && event.event !== 'file_failed') {
+        return;
+      }
+
+      currentFileIndex++;
+      const progress = Math.round((currentFileIndex / req.files.length) * 100);
+
+      const processingProgressData = {
+        message: `Procesando imagen ${currentFileIndex} de ${req.files.length}`,
+        progress: progress,
+        totalFiles: req.files.length,
+        currentFile: currentFileIndex,
+        fileName: event.output || event.file || `Imagen ${currentFileIndex}`,
+        fileIndex: currentFileIndex - 1, // Índice basado en 0
+        ...(event.event === 'file_failed' ? { error: event.error } : {})
+      };
+
+      emitProgress(io, jobId, 'file-progress', processingProgressData);
+    };
+
+    // Los eventos pueden llegar partidos o agrupados entre chunks: se
+    // acumulan hasta cada salto de línea
+    let progressBuffer = '';
+    pythonProcess.stdio[3].on('data', (data) => {
+      progressBuffer += data.toString();
+      let newlineIndex;
+      while ((newlineIndex = progressBuffer.indexOf('\n')) !== -1) {
+        const line = progressBuffer.slice(0, newlineIndex).trim();
+        progressBuffer = progressBuffer.slice(newlineIndex + 1);
+        if (!line) {
+          continue;
+        }
+        try {
+          handleProgressEvent(JSON.parse(line));
+        } catch (error) {
+          console.error('Evento de progreso inválido:', line);
+        }
       }
     });
 
+    pythonProcess.stdout.on('data', (data) => {
+      processingOutput += data.toString();
+    });
+
     pythonProcess.stderr.on('data', (data) => {
-      const output = data.toString();
-      console.log('🐍 Salida de Python (stderr):', output);
-      
-      // Buscar patrones de progreso en stderr también
-      console.log('🔍 Buscando patrón en stderr:', output);
-      console.log('🔍 ¿Contiene "Imagen procesada exitosamente:"?', output.includes('Imagen procesada exitosamente:'));
-      
-      if (output.includes('Imagen procesada exitosamente:')) {
-        console.log('✅ Patrón detectado en stderr! Enviando progreso...');
-        currentFileIndex++;
-        const progress = Math.round((currentFileIndex / req.files.length) * 100);
-        
-        const processingProgressData = {
-          message: `Procesando imagen ${currentFileIndex} de ${req.files.length}`,
-          progress: progress,
-          totalFiles: req.files.length,
-          currentFile: currentFileIndex,
-          fileName: output.match(/Imagen procesada exitosamente: (.+)/)?.[1] || `Imagen ${currentFileIndex}`,
-          fileIndex: currentFileIndex - 1 // Índice basado en 0
-        };
-        
-        console.log(`📤 Enviando progreso de procesamiento para archivo ${currentFileIndex - 1}:`, processingProgressData);
-        emitProgress(io, jobId, 'file-progress', processingProgressData);
-      } else {
-        console.log('❌ Patrón no detectado en stderr');
-      }
+      console.log('🐍 Salida de Python (stderr):', data.toString());
     });
 
     // Esperar a que termine el proceso
@@ -269,21 +270,6 @@ router.post("/process", upload.array("images", 20), async (req, res) => {
       processingStats = JSON.parse(fs.readFileSync(resultFile, "utf8"));
     }
 
-    // Emitir progreso de creación de ZIP
-    emitProgress(io, jobId, 'processing', {
-      message: 'Creando archivo ZIP...',
-      progress: 95,
-      totalFiles: req.files.length,
-      currentFile: req.files.length
-    });
-
-    // Crear ZIP con resultados
-    const zipPath = path.join(__dirname, "../uploads/zips", `${jobId}.zip`);
-    fs.mkdirSync(path.dirname(zipPath), { recursive: true });
-    
-    const zipCommand = `cd "${outputDir}" && zip -r "${zipPath}" .`;
-    await execAsync(zipCommand);
-
     // Limpiar archivos temporales
     setTimeout(() => {
       try {
@@ -427,15 +413,66 @@ router.get("/status/:jobId", async (req, res) => {
  * @desc Obtener formatos soportados
  * @access Public
  */
-router.get("/formats", (req, res) => {
-  res.json({
-    success: true,
-    formats: {
-      input: [".jpg", ".jpeg", ".png", ".heic", ".heif", ".tiff", ".bmp"],
-      output: ".jpg",
-      qualityLevels: ["high", "medium", "fast"]
-    }
-  });
+// Formatos de salida que admite el encoder de Python en esta instalación
+// (AVIF solo si el plugin está disponible). Se consulta una vez y se cachea
+let encoderFormatsPromise = null;
+
+function getEncoderFormats() {
+  if (!encoderFormatsPromise) {
+    encoderFormatsPromise = new Promise((resolve, reject) => {
+      const pythonProcess = spawn('./venv/bin/python', [
+        path.join(__dirname, "../process_images_api.py"),
+        '--list-formats'
+      ], {
+        cwd: path.join(__dirname, '..'),
+        stdio: ['ignore', 'pipe', 'pipe']
+      });
+
+      let output = '';
+      pythonProcess.stdout.on('data', (data) => {
+        output += data.toString();
+      });
+      pythonProcess.on('error', reject);
+      pythonProcess.on('close', (code) => {
+        if (code !== 0) {
+          return reject(new Error(`Proceso terminó con código ${code}`));
+        }
+        try {
+          resolve(JSON.parse(output));
+        } catch (error) {
+          reject(error);
+        }
+      });
+    }).catch((error) => {
+      // No se cachea el fallo: se reintenta en la siguiente petición
+      encoderFormatsPromise = null;
+      throw error;
+    });
+  }
+  return encoderFormatsPromise;
+}
+
+router.get("/formats", async (req, res) => {
+  try {
+    const { outputFormats, encoderSpeeds } = await getEncoderFormats();
+
+    res.json({
+      success: true,
+      formats: {
+        input: [".jpg", ".jpeg", ".png", ".heic", ".heif", ".tiff", ".bmp"],
+        outputFormats,
+        encoderSpeeds,
+        qualityLevels: ["high", "medium", "fast"]
+      }
+    });
+
+  } catch (error) {
+    console.error("Error obteniendo formatos:", error);
+    res.status(500).json({
+      success: false,
+      message: "Error interno del servidor"
+    });
+  }
 });
 
 /**
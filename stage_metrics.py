@@ -0,0 +1,170 @@
+"""
+Instrumentación por etapa del procesamiento
+Mide, para cada corrección y cada análisis de una imagen (y para su
+decodificación y codificación), el tiempo real, el tiempo de CPU y el pico
+de memoria reservada, y agrega las mediciones de un trabajo en percentiles.
+
+El pico de memoria se obtiene con tracemalloc, que contabiliza las
+reservas de Python y de numpy (incluidos los arrays que devuelve OpenCV),
+pero no los temporales internos de OpenCV en C++. tracemalloc y el tiempo
+de CPU del proceso son globales: con varias imágenes en paralelo en el
+mismo proceso (modo pipeline) el pico no se mide y el tiempo de CPU es el
+del hilo que ejecuta la etapa.
+"""
+
+import time
+import logging
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Percentiles reportados por etapa en el agregado del trabajo
+METRIC_PERCENTILES = (50, 90, 99)
+
+# Marcos de pila que guarda tracemalloc por reserva: con 1 el coste es mínimo
+TRACEMALLOC_FRAMES = 1
+
+# tracemalloc lo activó este módulo (y no otro código del proceso)
+_tracing_started = False
+
+def start_memory_tracking():
+    """Activa tracemalloc en el proceso si no lo estaba"""
+    global _tracing_started
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracing_started = True
+
+def stop_memory_tracking():
+    """
+    Desactiva tracemalloc si lo activó este módulo; un proceso de larga
+    duración no debe seguir trazando reservas tras un trabajo instrumentado
+    """
+    global _tracing_started
+    if _tracing_started and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _tracing_started = False
+
+class StageSpan:
+    """Medición de un tramo de una etapa"""
+
+    __slots__ = ('wall_seconds', 'cpu_seconds', 'peak_bytes')
+
+    def __init__(self):
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_bytes = None
+
+class StageRecorder:
+    """Acumula las mediciones por etapa de una imagen"""
+
+    def __init__(self, track_memory: bool = True, concurrent: bool = False):
+        """
+        Args:
+            track_memory: Medir el pico de memoria (activa tracemalloc en el
+                          proceso si no lo estaba)
+            concurrent: Otras imágenes se miden a la vez en el mismo proceso;
+                        el pico de memoria no se mide (peak_bytes None) y el
+                        tiempo de CPU es el del hilo
+        """
+        self.track_memory = track_memory and not concurrent
+        self.concurrent = concurrent
+        if self.track_memory:
+            start_memory_tracking()
+        self.stages = {}
+
+    @contextmanager
+    def measure(self, stage: str, category: str = 'correction') -> Iterator[StageSpan]:
+        """
+        Mide un tramo de una etapa; varios tramos de la misma etapa se suman
+        (el pico de memoria es el máximo)
+
+        El tiempo de CPU es el del proceso, e incluye los hilos internos de
+        OpenCV; con concurrent es solo el del hilo actual.
+        """
+        cpu_time = time.thread_time if self.concurrent else time.process_time
+        span = StageSpan()
+        base_bytes = 0
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base_bytes = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = cpu_time()
+        try:
+            yield span
+        finally:
+            span.wall_seconds = time.perf_counter() - wall_start
+            span.cpu_seconds = cpu_time() - cpu_start
+            if self.track_memory:
+                span.peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - base_bytes)
+            self.record(stage, span.wall_seconds, span.cpu_seconds, span.peak_bytes, category)
+
+    def record(self, stage: str, wall_seconds: float, cpu_seconds: Optional[float] = None,
+               peak_bytes: Optional[int] = None, category: str = 'correction'):
+        """Añade una medición ya tomada (p. ej. de un callback on_stage)"""
+        entry = self.stages.setdefault(stage, {
+            'category': category,
+            'wall_seconds': 0.0,
+            'cpu_seconds': None,
+            'peak_bytes': None
+        })
+        entry['wall_seconds'] += wall_seconds
+        if cpu_seconds is not None:
+            entry['cpu_seconds'] = (entry['cpu_seconds'] or 0.0) + cpu_seconds
+        if peak_bytes is not None:
+            entry['peak_bytes'] = max(entry['peak_bytes'] or 0, peak_bytes)
+
+    def to_dict(self) -> Dict:
+        """Mediciones de la imagen: etapa -> wall_seconds, cpu_seconds, peak_bytes"""
+        return {
+            stage: {
+                'category': entry['category'],
+                'wall_seconds': round(entry['wall_seconds'], 5),
+                'cpu_seconds': round(entry['cpu_seconds'], 5) if entry['cpu_seconds'] is not None else None,
+                'peak_bytes': entry['peak_bytes']
+            }
+            for stage, entry in self.stages.items()
+        }
+
+def _summary(values: List[float], digits: Optional[int]) -> Dict:
+    """Percentiles, media, máximo y total (digits=None: enteros)"""
+    data = np.asarray(values, dtype=np.float64)
+    stats = {f"p{p}": float(np.percentile(data, p)) for p in METRIC_PERCENTILES}
+    stats.update(mean=float(np.mean(data)), max=float(np.max(data)), total=float(np.sum(data)))
+    return {key: round(value, digits) if digits is not None else int(round(value))
+            for key, value in stats.items()}
+
+def aggregate_stage_metrics(per_image: List[Optional[Dict]]) -> Dict:
+    """
+    Agrega las mediciones de las imágenes de un trabajo
+
+    Args:
+        per_image: Resultado de StageRecorder.to_dict por imagen (None se ignora)
+
+    Returns:
+        Etapa -> categoría, número de imágenes y percentiles/media/máximo/total
+        de wall_seconds, cpu_seconds y peak_bytes, con las etapas ordenadas
+        por tiempo total (la primera es la que domina)
+    """
+    samples = {}
+    for metrics in per_image:
+        for stage, entry in (metrics or {}).items():
+            sample = samples.setdefault(stage, {'category': entry['category'], 'wall_seconds': [],
+                                                'cpu_seconds': [], 'peak_bytes': []})
+            for key in ('wall_seconds', 'cpu_seconds', 'peak_bytes'):
+                if entry[key] is not None:
+                    sample[key].append(entry[key])
+
+    aggregated = {}
+    for stage, sample in samples.items():
+        aggregated[stage] = {
+            'category': sample['category'],
+            'images': len(sample['wall_seconds']),
+            'wall_seconds': _summary(sample['wall_seconds'], 5),
+            'cpu_seconds': _summary(sample['cpu_seconds'], 5) if sample['cpu_seconds'] else None,
+            'peak_bytes': _summary(sample['peak_bytes'], None) if sample['peak_bytes'] else None
+        }
+    return dict(sorted(aggregated.items(), key=lambda item: -item[1]['wall_seconds']['total']))
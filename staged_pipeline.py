@@ -0,0 +1,206 @@
+"""
+Pipeline por etapas con colas acotadas
+Encadena etapas (p. ej. lectura/decodificación, correcciones y
+codificación/escritura), cada una con su propio grupo de hilos, unidas por
+colas de tamaño fijo. Así la E/S de disco y los códecs se solapan con el
+cálculo, y las colas llenas frenan a las etapas anteriores (backpressure)
+para que el número de imágenes en memoria quede acotado.
+
+OpenCV y numpy liberan el GIL en sus operaciones pesadas, por lo que los
+hilos de cada etapa trabajan realmente en paralelo.
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Elementos en espera entre dos etapas (además de los que están en proceso)
+DEFAULT_QUEUE_SIZE = 2
+
+# Marca de fin de la entrada de una etapa
+_END = object()
+
+class PipelineStage:
+    """Etapa del pipeline: una función aplicada por un grupo de hilos"""
+
+    def __init__(self, name: str, func: Callable, workers: int = 1):
+        """
+        Args:
+            name: Nombre de la etapa (métricas y nombres de hilo)
+            func: Función que recibe un elemento y devuelve el elemento
+                  para la etapa siguiente; no debe lanzar excepciones (los
+                  errores se registran en el propio elemento)
+            workers: Hilos de la etapa
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self._lock = threading.Lock()
+        self._active = self.workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_input_seconds = 0.0
+        self.wait_output_seconds = 0.0
+
+    def _record(self, busy: float, wait_input: float, wait_output: float):
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += busy
+            self.wait_input_seconds += wait_input
+            self.wait_output_seconds += wait_output
+
+    def _worker_finished(self) -> bool:
+        """Marca el fin de un hilo; True si era el último de la etapa"""
+        with self._lock:
+            self._active -= 1
+            return self._active == 0
+
+    def metrics(self, wall_seconds: float) -> Dict:
+        """
+        Métricas de la etapa
+
+        'utilization' es la fracción del tiempo total que sus hilos pasaron
+        trabajando: la etapa cuello de botella está cerca de 1 y las demás
+        acumulan espera de entrada (sin trabajo) o de salida (bloqueadas
+        por la cola siguiente llena).
+        """
+        capacity = wall_seconds * self.workers
+        return {
+            'workers': self.workers,
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 4),
+            'wait_input_seconds': round(self.wait_input_seconds, 4),
+            'wait_output_seconds': round(self.wait_output_seconds, 4),
+            'utilization': round(self.busy_seconds / capacity, 3) if capacity > 0 else 0.0
+        }
+
+class StagedPipeline:
+    """Ejecuta elementos a través de una secuencia de etapas con colas acotadas"""
+
+    def __init__(self, stages: Sequence[PipelineStage], queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Args:
+            stages: Etapas en orden de ejecución
+            queue_size: Capacidad de la cola de entrada de cada etapa
+        """
+        if not stages:
+            raise ValueError("El pipeline necesita al menos una etapa")
+        self.stages = list(stages)
+        self.queue_size = max(1, int(queue_size))
+        self.wall_seconds = 0.0
+        self._cancel = threading.Event()
+
+    def run(self, items: Iterable) -> Iterator:
+        """
+        Procesa los elementos y los va devolviendo según salen de la última
+        etapa (no en el orden de entrada)
+
+        El consumo del iterador se hace en el hilo que llama, que puede así
+        registrar cada resultado sin sincronización adicional.
+        """
+        start = time.perf_counter()
+        self._cancel.clear()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        # La salida también está acotada: un consumidor lento frena al pipeline
+        output = queue.Queue(maxsize=self.queue_size)
+        queues.append(output)
+
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]),
+                                    name='pipeline-feed', daemon=True)]
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[index], queues[index + 1], self._consumers(index + 1)),
+                    name=f"pipeline-{stage.name}-{n}", daemon=True
+                ))
+        for thread in threads:
+            thread.start()
+
+        finished = False
+        try:
+            while True:
+                item = output.get()
+                if item is _END:
+                    finished = True
+                    break
+                yield item
+        finally:
+            if not finished:
+                # El llamante abandonó la iteración (p. ej. por una excepción):
+                # se deja de alimentar y se vacían las etapas sin procesar
+                self._cancel.set()
+                while output.get() is not _END:
+                    pass
+            for thread in threads:
+                thread.join()
+            self.wall_seconds = time.perf_counter() - start
+
+    def metrics(self) -> Dict:
+        """Métricas por etapa y etapa con mayor utilización de la última ejecución"""
+        stages = {stage.name: stage.metrics(self.wall_seconds) for stage in self.stages}
+        bottleneck = max(stages, key=lambda name: stages[name]['utilization'])
+        return {
+            'wall_seconds': round(self.wall_seconds, 4),
+            'queue_size': self.queue_size,
+            'stages': stages,
+            'bottleneck': bottleneck
+        }
+
+    def _consumers(self, index: int) -> int:
+        """Hilos que leen de la cola index (la salida la lee solo el llamante)"""
+        return self.stages[index].workers if index < len(self.stages) else 1
+
+    def _feed(self, items: Iterable, first: queue.Queue):
+        for item in items:
+            if self._cancel.is_set():
+                break
+            first.put(item)
+        for _ in range(self.stages[0].workers):
+            first.put(_END)
+
+    def _work(self, stage: PipelineStage, inbox: queue.Queue, outbox: queue.Queue, consumers: int):
+        while True:
+            wait_start = time.perf_counter()
+            item = inbox.get()
+            wait_input = time.perf_counter() - wait_start
+            if item is _END:
+                break
+
+            if self._cancel.is_set():
+                outbox.put(item)
+                continue
+
+            busy_start = time.perf_counter()
+            try:
+                item = stage.func(item)
+            except Exception as e:
+                # Las funciones de etapa gestionan sus errores; esto evita
+                # que un fallo inesperado deje el pipeline bloqueado
+                logger.error(f"Error inesperado en la etapa {stage.name}: {str(e)}")
+            busy = time.perf_counter() - busy_start
+
+            put_start = time.perf_counter()
+            outbox.put(item)
+            stage._record(busy, wait_input, time.perf_counter() - put_start)
+
+        # El último hilo de la etapa propaga el fin a la etapa siguiente
+        if stage._worker_finished():
+            for _ in range(consumers):
+                outbox.put(_END)
+
+def parse_stage_workers(value, default: Optional[Tuple[int, ...]] = None,
+                        stages: int = 3) -> Optional[Tuple[int, ...]]:
+    """Hilos por etapa a partir de 'lectura,proceso,escritura' o de una secuencia"""
+    if not value:
+        return default
+    if isinstance(value, str):
+        value = value.split(',')
+    workers = tuple(int(v) for v in value)
+    if len(workers) != stages or any(w < 1 for w in workers):
+        raise ValueError(f"Hilos por etapa inválidos: {value}")
+    return workers
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from image_stats import histogram_percentile
+
+@pytest.mark.parametrize('q', [0, 1, 5, 33.3, 50, 95, 99, 99.5, 100])
+def test_histogram_percentile_matches_numpy(q):
+    rng = np.random.default_rng(0)
+    for size in (1, 2, 7, 1000, 12345):
+        values = np.clip(rng.normal(200, 30, size), 0, 255).astype(np.uint8)
+        hist = np.bincount(values, minlength=256)
+        assert histogram_percentile(hist, q) == np.percentile(values, q)
+
+def test_histogram_percentile_empty():
+    assert histogram_percentile(np.zeros(256), 99) == 0.0
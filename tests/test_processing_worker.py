@@ -0,0 +1,15 @@
+from processing_worker import ProcessingWorker
+
+def test_parse_line_separates_request_from_error():
+    worker = ProcessingWorker.__new__(ProcessingWorker)
+    assert worker.parse_line('  \n') == (None, None)
+
+    request, error = worker.parse_line('{"command": "health", "error": "del cliente"}\n')
+    assert request == {'command': 'health', 'error': 'del cliente'}
+    assert error is None
+
+    for line in ('no es json', '[1, 2]'):
+        request, error = worker.parse_line(line)
+        assert request is None
+        assert error['success'] is False
+        assert error['error'].startswith('Petición inválida')
@@ -0,0 +1,29 @@
+import os
+
+from result_cache import ResultCache
+
+def disk_bytes(cache_dir):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(cache_dir) for name in files)
+
+def test_size_cap_shared_between_processes(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    source = tmp_path / 'output.jpg'
+    source.write_bytes(b'x' * 1000)
+
+    # Dos instancias con su propio índice, como dos procesos sobre uploads/cache
+    caches = [ResultCache(cache_dir, max_bytes=10000) for _ in range(2)]
+    for i in range(40):
+        caches[i % 2].put(f"{i:064x}", '.jpg', str(source))
+
+    assert disk_bytes(cache_dir) <= 10000
+    assert caches[0].size_bytes() == disk_bytes(cache_dir)
+
+def test_read_hit_and_miss(tmp_path):
+    source = tmp_path / 'output.jpg'
+    source.write_bytes(b'jpeg bytes')
+    cache = ResultCache(str(tmp_path / 'cache'))
+    cache.put('ab' * 32, '.jpg', str(source))
+
+    assert cache.read('ab' * 32, '.JPG') == b'jpeg bytes'
+    assert cache.read('cd' * 32, '.jpg') is None
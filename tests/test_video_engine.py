@@ -0,0 +1,103 @@
+import pytest
+
+from video_engine import FFmpegProgress, build_ffmpeg_command, plan_concurrency
+
+def feed_block(tracker, **values):
+    for key, value in values.items():
+        tracker.feed(f"{key}={value}\n")
+
+def test_progress_block_snapshot():
+    snapshots = []
+    tracker = FFmpegProgress(duration=10.0, callback=snapshots.append)
+    feed_block(tracker, frame=125, fps='25.00', out_time_us=5000000, speed='2.00x', progress='continue')
+
+    assert snapshots == [tracker.last]
+    assert tracker.last == {
+        'frame': 125,
+        'fps': 25.0,
+        'speed': 2.0,
+        'out_time_seconds': 5.0,
+        'percent': 50.0,
+        'eta_seconds': 2.5,
+        'done': False
+    }
+
+def test_progress_throttles_until_end():
+    snapshots = []
+    tracker = FFmpegProgress(duration=10.0, callback=snapshots.append, interval=3600)
+    for seconds in (1, 2, 3):
+        feed_block(tracker, out_time_us=seconds * 1000000, speed='1x', progress='continue')
+    feed_block(tracker, out_time_us=9990000, speed='1x', progress='end')
+
+    # La primera instantánea y la final; las intermedias caen dentro del intervalo
+    assert [s['out_time_seconds'] for s in snapshots] == [1.0, 9.99]
+    assert snapshots[-1]['percent'] == 100.0
+    assert snapshots[-1]['eta_seconds'] == 0.0
+    assert snapshots[-1]['done'] is True
+
+def test_progress_ignores_partial_and_unknown_values():
+    tracker = FFmpegProgress(duration=None)
+    tracker.feed('not a key value line\n')
+    feed_block(tracker, frame='N/A', fps='N/A', out_time_ms=3000000, speed='N/A', progress='continue')
+
+    snapshot = tracker.last
+    assert snapshot['frame'] is None
+    assert snapshot['fps'] is None
+    # out_time_ms también viene en microsegundos
+    assert snapshot['out_time_seconds'] == 3.0
+    # Sin duración no hay porcentaje ni ETA
+    assert snapshot['percent'] is None
+    assert snapshot['eta_seconds'] is None
+
+def test_progress_percent_capped_before_end():
+    tracker = FFmpegProgress(duration=10.0)
+    snapshot = tracker.snapshot({'out_time_us': '12000000', 'speed': '1x', 'progress': 'continue'})
+    assert snapshot['percent'] == 99.9
+    assert snapshot['eta_seconds'] == 0.0
+
+def test_command_x264_order():
+    cmd = build_ffmpeg_command('in.mov', 'out.mp4', 'balanced', 'ffmpeg', threads=4)
+    assert cmd == [
+        'ffmpeg', '-nostats', '-progress', 'pipe:1',
+        '-threads', '4',
+        '-i', 'in.mov',
+        '-c:v', 'libx264', '-threads', '4',
+        '-crf', '23', '-preset', 'medium',
+        '-c:a', 'aac', '-b:a', '128k',
+        '-movflags', '+faststart',
+        '-y', 'out.mp4'
+    ]
+
+def test_command_x265_pools_before_output():
+    cmd = build_ffmpeg_command('in.mov', 'out.mp4', 'ultra', 'ffmpeg', threads=6)
+    # libx265 ignora -threads: solo se limita el decodificador, el codificador va por pools
+    assert cmd.count('-threads') == 1
+    assert cmd.index('-threads') < cmd.index('-i')
+    assert cmd[-3:] == ['-x265-params', 'log-level=error:pools=6', 'out.mp4']
+    assert cmd[cmd.index('-c:v') + 1] == 'libx265'
+
+def test_command_sample_window():
+    cmd = build_ffmpeg_command('in.mov', 'sample.mkv', 'fast', 'ffmpeg', audio=False,
+                               crf=30, start=12.5, length=4)
+    assert cmd[cmd.index('-ss') + 1] == '12.500'
+    assert cmd[cmd.index('-t') + 1] == '4.000'
+    # La búsqueda es sobre la entrada: -ss y -t van antes de -i
+    assert cmd.index('-ss') < cmd.index('-t') < cmd.index('-i')
+    assert cmd[cmd.index('-crf') + 1] == '30'
+    assert '-an' in cmd and '-c:a' not in cmd
+    # -movflags solo en contenedores MP4/MOV
+    assert '-movflags' not in cmd
+    assert '-threads' not in cmd
+
+@pytest.mark.parametrize('preset, files, cores, expected', [
+    ('balanced', 10, 8, (4, 2)),
+    ('ultra', 10, 8, (2, 4)),
+    ('ultra', 10, 4, (1, None)),
+    ('fast', 3, 16, (3, 5)),
+    ('balanced', 1, 16, (1, None)),
+])
+def test_plan_concurrency(preset, files, cores, expected):
+    assert plan_concurrency(preset, files, cores) == expected
+
+def test_plan_concurrency_max_jobs():
+    assert plan_concurrency('fast', 10, 16, max_jobs=2) == (2, 8)
@@ -0,0 +1,73 @@
+import pytest
+
+from video_engine import COMPRESSION_PRESETS
+from video_preset_selector import (DEFAULT_CANDIDATES, choose_candidate, parse_candidates,
+                                   sample_windows)
+
+def candidate(preset, size, seconds):
+    return {'preset': preset, 'crf': COMPRESSION_PRESETS[preset]['crf'],
+            'estimated_size_bytes': size, 'estimated_encode_seconds': seconds}
+
+CANDIDATES = [
+    candidate('ultra', 1000, 400.0),
+    candidate('high', 1030, 200.0),
+    candidate('balanced', 1500, 60.0),
+    candidate('fast', 2200, 20.0),
+]
+
+def test_parse_candidates_defaults():
+    parsed = parse_candidates()
+    assert [c['preset'] for c in parsed] == list(DEFAULT_CANDIDATES)
+    assert all(c['crf'] == COMPRESSION_PRESETS[c['preset']]['crf'] for c in parsed)
+
+def test_parse_candidates_custom_crf():
+    assert parse_candidates(['balanced:26', 'fast']) == [
+        {'preset': 'balanced', 'crf': 26},
+        {'preset': 'fast', 'crf': COMPRESSION_PRESETS['fast']['crf']},
+    ]
+
+@pytest.mark.parametrize('value', ['medium', 'fast:52', 'fast:x', 'fast:-1'])
+def test_parse_candidates_invalid(value):
+    with pytest.raises(ValueError):
+        parse_candidates([value])
+
+def test_sample_windows_short_video():
+    assert sample_windows(10.0, windows=3, seconds=4.0) == [{'start': 0.0, 'seconds': 10.0}]
+
+def test_sample_windows_spread():
+    windows = sample_windows(100.0, windows=3, seconds=4.0)
+    assert windows == [
+        {'start': 23.0, 'seconds': 4.0},
+        {'start': 48.0, 'seconds': 4.0},
+        {'start': 73.0, 'seconds': 4.0},
+    ]
+
+def test_choose_without_targets_fastest_near_smallest():
+    choice = choose_candidate([dict(c) for c in CANDIDATES])
+    # 'high' está a un 3 % de 'ultra' y tarda la mitad
+    assert choice['candidate']['preset'] == 'high'
+    assert choice['reason'] == 'fastest_near_smallest'
+
+def test_choose_size_target_fastest_meeting():
+    choice = choose_candidate([dict(c) for c in CANDIDATES], target_size_bytes=1600)
+    assert choice['candidate']['preset'] == 'balanced'
+    assert choice['reason'] == 'fastest_meeting_target'
+
+def test_choose_time_budget_smallest_within():
+    choice = choose_candidate([dict(c) for c in CANDIDATES], time_budget_seconds=100.0)
+    assert choice['candidate']['preset'] == 'balanced'
+    assert choice['reason'] == 'smallest_within_budget'
+
+def test_choose_unreachable_targets():
+    choice = choose_candidate([dict(c) for c in CANDIDATES], target_size_bytes=500)
+    assert choice['candidate']['preset'] == 'ultra'
+    assert choice['reason'] == 'no_candidate_meets_target_smallest'
+
+    choice = choose_candidate([dict(c) for c in CANDIDATES], time_budget_seconds=5.0)
+    assert choice['candidate']['preset'] == 'fast'
+    assert choice['reason'] == 'no_candidate_meets_budget_fastest'
+
+def test_choose_marks_candidates_against_target():
+    candidates = [dict(c) for c in CANDIDATES]
+    choose_candidate(candidates, target_size_bytes=1600, time_budget_seconds=100.0)
+    assert [c['meets_target'] for c in candidates] == [False, False, True, False]
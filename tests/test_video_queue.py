@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import stat
+import textwrap
+
+from video_engine import VideoEngine
+from video_queue import VideoQueue
+
+DURATION = 8.0
+
+# FFmpeg falso: escribe bloques de -progress en stdout y la salida en el último argumento
+FAKE_FFMPEG = textwrap.dedent('''
+    import sys
+    args = sys.argv[1:]
+    if args == ['-version']:
+        print('ffmpeg fake')
+        sys.exit(0)
+    sys.stderr.write('fake encoder started\\n')
+    for frame, seconds in ((100, 4), (200, 8)):
+        sys.stdout.write(f"frame={frame}\\nfps=50.0\\nout_time_us={seconds * 1000000}\\n"
+                         f"speed=2.0x\\nprogress={'end' if seconds == 8 else 'continue'}\\n")
+        sys.stdout.flush()
+    with open(args[-1], 'wb') as f:
+        f.write(b'x' * 1000)
+''')
+
+FAKE_FFPROBE = textwrap.dedent('''
+    import json
+    print(json.dumps({
+        'format': {'duration': '%s'},
+        'streams': [{'codec_type': 'video', 'codec_name': 'h264', 'avg_frame_rate': '25/1'},
+                    {'codec_type': 'audio'}]
+    }))
+''' % DURATION)
+
+class RecordingEmitter:
+    """Emisor de progreso que guarda los eventos en memoria"""
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, **fields):
+        self.events.append({'event': event, **fields})
+
+    def named(self, event):
+        return [e for e in self.events if e['event'] == event]
+
+def write_script(path, source):
+    path.write_text(f"#!{sys.executable}\n{source}")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+def test_queue_run_with_fake_ffmpeg(tmp_path):
+    engine = VideoEngine(ffmpeg=write_script(tmp_path / 'ffmpeg', FAKE_FFMPEG),
+                         ffprobe=write_script(tmp_path / 'ffprobe', FAKE_FFPROBE))
+    inputs = []
+    for name in ('a.mov', 'b.mov'):
+        path = tmp_path / name
+        path.write_bytes(b'v' * 4000)
+        inputs.append(str(path))
+    output_dir = tmp_path / 'out'
+
+    progress = RecordingEmitter()
+    video_queue = VideoQueue(engine, cpu_count=4)
+    video_queue.extend(inputs)
+    result = video_queue.run(str(output_dir), 'fast', progress=progress)
+
+    assert result['successful_files'] == 2
+    assert (result['jobs'], result['threads']) == (2, 2)
+    assert result['compression_ratio'] == 0.25
+    for file_result in result['files']:
+        assert file_result['success'], file_result['error']
+        assert os.path.getsize(file_result['output_path']) == 1000
+        # Fotogramas y velocidad salen del último bloque de -progress
+        assert file_result['frames'] == 200
+        assert file_result['duration_seconds'] == DURATION
+
+    assert progress.named('video_job_started') == [
+        {'event': 'video_job_started', 'total_files': 2, 'jobs': 2, 'threads': 2}]
+    updates = progress.named('video_progress')
+    assert {e['file'] for e in updates} == {'a.mov', 'b.mov'}
+    assert {e['percent'] for e in updates} <= {50.0, 100.0}
+    assert all(e['speed'] == 2.0 for e in updates)
+    done = progress.named('video_done')
+    assert [e['completed'] for e in done] == [1, 2]
+    assert done[-1]['percent'] == 100.0
+    assert progress.events[-1]['event'] == 'video_job_done'
+    assert progress.events[-1]['processed'] == 2
+    json.dumps(result)
@@ -0,0 +1,40 @@
+from video_segments import (_concat_list_line, auto_segments, plan_segment_concurrency,
+                            plan_segment_times)
+
+KEYFRAMES_2S = [i * 2.0 for i in range(31)]
+
+def test_segment_times_even_split():
+    assert plan_segment_times(KEYFRAMES_2S, 60.0, 3) == [20.0, 40.0]
+
+def test_segment_times_snap_to_nearest_keyframe():
+    keyframes = [0.0, 13.0, 31.0, 44.0, 58.0]
+    assert plan_segment_times(keyframes, 60.0, 3) == [13.0, 44.0]
+
+def test_segment_times_respect_min_seconds():
+    cuts = plan_segment_times(KEYFRAMES_2S, 30.0, 6, min_seconds=10)
+    bounds = [0.0] + cuts + [30.0]
+    assert cuts
+    assert all(b - a >= 10 for a, b in zip(bounds, bounds[1:]))
+
+def test_segment_times_single_segment():
+    assert plan_segment_times(KEYFRAMES_2S, 60.0, 1) == []
+    assert plan_segment_times(KEYFRAMES_2S, None, 4) == []
+    assert plan_segment_times([], 60.0, 4) == []
+
+def test_concat_list_line_quoting():
+    assert _concat_list_line('/tmp/it\'s a clip.mkv') == "file '/tmp/it'\\''s a clip.mkv'\n"
+
+def test_concat_list_line_absolute(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert _concat_list_line('chunk.mkv') == f"file '{tmp_path / 'chunk.mkv'}'\n"
+
+def test_segment_concurrency_uses_all_cores():
+    assert plan_segment_concurrency(4, 16) == (4, 4)
+    assert plan_segment_concurrency(32, 16) == (16, 1)
+    assert plan_segment_concurrency(5, 1) == (1, None)
+
+def test_auto_segments():
+    assert auto_segments(600.0, 16) == 16
+    assert auto_segments(600.0, 128) == 60
+    assert auto_segments(25.0, 16) == 2
+    assert auto_segments(None, 16) == 1
@@ -0,0 +1,400 @@
+"""
+Procesamiento por franjas para imágenes muy grandes
+Ejecuta la cadena de correcciones de ImageProcessor sobre franjas
+horizontales con márgenes calculados según el alcance de cada filtro
+(bilateral, kernel de filter2D), de modo que la memoria de trabajo queda
+acotada por un presupuesto y no por el tamaño de la imagen.
+
+CLAHE no se puede calcular por franjas con cv2.CLAHE (cada tile depende de
+su histograma completo), así que se replica su algoritmo en dos fases: los
+histogramas de los tiles se acumulan franja a franja durante la pasada
+anterior y, una vez construidas las LUTs de todos los tiles, la
+interpolación bilineal se aplica por franjas sin margen. El resultado es
+idéntico al de professional_edit con los mismos parámetros.
+"""
+
+import math
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import color_lut
+from image_processor import (ImageProcessor, ImageSource, CORRECTION_ORDER,
+                             DEFAULT_CORRECTIONS, DEFAULT_PROXY_SIZE)
+
+logger = logging.getLogger(__name__)
+
+# Bytes de trabajo por píxel de franja (copias BGR/LAB, planos en float32
+# de la interpolación de CLAHE, salida de los filtros)
+WORKING_BYTES_PER_PIXEL = 64
+
+# Presupuesto de memoria por defecto para las franjas (MB)
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Altura mínima de una franja aunque el presupuesto no alcance
+MIN_STRIP_ROWS = 16
+
+_HIST_SIZE = 256
+
+class _Stage:
+    """Etapa de la cadena con su tipo y alcance espacial"""
+
+    def __init__(self, kind: str, correction: Optional[str] = None,
+                 params: Optional[Dict] = None, radius: int = 0,
+                 ops: Optional[List] = None):
+        self.kind = kind              # 'lut', 'clahe' o 'filter'
+        self.correction = correction
+        self.params = params
+        self.radius = radius          # Alcance en filas de los filtros
+        self.ops = ops                # Operaciones LUT (kind == 'lut')
+        self.geometry = None          # Geometría de tiles (kind == 'clahe')
+        self.tile_luts = None         # LUTs por tile, tras acumular histogramas
+
+def clahe_geometry(height: int, width: int, tile_size: Tuple[int, int]) -> Dict:
+    """
+    Geometría de tiles que usa cv2.CLAHE para una imagen completa
+
+    OpenCV rellena la imagen (BORDER_REFLECT_101) hasta un múltiplo de la
+    rejilla cuando alguna dimensión no es divisible; se replica la misma regla.
+    """
+    tiles_x, tiles_y = tile_size
+    if width % tiles_x == 0 and height % tiles_y == 0:
+        ext_height, ext_width = height, width
+    else:
+        ext_height = height + tiles_y - (height % tiles_y)
+        ext_width = width + tiles_x - (width % tiles_x)
+    return {
+        'tiles_x': tiles_x,
+        'tiles_y': tiles_y,
+        'tile_height': ext_height // tiles_y,
+        'tile_width': ext_width // tiles_x,
+        'height': height,
+        'width': width,
+        'ext_height': ext_height,
+        'ext_width': ext_width
+    }
+
+def accumulate_tile_histograms(hist: np.ndarray, l_rows: np.ndarray, top: int,
+                               geometry: Dict):
+    """
+    Suma a hist (tiles_y, tiles_x, 256) los histogramas de un bloque de filas
+
+    Args:
+        hist: Histogramas acumulados por tile
+        l_rows: Canal L de las filas [top, top + len(l_rows)) de la imagen
+        top: Fila de la imagen en la que empieza el bloque
+        geometry: Geometría de clahe_geometry
+    """
+    tile_height = geometry['tile_height']
+    tile_width = geometry['tile_width']
+    height = geometry['height']
+
+    pad_right = geometry['ext_width'] - geometry['width']
+    if pad_right:
+        l_rows = cv2.copyMakeBorder(l_rows, 0, 0, 0, pad_right, cv2.BORDER_REFLECT_101)
+
+    def add(block: np.ndarray, tile_row: int):
+        for tx in range(geometry['tiles_x']):
+            tile = block[:, tx * tile_width:(tx + 1) * tile_width]
+            hist[tile_row, tx] += cv2.calcHist([tile], [0], None, [_HIST_SIZE],
+                                               [0, _HIST_SIZE]).ravel()
+
+    # Filas propias, agrupadas por fila de tiles
+    y = top
+    bottom = top + len(l_rows)
+    while y < bottom:
+        tile_row = y // tile_height
+        end = min(bottom, (tile_row + 1) * tile_height)
+        add(l_rows[y - top:end - top], tile_row)
+        y = end
+
+    # Filas reflejadas en el relleno inferior (y' = 2 * (height - 1) - y)
+    pad_bottom = geometry['ext_height'] - height
+    if pad_bottom:
+        rows = np.arange(top, bottom)
+        mirrored = 2 * (height - 1) - rows
+        selected = (mirrored >= height) & (mirrored < geometry['ext_height'])
+        for tile_row in np.unique(mirrored[selected] // tile_height):
+            in_tile = selected & (mirrored // tile_height == tile_row)
+            add(l_rows[in_tile], int(tile_row))
+
+def clahe_tile_luts(hist: np.ndarray, clip_limit: float, geometry: Dict) -> np.ndarray:
+    """
+    LUTs por tile con el mismo recorte y redistribución que cv2.CLAHE
+
+    Returns:
+        Array uint8 (tiles_y, tiles_x, 256)
+    """
+    tile_area = geometry['tile_height'] * geometry['tile_width']
+    limit = max(int(clip_limit * tile_area / _HIST_SIZE), 1)
+    scale = np.float32((_HIST_SIZE - 1) / tile_area)
+
+    tile_hists = hist.reshape(-1, _HIST_SIZE).astype(np.int64)
+    luts = np.empty(tile_hists.shape, dtype=np.uint8)
+    for i, tile_hist in enumerate(tile_hists):
+        clipped = int(np.maximum(tile_hist - limit, 0).sum())
+        tile_hist = np.minimum(tile_hist, limit)
+
+        redist_batch = clipped // _HIST_SIZE
+        residual = clipped - redist_batch * _HIST_SIZE
+        tile_hist += redist_batch
+        if residual:
+            step = max(_HIST_SIZE // residual, 1)
+            tile_hist[np.arange(0, _HIST_SIZE, step)[:residual]] += 1
+
+        cdf = np.cumsum(tile_hist).astype(np.float32)
+        luts[i] = np.clip(np.rint(cdf * scale), 0, 255).astype(np.uint8)
+
+    return luts.reshape(hist.shape)
+
+def apply_tile_luts(l_rows: np.ndarray, top: int, tile_luts: np.ndarray,
+                    geometry: Dict) -> np.ndarray:
+    """Interpolación bilineal entre las LUTs de los tiles vecinos (como cv2.CLAHE)"""
+    tiles_y, tiles_x = tile_luts.shape[:2]
+    rows, width = l_rows.shape
+
+    # Misma aritmética en float32 que OpenCV
+    inv_tw = np.float32(1.0) / np.float32(geometry['tile_width'])
+    inv_th = np.float32(1.0) / np.float32(geometry['tile_height'])
+
+    txf = np.arange(width, dtype=np.float32) * inv_tw - np.float32(0.5)
+    tx1 = np.floor(txf).astype(np.intp)
+    xa = txf - tx1.astype(np.float32)
+    xa1 = np.float32(1.0) - xa
+    tx2 = np.minimum(tx1 + 1, tiles_x - 1)
+    tx1 = np.maximum(tx1, 0)
+
+    tyf = np.arange(top, top + rows, dtype=np.float32) * inv_th - np.float32(0.5)
+    ty1 = np.floor(tyf).astype(np.intp)
+    ya = (tyf - ty1.astype(np.float32))[:, None]
+    ya1 = np.float32(1.0) - ya
+    ty2 = np.minimum(ty1 + 1, tiles_y - 1)[:, None]
+    ty1 = np.maximum(ty1, 0)[:, None]
+
+    luts = tile_luts.astype(np.float32)
+    res = (luts[ty1, tx1, l_rows] * xa1 + luts[ty1, tx2, l_rows] * xa) * ya1
+    res += (luts[ty2, tx1, l_rows] * xa1 + luts[ty2, tx2, l_rows] * xa) * ya
+    return np.clip(np.rint(res), 0, 255).astype(np.uint8)
+
+class TiledProcessor:
+    """Ejecuta professional_edit por franjas con memoria acotada"""
+
+    def __init__(self, processor: Optional[ImageProcessor] = None,
+                 memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB):
+        self.processor = processor or ImageProcessor()
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+
+    def process(self, image: ImageSource, quality: str = 'standard',
+                corrections: List[str] = None, params: Optional[Dict] = None,
+                proxy_size: Optional[int] = DEFAULT_PROXY_SIZE,
+                in_place: bool = False,
+                on_stage: Optional[Callable[[str, float], None]] = None) -> Optional[np.ndarray]:
+        """
+        Procesa la imagen por franjas
+
+        Args:
+            image: Ruta, array BGR o ImageFrame
+            quality: Nivel de procesamiento
+            corrections: Lista de correcciones a aplicar
+            params: Parámetros ya estimados; si faltan se estiman sobre un
+                    proxy, ya que las decisiones deben ser globales
+            proxy_size: Lado mayor del proxy para estimar parámetros
+            in_place: Escribir el resultado sobre el array de entrada para
+                      no reservar una segunda imagen completa
+            on_stage: Callback (etapa, segundos) al terminar cada pasada; la
+                      etapa es la lista de correcciones de la pasada unidas por '+'
+
+        Returns:
+            Imagen procesada o None si hay error
+        """
+        if corrections is None:
+            corrections = DEFAULT_CORRECTIONS
+
+        try:
+            frame = self.processor.load_frame(image)
+            if frame is None:
+                return None
+            src = frame.image
+
+            if params is None:
+                params = self.processor.estimate_parameters(frame, quality, corrections, proxy_size)
+
+            height, width = src.shape[:2]
+            stages = self._build_stages(corrections, params, height, width)
+            passes = self._split_passes(stages)
+            margin = max(self._margin(stages_in_pass) for stages_in_pass in passes)
+            rows = self._rows_per_strip(width, margin)
+
+            if rows >= height:
+                logger.info("Procesamiento por franjas no necesario; se procesa la imagen completa")
+                return self.processor.professional_edit(frame, quality, corrections, params=params,
+                                                        on_stage=on_stage)
+
+            logger.info(f"Procesando por franjas: {len(passes)} pasadas de "
+                        f"{math.ceil(height / rows)} franjas de {rows} filas")
+
+            output = src if in_place else np.empty_like(src)
+            source = src
+            for index, stages_in_pass in enumerate(passes):
+                # Si la siguiente pasada empieza con CLAHE, sus histogramas se
+                # acumulan sobre la salida de esta
+                next_clahe = None
+                if index + 1 < len(passes):
+                    next_clahe = passes[index + 1][0]
+
+                pass_start = time.perf_counter()
+                self._run_pass(source, output, stages_in_pass, rows, quality, next_clahe)
+                source = output
+                if on_stage and stages_in_pass:
+                    on_stage(self._pass_name(stages_in_pass), time.perf_counter() - pass_start)
+
+                if next_clahe is not None:
+                    logger.info(f"LUTs de CLAHE calculadas para {next_clahe.correction}")
+
+            return output
+
+        except Exception as e:
+            logger.error(f"Error en procesamiento por franjas: {str(e)}")
+            return None
+
+    def _build_stages(self, corrections: List[str], params: Dict,
+                      height: int, width: int) -> List[_Stage]:
+        """Convierte la cadena de correcciones en etapas con su alcance"""
+        stages = []
+        for correction in CORRECTION_ORDER:
+            if correction not in corrections:
+                continue
+            stage_params = params.get(correction)
+            ops = self.processor.point_ops(correction, stage_params)
+
+            if ops is not None:
+                # Correcciones puntuales consecutivas: una sola etapa LUT
+                if stages and stages[-1].kind == 'lut':
+                    stages[-1].ops.extend(ops)
+                else:
+                    stages.append(_Stage('lut', ops=list(ops)))
+            elif correction in ('exposureCorrection', 'contrastEnhancement'):
+                stage = _Stage('clahe', correction, stage_params)
+                stage.geometry = clahe_geometry(height, width, tuple(stage_params['tile_size']))
+                stages.append(stage)
+            elif correction == 'noiseReduction':
+                if stage_params['d']:
+                    stages.append(_Stage('filter', correction, stage_params,
+                                         radius=stage_params['d'] // 2))
+            elif correction == 'detailEnhancement':
+                # bilateralFilter(d=9)
+                stages.append(_Stage('filter', correction, radius=4))
+            elif correction == 'sharpening':
+                # filter2D con kernel 3x3
+                stages.append(_Stage('filter', correction, radius=1))
+            else:
+                raise ValueError(f"Corrección sin soporte por franjas: {correction}")
+        return stages
+
+    @staticmethod
+    def _split_passes(stages: List[_Stage]) -> List[List[_Stage]]:
+        """
+        Divide la cadena en pasadas que terminan antes de cada CLAHE
+
+        Cada CLAHE necesita los histogramas de la imagen completa en su
+        entrada, que solo están disponibles al terminar la pasada anterior.
+        La primera pasada puede quedar vacía (solo acumula histogramas).
+        """
+        passes = [[]]
+        for stage in stages:
+            if stage.kind == 'clahe':
+                passes.append([])
+            passes[-1].append(stage)
+        return passes
+
+    @staticmethod
+    def _pass_name(stages: List[_Stage]) -> str:
+        names = []
+        for stage in stages:
+            if stage.kind == 'lut':
+                names.append('pointOps')
+            else:
+                names.append(stage.correction)
+        return '+'.join(names)
+
+    @staticmethod
+    def _margin(stages: List[_Stage]) -> int:
+        """
+        Margen (filas) que debe añadirse a cada lado de una franja
+
+        Dentro de una pasada los filtros encadenados suman sus radios; CLAHE
+        con LUTs globales es puntual y no añade margen.
+        """
+        return sum(stage.radius for stage in stages if stage.kind == 'filter')
+
+    def _rows_per_strip(self, width: int, margin: int) -> int:
+        """Filas útiles por franja según el presupuesto de memoria"""
+        bytes_per_row = width * WORKING_BYTES_PER_PIXEL
+        budget_rows = self.memory_budget_bytes // max(bytes_per_row, 1)
+        rows = budget_rows - 2 * margin
+        if rows < MIN_STRIP_ROWS:
+            logger.warning("Presupuesto de memoria insuficiente para el margen requerido; "
+                           "se usa la franja mínima")
+            rows = MIN_STRIP_ROWS
+        return rows
+
+    def _run_pass(self, source: np.ndarray, output: np.ndarray, stages: List[_Stage],
+                  rows: int, quality: str, next_clahe: Optional[_Stage]):
+        """
+        Recorre la imagen de arriba abajo aplicando las etapas de una pasada
+
+        source y output pueden ser el mismo array: las filas originales que
+        la franja siguiente necesita como margen superior se guardan antes
+        de sobrescribirlas.
+        """
+        height = source.shape[0]
+        margin = self._margin(stages)
+        writes = bool(stages) or source is not output
+
+        hist = None
+        if next_clahe is not None:
+            geometry = next_clahe.geometry
+            hist = np.zeros((geometry['tiles_y'], geometry['tiles_x'], _HIST_SIZE),
+                            dtype=np.float64)
+
+        carry = source[0:0].copy()
+        for top in range(0, height, rows):
+            bottom = min(top + rows, height)
+            below = min(bottom + margin, height)
+            strip = np.concatenate([carry, source[top:below]]) if margin else source[top:below]
+            strip_top = top - len(carry)
+
+            if margin:
+                carry = np.concatenate([carry, source[top:bottom]])[-margin:].copy()
+
+            result = self._process_strip(strip, stages, strip_top, quality)
+            core = result[top - strip_top:bottom - strip_top]
+
+            if hist is not None:
+                lab = cv2.cvtColor(core, cv2.COLOR_BGR2LAB)
+                accumulate_tile_histograms(hist, np.ascontiguousarray(lab[:, :, 0]),
+                                           top, next_clahe.geometry)
+            if writes:
+                output[top:bottom] = core
+
+        if next_clahe is not None:
+            next_clahe.tile_luts = clahe_tile_luts(hist, next_clahe.params['clip_limit'],
+                                                   next_clahe.geometry)
+
+    def _process_strip(self, strip: np.ndarray, stages: List[_Stage], strip_top: int,
+                       quality: str) -> np.ndarray:
+        """Aplica las etapas de una pasada a una franja"""
+        for stage in stages:
+            if stage.kind == 'lut':
+                strip = color_lut.apply_ops(strip, stage.ops)
+            elif stage.kind == 'clahe':
+                lab = cv2.cvtColor(strip, cv2.COLOR_BGR2LAB)
+                lab[:, :, 0] = apply_tile_luts(lab[:, :, 0], strip_top,
+                                               stage.tile_luts, stage.geometry)
+                strip = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+            else:
+                strip = self.processor.apply_stage(stage.correction, strip, stage.params, quality)
+        return strip
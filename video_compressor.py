@@ -10,8 +10,7 @@ from tkinter import ttk, filedialog, messagebox
 import subprocess
 import os
 import threading
-from pathlib import Path
-import json
+from video_engine import COMPRESSION_PRESETS, VideoEngine, build_ffmpeg_command, output_name_for, probe_video
 
 class VideoCompressor:
     def __init__(self, root):
@@ -26,44 +25,8 @@ class VideoCompressor:
         self.compression_level = tk.StringVar(value="balanced")
         self.progress_var = tk.DoubleVar()
         
-        # Configuraciones de compresión
-        self.compression_presets = {
-            "ultra": {
-                "name": "Ultra Compresión (H.265) ⚠️",
-                "crf": 28,
-                "preset": "slow",
-                "codec": "libx265",
-                "description": "Máxima compresión, mejor calidad, más lento - REQUIERE CODECS HEVC"
-            },
-            "high": {
-                "name": "Alta Compresión (H.265) ⚠️",
-                "crf": 23,
-                "preset": "medium",
-                "codec": "libx265", 
-                "description": "Alta compresión, muy buena calidad - REQUIERE CODECS HEVC"
-            },
-            "balanced": {
-                "name": "Balanceado (H.264) ✅",
-                "crf": 23,
-                "preset": "medium",
-                "codec": "libx264",
-                "description": "Balance perfecto entre tamaño y velocidad - COMPATIBLE UNIVERSAL"
-            },
-            "fast": {
-                "name": "Rápido (H.264) ✅",
-                "crf": 28,
-                "preset": "fast",
-                "codec": "libx264",
-                "description": "Compresión rápida, archivo más grande - COMPATIBLE UNIVERSAL"
-            },
-            "lossless": {
-                "name": "Sin Pérdida (H.264) ✅",
-                "crf": 0,
-                "preset": "slow",
-                "codec": "libx264",
-                "description": "Sin pérdida de calidad, archivo muy grande - COMPATIBLE UNIVERSAL"
-            }
-        }
+        # Configuraciones de compresión (compartidas con video_engine)
+        self.compression_presets = COMPRESSION_PRESETS
         
         self.setup_ui()
         self.check_ffmpeg()
@@ -210,31 +173,15 @@ class VideoCompressor:
             size_mb = file_size / (1024 * 1024)
             
             # Obtener información del video con FFprobe
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-print_format', 'json', 
-                '-show_format', '-show_streams', file_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                info = json.loads(result.stdout)
-                video_stream = next((s for s in info['streams'] if s['codec_type'] == 'video'), None)
-                
-                if video_stream:
-                    duration = float(info['format']['duration'])
-                    width = video_stream['width']
-                    height = video_stream['height']
-                    fps = eval(video_stream['r_frame_rate'])
-                    
-                    info_text = f"📁 {os.path.basename(file_path)} | "
-                    info_text += f"📏 {width}x{height} | "
-                    info_text += f"⏱️ {duration:.1f}s | "
-                    info_text += f"🎞️ {fps:.1f}fps | "
-                    info_text += f"💾 {size_mb:.1f}MB"
-                    
-                    self.info_label.config(text=info_text)
-                else:
-                    self.info_label.config(text=f"📁 {os.path.basename(file_path)} | 💾 {size_mb:.1f}MB")
+            info = probe_video(file_path)
+            if info and info['duration'] and info['fps']:
+                info_text = f"📁 {os.path.basename(file_path)} | "
+                info_text += f"📏 {info['width']}x{info['height']} | "
+                info_text += f"⏱️ {info['duration']:.1f}s | "
+                info_text += f"🎞️ {info['fps']:.1f}fps | "
+                info_text += f"💾 {size_mb:.1f}MB"
+
+                self.info_label.config(text=info_text)
             else:
                 self.info_label.config(text=f"📁 {os.path.basename(file_path)} | 💾 {size_mb:.1f}MB")
                 
@@ -273,9 +220,8 @@ class VideoCompressor:
             output_folder = self.output_folder.get()
             
             # Generar nombre de archivo de salida
-            input_name = Path(input_path).stem
             preset = self.compression_presets[self.compression_level.get()]
-            output_name = f"{input_name}_compressed_{self.compression_level.get()}.mp4"
+            output_name = output_name_for(input_path, self.compression_level.get())
             output_path = os.path.join(output_folder, output_name)
             
             self.log(f"🎬 Iniciando compresión: {os.path.basename(input_path)}")
@@ -283,66 +229,22 @@ class VideoCompressor:
             self.log(f"⚙️ Preset: {preset['name']}")
             
             # Comando FFmpeg optimizado
-            cmd = [
-                'ffmpeg',
-                '-i', input_path,
-                '-c:v', preset['codec'],
-                '-crf', str(preset['crf']),
-                '-preset', preset['preset'],
-                '-c:a', 'aac',  # Audio codec
-                '-b:a', '128k',  # Audio bitrate
-                '-movflags', '+faststart',  # Optimización para web
-                '-y',  # Sobrescribir archivo de salida
-                output_path
-            ]
-            
-            # Si es H.265, agregar optimizaciones adicionales
-            if preset['codec'] == 'libx265':
-                cmd.extend(['-x265-params', 'log-level=error'])
+            cmd = build_ffmpeg_command(input_path, output_path, self.compression_level.get())
             
             self.log(f"🔧 Comando: {' '.join(cmd)}")
             self.log("⏳ Procesando...")
             
-            # Ejecutar FFmpeg con captura de progreso
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1
+            # Ejecutar FFmpeg: el progreso llega por -progress y se calcula
+            # sobre la duración de FFprobe (stderr solo se usa para errores)
+            result = VideoEngine().compress(
+                input_path,
+                output_path=output_path,
+                preset=self.compression_level.get(),
+                on_progress=self.update_progress
             )
             
-            # Monitorear progreso
-            while True:
-                output = process.stderr.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                
-                if output:
-                    # Buscar información de progreso en la salida de FFmpeg
-                    if 'time=' in output:
-                        # Extraer tiempo actual y duración para calcular progreso
-                        try:
-                            time_part = output.split('time=')[1].split()[0]
-                            # Convertir tiempo a segundos y calcular progreso
-                            # (esto es una aproximación, FFmpeg no da progreso exacto)
-                            if ':' in time_part:
-                                parts = time_part.split(':')
-                                if len(parts) == 3:
-                                    hours, minutes, seconds = map(float, parts)
-                                    current_time = hours * 3600 + minutes * 60 + seconds
-                                    # Estimación de progreso (no es 100% preciso)
-                                    progress = min(current_time * 2, 95)  # Estimación
-                                    self.progress_var.set(progress)
-                        except:
-                            pass
-                    
-                    self.log(output.strip())
-            
             # Verificar resultado
-            return_code = process.poll()
-            
-            if return_code == 0:
+            if result['success']:
                 # Compresión exitosa
                 self.progress_var.set(100)
                 self.status_label.config(text="✅ Compresión completada exitosamente!", foreground="green")
@@ -357,6 +259,8 @@ class VideoCompressor:
                     self.log(f"📊 Tamaño original: {original_size:.1f}MB")
                     self.log(f"📊 Tamaño comprimido: {compressed_size:.1f}MB")
                     self.log(f"📊 Reducción: {compression_ratio:.1f}%")
+                    if result['encode_fps'] and result['speed']:
+                        self.log(f"🎞️ Codificación: {result['encode_fps']:.1f}fps ({result['speed']:.2f}x)")
                     self.log(f"📁 Archivo guardado en: {output_path}")
                     
                     messagebox.showinfo("Éxito", 
@@ -369,7 +273,7 @@ class VideoCompressor:
                     self.log("❌ Error: Archivo de salida no encontrado")
                     self.status_label.config(text="❌ Error en la compresión", foreground="red")
             else:
-                self.log(f"❌ Error en la compresión (código: {return_code})")
+                self.log(f"❌ Error en la compresión: {result['error']}")
                 self.status_label.config(text="❌ Error en la compresión", foreground="red")
                 messagebox.showerror("Error", "Error durante la compresión del video")
         
@@ -382,6 +286,21 @@ class VideoCompressor:
             # Rehabilitar botón
             self.compress_button.config(state='normal')
     
+    def update_progress(self, snapshot):
+        """Actualizar barra y estado con el progreso de FFmpeg"""
+        if snapshot['percent'] is not None:
+            self.progress_var.set(snapshot['percent'])
+        
+        status = f"⏳ {snapshot['percent']:.1f}%" if snapshot['percent'] is not None else "⏳ Procesando..."
+        if snapshot['fps']:
+            status += f" | {snapshot['fps']:.0f}fps"
+        if snapshot['speed']:
+            status += f" | {snapshot['speed']:.2f}x"
+        if snapshot['eta_seconds'] is not None:
+            minutes, seconds = divmod(int(snapshot['eta_seconds']), 60)
+            status += f" | ETA {minutes}:{seconds:02d}"
+        self.status_label.config(text=status, foreground="blue")
+    
     def open_output_folder(self):
         """Abrir carpeta de salida en el explorador"""
         if self.output_folder.get():
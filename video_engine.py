@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de compresión de video sin interfaz
+Construye y ejecuta los comandos de FFmpeg con los mismos presets que el
+compresor gráfico (video_compressor.py), de modo que la compresión puede
+usarse en servidores y desde el backend (ver process_videos_api.py).
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import subprocess
+from fractions import Fraction
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuraciones de compresión (compartidas con la interfaz gráfica)
+# min_threads: hilos mínimos por proceso de FFmpeg en lotes. Un lote rinde
+# más con más procesos estrechos (ningún codificador escala linealmente con
+# los hilos), así que los núcleos se reparten en hasta núcleos // min_threads
+# trabajos. El mínimo no es de rendimiento sino de memoria y latencia por
+# proceso: x265 mantiene varios fotogramas en vuelo (frame threads) y un
+# lookahead grande, y por debajo de 4 hilos cada proceso tarda mucho más
+# con casi la misma memoria; x264 funciona bien desde 2 hilos.
+COMPRESSION_PRESETS = {
+    "ultra": {
+        "name": "Ultra Compresión (H.265) ⚠️",
+        "crf": 28,
+        "preset": "slow",
+        "codec": "libx265",
+        "min_threads": 4,
+        "description": "Máxima compresión, mejor calidad, más lento - REQUIERE CODECS HEVC"
+    },
+    "high": {
+        "name": "Alta Compresión (H.265) ⚠️",
+        "crf": 23,
+        "preset": "medium",
+        "codec": "libx265",
+        "min_threads": 4,
+        "description": "Alta compresión, muy buena calidad - REQUIERE CODECS HEVC"
+    },
+    "balanced": {
+        "name": "Balanceado (H.264) ✅",
+        "crf": 23,
+        "preset": "medium",
+        "codec": "libx264",
+        "min_threads": 2,
+        "description": "Balance perfecto entre tamaño y velocidad - COMPATIBLE UNIVERSAL"
+    },
+    "fast": {
+        "name": "Rápido (H.264) ✅",
+        "crf": 28,
+        "preset": "fast",
+        "codec": "libx264",
+        "min_threads": 2,
+        "description": "Compresión rápida, archivo más grande - COMPATIBLE UNIVERSAL"
+    },
+    "lossless": {
+        "name": "Sin Pérdida (H.264) ✅",
+        "crf": 0,
+        "preset": "slow",
+        "codec": "libx264",
+        "min_threads": 2,
+        "description": "Sin pérdida de calidad, archivo muy grande - COMPATIBLE UNIVERSAL"
+    }
+}
+
+DEFAULT_PRESET = "balanced"
+
+# Extensiones de video aceptadas en lotes
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.wmv']
+
+# Contenedores que admiten -movflags +faststart
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+# Líneas finales de stderr de FFmpeg que se conservan en los errores
+STDERR_TAIL_LINES = 20
+
+# Intervalo mínimo entre dos notificaciones de progreso (segundos)
+PROGRESS_INTERVAL = 0.5
+
+def check_ffmpeg(ffmpeg: str = 'ffmpeg') -> bool:
+    """Verificar si FFmpeg está instalado"""
+    try:
+        result = subprocess.run([ffmpeg, '-version'],
+                                capture_output=True, text=True, timeout=5)
+        return result.returncode == 0
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        return False
+
+def parse_frame_rate(value: Optional[str]) -> Optional[float]:
+    """Convierte una tasa de FFprobe ('30000/1001') a fps sin evaluar el texto"""
+    try:
+        rate = float(Fraction(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+def probe_video(input_path: str, ffprobe: str = 'ffprobe') -> Optional[Dict]:
+    """
+    Obtiene información del video con FFprobe
+
+    Returns:
+        Diccionario con 'duration', 'width', 'height', 'fps', 'frames',
+        'codec', 'bit_rate' y 'has_audio', o None si no se puede leer
+    """
+    cmd = [
+        ffprobe, '-v', 'quiet', '-print_format', 'json',
+        '-show_format', '-show_streams', input_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+        logger.error(f"No se pudo ejecutar FFprobe: {e}")
+        return None
+    if result.returncode != 0:
+        return None
+
+    try:
+        info = json.loads(result.stdout)
+    except ValueError:
+        return None
+
+    streams = info.get('streams', [])
+    video_stream = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if video_stream is None:
+        return None
+
+    fmt = info.get('format', {})
+    duration = fmt.get('duration') or video_stream.get('duration')
+    duration = float(duration) if duration else None
+    fps = parse_frame_rate(video_stream.get('avg_frame_rate')) or parse_frame_rate(video_stream.get('r_frame_rate'))
+
+    frames = video_stream.get('nb_frames')
+    if frames and str(frames).isdigit():
+        frames = int(frames)
+    elif duration and fps:
+        frames = int(round(duration * fps))
+    else:
+        frames = None
+
+    return {
+        'duration': duration,
+        'width': video_stream.get('width'),
+        'height': video_stream.get('height'),
+        'fps': fps,
+        'frames': frames,
+        'codec': video_stream.get('codec_name'),
+        'bit_rate': int(fmt['bit_rate']) if str(fmt.get('bit_rate', '')).isdigit() else None,
+        'has_audio': any(s.get('codec_type') == 'audio' for s in streams)
+    }
+
+def _parse_speed(value: Optional[str]) -> Optional[float]:
+    """Velocidad de -progress ('1.52x' o 'N/A') como número"""
+    try:
+        speed = float(str(value).rstrip('x'))
+    except ValueError:
+        return None
+    return speed if speed > 0 else None
+
+class FFmpegProgress:
+    """
+    Interpreta el flujo clave=valor de `-progress pipe:1`
+
+    FFmpeg escribe un bloque de claves (frame, fps, out_time_us, speed...)
+    que termina en 'progress=continue' o 'progress=end'. El porcentaje se
+    calcula con la duración de FFprobe, y las notificaciones se limitan a
+    una por intervalo (más la final).
+    """
+
+    def __init__(self, duration: Optional[float] = None,
+                 callback: Optional[Callable[[Dict], None]] = None,
+                 interval: float = PROGRESS_INTERVAL):
+        """
+        Args:
+            duration: Duración del video en segundos (sin ella no hay porcentaje ni ETA)
+            callback: Recibe cada instantánea de progreso (ver snapshot)
+            interval: Segundos mínimos entre notificaciones
+        """
+        self.duration = duration
+        self.callback = callback
+        self.interval = interval
+        self.start = time.perf_counter()
+        self._last_notify = None
+        self._block = {}
+        self.last = None
+
+    def feed(self, line: str):
+        """Procesa una línea de la salida de -progress"""
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return
+        self._block[key] = value.strip()
+        if key != 'progress':
+            return
+
+        self.last = self.snapshot(self._block)
+        self._block = {}
+        now = time.perf_counter()
+        if self.callback and (self.last['done'] or self._last_notify is None
+                              or now - self._last_notify >= self.interval):
+            self._last_notify = now
+            self.callback(self.last)
+
+    def snapshot(self, block: Dict[str, str]) -> Dict:
+        """
+        Estado de la codificación a partir de un bloque de -progress
+
+        Returns:
+            Diccionario con 'frame', 'fps' (de codificación), 'speed'
+            (segundos de video por segundo real), 'out_time_seconds',
+            'percent', 'eta_seconds' y 'done'
+        """
+        elapsed = time.perf_counter() - self.start
+        out_time = None
+        # out_time_ms también viene en microsegundos (error histórico de FFmpeg)
+        for key in ('out_time_us', 'out_time_ms'):
+            if block.get(key, 'N/A').lstrip('-').isdigit():
+                out_time = max(0.0, int(block[key]) / 1e6)
+                break
+
+        speed = _parse_speed(block.get('speed'))
+        if speed is None and out_time and elapsed > 0:
+            speed = out_time / elapsed
+        try:
+            fps = float(block.get('fps', ''))
+        except ValueError:
+            fps = None
+        frame = block.get('frame', '')
+
+        done = block.get('progress') == 'end'
+        percent = eta = None
+        if self.duration and out_time is not None:
+            percent = 100.0 if done else min(99.9, 100.0 * out_time / self.duration)
+            if done:
+                eta = 0.0
+            elif speed:
+                eta = max(0.0, (self.duration - out_time) / speed)
+
+        return {
+            'frame': int(frame) if frame.isdigit() else None,
+            'fps': round(fps, 2) if fps is not None else None,
+            'speed': round(speed, 3) if speed else None,
+            'out_time_seconds': round(out_time, 3) if out_time is not None else None,
+            'percent': round(percent, 1) if percent is not None else None,
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'done': done
+        }
+
+def output_name_for(input_path: str, preset_key: str) -> str:
+    """Nombre del archivo comprimido: '<nombre>_compressed_<preset>.mp4'"""
+    return f"{Path(input_path).stem}_compressed_{preset_key}.mp4"
+
+def build_ffmpeg_command(input_path: str, output_path: str, preset_key: str = DEFAULT_PRESET,
+                         ffmpeg: str = 'ffmpeg', threads: Optional[int] = None,
+                         audio: bool = True, crf: Optional[int] = None,
+                         start: Optional[float] = None, length: Optional[float] = None) -> List[str]:
+    """
+    Comando FFmpeg de compresión con un preset de COMPRESSION_PRESETS
+
+    Args:
+        threads: Limitar el decodificador y el codificador a este número de
+                 hilos (None = lo que decida FFmpeg, todos los núcleos)
+        audio: Incluir el audio (AAC); sin él solo se codifica el video
+        crf: CRF en lugar del del preset
+        start: Empezar en este instante (s), buscando en la entrada
+        length: Codificar solo estos segundos
+    """
+    preset = COMPRESSION_PRESETS[preset_key]
+    x265_params = ['log-level=error']
+    thread_args = []
+    if threads:
+        if preset['codec'] == 'libx265':
+            # libx265 ignora -threads: su pool de hilos se fija con pools
+            x265_params.append(f"pools={threads}")
+        else:
+            thread_args = ['-threads', str(threads)]
+
+    cmd = [
+        ffmpeg,
+        '-nostats',  # Sin líneas de estado en stderr: el progreso va por -progress
+        '-progress', 'pipe:1',  # Progreso clave=valor legible por máquina en stdout
+        *(['-threads', str(threads)] if threads else []),  # Hilos de decodificación
+        *(['-ss', f"{start:.3f}"] if start else []),  # Búsqueda rápida en la entrada
+        *(['-t', f"{length:.3f}"] if length else []),
+        '-i', input_path,
+        '-c:v', preset['codec'],
+        *thread_args,
+        '-crf', str(preset['crf'] if crf is None else crf),
+        '-preset', preset['preset'],
+        *(['-c:a', 'aac', '-b:a', '128k'] if audio else ['-an']),  # Audio AAC 128k
+        # Optimización para web (solo contenedores MP4/MOV)
+        *(['-movflags', '+faststart'] if output_path.lower().endswith(MP4_EXTENSIONS) else []),
+        '-y',  # Sobrescribir archivo de salida
+        output_path
+    ]
+
+    # Si es H.265, agregar optimizaciones adicionales
+    if preset['codec'] == 'libx265':
+        cmd[-1:-1] = ['-x265-params', ':'.join(x265_params)]
+
+    return cmd
+
+def new_compression_result(input_path: str, preset: str, threads: Optional[int] = None) -> Dict:
+    """Resultado de compresión vacío (mismo formato en todos los modos)"""
+    return {
+        'success': False,
+        'input_path': input_path,
+        'output_path': None,
+        'preset': preset,
+        'codec': None,
+        'crf': None,
+        'threads': threads,
+        'input_size_bytes': 0,
+        'output_size_bytes': 0,
+        'compression_ratio': None,
+        'size_reduction_percent': None,
+        'duration_seconds': None,
+        'frames': None,
+        'encode_seconds': None,
+        'encode_fps': None,
+        'speed': None,
+        'error': None
+    }
+
+def plan_concurrency(preset_key: str, total_files: int, cpu_count: Optional[int] = None,
+                     max_jobs: Optional[int] = None) -> Tuple[int, Optional[int]]:
+    """
+    Trabajos simultáneos e hilos por trabajo para un lote
+
+    Args:
+        preset_key: Clave de COMPRESSION_PRESETS
+        total_files: Videos del lote
+        cpu_count: Núcleos disponibles (por defecto los de la máquina)
+        max_jobs: Límite de trabajos simultáneos
+
+    Returns:
+        (trabajos, hilos por trabajo); los hilos son None con un solo trabajo,
+        que puede usar todos los núcleos
+    """
+    cores = cpu_count or os.cpu_count() or 1
+    # Tantos trabajos como videos, sin bajar de min_threads hilos por trabajo
+    min_threads = COMPRESSION_PRESETS[preset_key]['min_threads']
+    jobs = max(1, min(total_files, cores // min_threads))
+    if max_jobs:
+        jobs = max(1, min(jobs, max_jobs))
+    if jobs == 1:
+        return 1, None
+    return jobs, max(1, cores // jobs)
+
+class VideoEngine:
+    """Compresión de videos con FFmpeg, sin dependencias de interfaz"""
+
+    def __init__(self, ffmpeg: str = 'ffmpeg', ffprobe: str = 'ffprobe'):
+        """
+        Args:
+            ffmpeg: Ejecutable de FFmpeg
+            ffprobe: Ejecutable de FFprobe
+        """
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+
+    def is_available(self) -> bool:
+        return check_ffmpeg(self.ffmpeg)
+
+    def compress(self, input_path: str, output_path: Optional[str] = None,
+                 output_dir: Optional[str] = None, preset: str = DEFAULT_PRESET,
+                 on_log: Optional[Callable[[str], None]] = None,
+                 threads: Optional[int] = None, info: Optional[Dict] = None,
+                 on_progress: Optional[Callable[[Dict], None]] = None,
+                 crf: Optional[int] = None) -> Dict:
+        """
+        Comprime un video
+
+        Args:
+            input_path: Video de entrada
+            output_path: Ruta de salida (por defecto '<nombre>_compressed_<preset>.mp4'
+                         en output_dir o junto a la entrada)
+            output_dir: Directorio de salida si no se indica output_path
+            preset: Clave de COMPRESSION_PRESETS
+            on_log: Callback con cada línea de stderr de FFmpeg
+            threads: Hilos de FFmpeg (None = todos los núcleos)
+            info: Resultado de probe_video si ya se obtuvo
+            on_progress: Callback con el progreso (ver FFmpegProgress.snapshot),
+                         como máximo cada PROGRESS_INTERVAL segundos
+            crf: CRF en lugar del del preset (p. ej. el elegido por el modo automático)
+
+        Returns:
+            Diccionario con 'success', rutas, tamaños, 'compression_ratio'
+            (salida/entrada), 'size_reduction_percent', 'duration_seconds'
+            del video, 'encode_seconds', 'encode_fps', 'speed' (segundos de
+            video por segundo de codificación) y 'error'
+        """
+        result = new_compression_result(input_path, preset, threads)
+
+        if preset not in COMPRESSION_PRESETS:
+            result['error'] = f"Preset no soportado: {preset}"
+            return result
+        result['codec'] = COMPRESSION_PRESETS[preset]['codec']
+        result['crf'] = COMPRESSION_PRESETS[preset]['crf'] if crf is None else crf
+
+        if not os.path.isfile(input_path):
+            result['error'] = f"Archivo no encontrado: {input_path}"
+            return result
+
+        if output_path is None:
+            output_dir = output_dir or os.path.dirname(os.path.abspath(input_path))
+            output_path = os.path.join(output_dir, output_name_for(input_path, preset))
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        result['output_path'] = output_path
+        result['input_size_bytes'] = os.path.getsize(input_path)
+
+        info = info or probe_video(input_path, self.ffprobe)
+        if info:
+            result['duration_seconds'] = info['duration']
+            result['frames'] = info['frames']
+
+        cmd = build_ffmpeg_command(input_path, output_path, preset, self.ffmpeg, threads, crf=crf)
+        logger.info(f"Comprimiendo {os.path.basename(input_path)} con preset {preset}")
+        logger.debug(f"Comando: {' '.join(cmd)}")
+
+        start = time.perf_counter()
+        try:
+            tracker = FFmpegProgress(result['duration_seconds'], on_progress)
+            returncode, stderr_tail = run_ffmpeg(cmd, tracker, on_log)
+        except FileNotFoundError:
+            result['error'] = "FFmpeg no está instalado o no se puede ejecutar"
+            return result
+        encode_seconds = time.perf_counter() - start
+        result['encode_seconds'] = round(encode_seconds, 3)
+
+        if returncode != 0 or not os.path.exists(output_path):
+            result['error'] = f"FFmpeg terminó con código {returncode}: " + ' | '.join(stderr_tail[-3:])
+            logger.error(result['error'])
+            return result
+
+        result['success'] = True
+        result['output_size_bytes'] = os.path.getsize(output_path)
+        if tracker.last and tracker.last['frame']:
+            # Fotogramas realmente codificados (nb_frames no siempre está en el contenedor)
+            result['frames'] = tracker.last['frame']
+        fill_compression_stats(result, encode_seconds)
+        logger.info(f"Compresión completada: {os.path.basename(output_path)} "
+                    f"({result['size_reduction_percent']}% menos en {encode_seconds:.1f}s)")
+        return result
+
+def fill_compression_stats(result: Dict, encode_seconds: float):
+    """Relación de tamaños y velocidades de codificación de un resultado"""
+    if result['input_size_bytes']:
+        ratio = result['output_size_bytes'] / result['input_size_bytes']
+        result['compression_ratio'] = round(ratio, 4)
+        result['size_reduction_percent'] = round((1 - ratio) * 100, 2)
+    if encode_seconds > 0:
+        if result['frames']:
+            result['encode_fps'] = round(result['frames'] / encode_seconds, 2)
+        if result['duration_seconds']:
+            result['speed'] = round(result['duration_seconds'] / encode_seconds, 3)
+
+def run_ffmpeg(cmd: List[str], tracker: Optional[FFmpegProgress] = None,
+               on_log: Optional[Callable[[str], None]] = None):
+    """
+    Ejecuta FFmpeg leyendo el progreso de stdout y los mensajes de stderr
+    (en un hilo aparte, para que ninguno de los dos pipes se llene)
+
+    Returns:
+        (código de salida, últimas líneas de stderr)
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        bufsize=1
+    )
+    tail = []
+
+    def read_stderr():
+        for line in process.stderr:
+            line = line.rstrip()
+            if not line:
+                continue
+            tail.append(line)
+            del tail[:-STDERR_TAIL_LINES]
+            if on_log:
+                on_log(line)
+
+    stderr_thread = threading.Thread(target=read_stderr, daemon=True)
+    stderr_thread.start()
+    for line in process.stdout:
+        if tracker:
+            tracker.feed(line)
+    stderr_thread.join()
+    return process.wait(), tail
+
+def find_videos(input_dir: str) -> List[str]:
+    """Videos de un directorio (no recursivo), en orden alfabético"""
+    return sorted(
+        str(path) for path in Path(input_dir).iterdir()
+        if path.is_file() and path.suffix.lower() in VIDEO_EXTENSIONS
+    )
+
+def compress_video(input_path: str, output_dir: Optional[str] = None,
+                   preset: str = DEFAULT_PRESET) -> Dict:
+    """Función de conveniencia para comprimir un video"""
+    engine = VideoEngine()
+    return engine.compress(input_path, output_dir=output_dir, preset=preset)
@@ -0,0 +1,275 @@
+"""
+Selección automática del preset de compresión
+Antes de la codificación completa se codifican unas pocas ventanas cortas
+del video con cada preset candidato (y CRF opcional), se mide el tamaño y
+la velocidad, y se extrapolan a la duración completa (FFprobe). Con esas
+estimaciones se elige el preset que cumple el tamaño objetivo o el
+presupuesto de tiempo.
+
+Sin objetivos se elige el candidato más rápido cuyo tamaño estimado no
+supera en más de MARGINAL_SIZE_GAIN al más pequeño: así no se paga 'ultra'
+(hasta 10 veces más lento) por una reducción marginal en contenido donde
+H.265 apenas gana.
+
+Las muestras se codifican con los hilos que tendrá cada proceso en la
+codificación real (la cola reparte los núcleos entre trabajos o
+segmentos), y el tiempo se extrapola desde la velocidad sostenida que
+informa -progress, sin el arranque del codificador ni la búsqueda de -ss,
+que no escalan con la duración. Las estimaciones de tamaño incluyen el
+audio AAC a 128 kbps.
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from video_engine import (COMPRESSION_PRESETS, FFmpegProgress, VideoEngine, build_ffmpeg_command,
+                          probe_video, run_ffmpeg)
+
+logger = logging.getLogger(__name__)
+
+# Valor de --preset que activa la selección automática
+AUTO_PRESET = 'auto'
+
+# Candidatos por defecto ('lossless' no compite en tamaño)
+DEFAULT_CANDIDATES = ('ultra', 'high', 'balanced', 'fast')
+
+# Ventanas de muestra: número y duración (s)
+SAMPLE_WINDOWS = 3
+SAMPLE_SECONDS = 4.0
+
+# Exceso de tamaño aceptado frente al candidato más pequeño a cambio de velocidad
+MARGINAL_SIZE_GAIN = 0.05
+
+# Bitrate del audio AAC de build_ffmpeg_command (bytes/s)
+AUDIO_BYTES_PER_SECOND = 128000 / 8
+
+def parse_candidates(candidates: Optional[Sequence] = None) -> List[Dict]:
+    """
+    Candidatos a partir de 'preset' o 'preset:crf' (p. ej. 'balanced:26')
+
+    Raises:
+        ValueError: Si un preset no existe o el CRF no es un entero válido
+    """
+    parsed = []
+    for candidate in candidates or DEFAULT_CANDIDATES:
+        preset, _, crf = str(candidate).partition(':')
+        if preset not in COMPRESSION_PRESETS:
+            raise ValueError(f"Preset candidato no soportado: {preset}")
+        if crf and not (crf.isdigit() and 0 <= int(crf) <= 51):
+            raise ValueError(f"CRF candidato inválido: {candidate}")
+        parsed.append({'preset': preset,
+                       'crf': int(crf) if crf else COMPRESSION_PRESETS[preset]['crf']})
+    return parsed
+
+def sample_windows(duration: float, windows: int = SAMPLE_WINDOWS,
+                   seconds: float = SAMPLE_SECONDS) -> List[Dict]:
+    """
+    Ventanas de muestra repartidas por el video (evitando el principio y el
+    final, que suelen ser títulos o negros)
+
+    Returns:
+        Lista de {'start', 'seconds'}; un video corto es una sola ventana completa
+    """
+    if duration <= windows * seconds:
+        return [{'start': 0.0, 'seconds': duration}]
+    return [{'start': round(duration * (i + 1) / (windows + 1) - seconds / 2, 3), 'seconds': seconds}
+            for i in range(windows)]
+
+def choose_candidate(candidates: List[Dict], target_size_bytes: Optional[int] = None,
+                     time_budget_seconds: Optional[float] = None) -> Dict:
+    """
+    Elige entre candidatos ya medidos ('estimated_size_bytes',
+    'estimated_encode_seconds')
+
+    - Con tamaño objetivo: el más rápido de los que lo cumplen (y el
+      presupuesto de tiempo, si lo hay).
+    - Solo con presupuesto de tiempo: el más pequeño de los que lo cumplen.
+    - Si ninguno cumple: el más pequeño (tamaño objetivo) o el más rápido.
+    - Sin objetivos: el más rápido dentro de MARGINAL_SIZE_GAIN del más pequeño.
+
+    Returns:
+        Diccionario con 'candidate' y 'reason'
+    """
+    def fits(c: Dict) -> bool:
+        return ((target_size_bytes is None or c['estimated_size_bytes'] <= target_size_bytes)
+                and (time_budget_seconds is None or c['estimated_encode_seconds'] <= time_budget_seconds))
+
+    by_size = lambda c: (c['estimated_size_bytes'], c['estimated_encode_seconds'])
+    by_time = lambda c: (c['estimated_encode_seconds'], c['estimated_size_bytes'])
+
+    if target_size_bytes is not None or time_budget_seconds is not None:
+        feasible = [c for c in candidates if fits(c)]
+        for c in candidates:
+            c['meets_target'] = fits(c)
+        if feasible:
+            if target_size_bytes is not None:
+                return {'candidate': min(feasible, key=by_time), 'reason': 'fastest_meeting_target'}
+            return {'candidate': min(feasible, key=by_size), 'reason': 'smallest_within_budget'}
+        if target_size_bytes is not None:
+            return {'candidate': min(candidates, key=by_size), 'reason': 'no_candidate_meets_target_smallest'}
+        return {'candidate': min(candidates, key=by_time), 'reason': 'no_candidate_meets_budget_fastest'}
+
+    smallest = min(c['estimated_size_bytes'] for c in candidates)
+    near = [c for c in candidates if c['estimated_size_bytes'] <= smallest * (1 + MARGINAL_SIZE_GAIN)]
+    return {'candidate': min(near, key=by_time), 'reason': 'fastest_near_smallest'}
+
+class PresetSelector:
+    """Elige preset y CRF con codificaciones de muestra"""
+
+    def __init__(self, engine: Optional[VideoEngine] = None, candidates: Optional[Sequence] = None,
+                 windows: int = SAMPLE_WINDOWS, seconds: float = SAMPLE_SECONDS):
+        """
+        Args:
+            engine: Motor de compresión (ejecutables de FFmpeg/FFprobe)
+            candidates: Presets candidatos, 'preset' o 'preset:crf'
+            windows: Ventanas de muestra por video
+            seconds: Duración de cada ventana
+        """
+        self.engine = engine or VideoEngine()
+        self.candidates = parse_candidates(candidates)
+        self.windows = windows
+        self.seconds = seconds
+
+    def select(self, input_path: str, target_size_bytes: Optional[int] = None,
+               target_ratio: Optional[float] = None,
+               time_budget_seconds: Optional[float] = None,
+               info: Optional[Dict] = None,
+               plans: Optional[Dict[str, Tuple[int, Optional[int]]]] = None) -> Dict:
+        """
+        Mide los candidatos sobre ventanas del video y elige uno
+
+        Args:
+            input_path: Video de entrada
+            target_size_bytes: Tamaño máximo de la salida
+            target_ratio: Tamaño máximo como fracción de la entrada (p. ej. 0.3)
+            time_budget_seconds: Tiempo máximo de la codificación completa
+            info: Resultado de probe_video si ya se obtuvo
+            plans: Preset -> (procesos que codificarán este video a la vez,
+                   hilos de cada uno), según la planificación de la cola: más
+                   de un proceso con segmentos (None o preset ausente = un
+                   solo proceso con todos los núcleos)
+
+        Returns:
+            Diccionario con 'preset', 'crf', 'reason', 'estimated_size_bytes',
+            'estimated_encode_seconds', 'sample_windows', 'sample_seconds'
+            (tiempo invertido en las muestras), 'candidates' (medición de
+            cada uno) y 'error' (None si se pudo elegir)
+        """
+        info = info or probe_video(input_path, self.engine.ffprobe)
+        selection = {
+            'preset': None,
+            'crf': None,
+            'reason': None,
+            'estimated_size_bytes': None,
+            'estimated_encode_seconds': None,
+            'sample_windows': [],
+            'sample_seconds': None,
+            'candidates': [],
+            'error': None
+        }
+        if not info or not info['duration']:
+            selection['error'] = "No se pudo obtener la duración del video con FFprobe"
+            return selection
+
+        if target_ratio is not None:
+            ratio_bytes = int(os.path.getsize(input_path) * target_ratio)
+            target_size_bytes = min(target_size_bytes or ratio_bytes, ratio_bytes)
+
+        duration = info['duration']
+        windows = sample_windows(duration, self.windows, self.seconds)
+        sampled_seconds = sum(w['seconds'] for w in windows)
+        audio_bytes = AUDIO_BYTES_PER_SECOND * duration if info['has_audio'] else 0
+        selection['sample_windows'] = windows
+
+        start = time.perf_counter()
+        work_dir = tempfile.mkdtemp(prefix='.preset_samples_')
+        try:
+            for candidate in self.candidates:
+                processes, threads = (plans or {}).get(candidate['preset'], (1, None))
+                measured = self._measure(input_path, candidate, windows, work_dir, threads)
+                if measured['error'] is None:
+                    scale = duration / sampled_seconds
+                    measured['estimated_size_bytes'] = int(measured['sample_bytes'] * scale + audio_bytes)
+                    if measured['sample_speed']:
+                        # Los segmentos se reparten la duración entre procesos simultáneos
+                        encode_seconds = duration / (measured['sample_speed'] * processes)
+                    else:
+                        # Sin bloques de progreso suficientes: tiempo total de las muestras
+                        encode_seconds = measured['sample_encode_seconds'] * scale
+                    measured['estimated_encode_seconds'] = round(encode_seconds, 1)
+                selection['candidates'].append(measured)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        selection['sample_seconds'] = round(time.perf_counter() - start, 3)
+
+        measured = [c for c in selection['candidates'] if c['error'] is None]
+        if not measured:
+            selection['error'] = "Ningún candidato se pudo codificar: " + '; '.join(
+                f"{c['preset']}: {c['error']}" for c in selection['candidates'])
+            return selection
+
+        choice = choose_candidate(measured, target_size_bytes, time_budget_seconds)
+        chosen = choice['candidate']
+        selection.update(
+            preset=chosen['preset'],
+            crf=chosen['crf'],
+            reason=choice['reason'],
+            estimated_size_bytes=chosen['estimated_size_bytes'],
+            estimated_encode_seconds=chosen['estimated_encode_seconds']
+        )
+        logger.info(f"Preset automático para {os.path.basename(input_path)}: {chosen['preset']} "
+                    f"(CRF {chosen['crf']}, ~{chosen['estimated_size_bytes'] / 1048576:.1f}MB, "
+                    f"~{chosen['estimated_encode_seconds']}s, {choice['reason']}) "
+                    f"tras {selection['sample_seconds']}s de muestras")
+        return selection
+
+    def _measure(self, input_path: str, candidate: Dict, windows: List[Dict], work_dir: str,
+                 threads: Optional[int] = None) -> Dict:
+        """
+        Codifica las ventanas con un candidato (solo video) y suma bytes y tiempo
+
+        'sample_speed' es la velocidad sostenida (segundos de video por
+        segundo real) entre el primer y el último bloque de -progress de
+        cada ventana, o None si no hubo bloques suficientes.
+        """
+        measured = {**candidate, 'sample_bytes': 0, 'sample_encode_seconds': 0.0,
+                    'sample_speed': None, 'threads': threads, 'error': None}
+        steady_video = steady_wall = 0.0
+        for index, window in enumerate(windows):
+            sample_path = os.path.join(work_dir, f"{candidate['preset']}_{candidate['crf']}_{index}.mkv")
+            cmd = build_ffmpeg_command(input_path, sample_path, candidate['preset'], self.engine.ffmpeg,
+                                       threads, audio=False, crf=candidate['crf'],
+                                       start=window['start'], length=window['seconds'])
+            # Instante y tiempo codificado de cada bloque de -progress
+            marks = []
+            tracker = FFmpegProgress(window['seconds'], interval=0,
+                                     callback=lambda snap: marks.append(
+                                         (time.perf_counter(), snap['out_time_seconds'])))
+            start = time.perf_counter()
+            returncode, tail = run_ffmpeg(cmd, tracker)
+            measured['sample_encode_seconds'] += time.perf_counter() - start
+            # Desde el primer bloque con video codificado: fuera arranque y búsqueda
+            marks = [(at, out_time) for at, out_time in marks if out_time]
+            if len(marks) >= 2 and marks[-1][0] > marks[0][0] and marks[-1][1] > marks[0][1]:
+                steady_wall += marks[-1][0] - marks[0][0]
+                steady_video += marks[-1][1] - marks[0][1]
+            if returncode != 0 or not os.path.exists(sample_path):
+                measured['error'] = ' | '.join(tail[-2:]) or f"código {returncode}"
+                break
+            measured['sample_bytes'] += os.path.getsize(sample_path)
+            os.remove(sample_path)
+        measured['sample_encode_seconds'] = round(measured['sample_encode_seconds'], 3)
+        if steady_wall > 0:
+            measured['sample_speed'] = round(steady_video / steady_wall, 4)
+        return measured
+
+def select_preset(input_path: str, target_size_bytes: Optional[int] = None,
+                  time_budget_seconds: Optional[float] = None) -> Dict:
+    """Función de conveniencia para elegir el preset de un video"""
+    selector = PresetSelector()
+    return selector.select(input_path, target_size_bytes=target_size_bytes,
+                           time_budget_seconds=time_budget_seconds)
@@ -0,0 +1,244 @@
+"""
+Cola de compresión de videos por lotes
+Comprime varios videos a la vez, cada uno en su propio proceso de FFmpeg,
+repartiendo los núcleos entre los trabajos: tantos trabajos como videos
+mientras cada uno conserve los hilos mínimos del preset (min_threads, 4 en
+x265 y 2 en x264). Cada proceso se limita a su parte de los núcleos para no
+sobrecargar la máquina.
+
+Eventos de progreso (campo "event"):
+    video_job_started   total_files, jobs, threads
+    video_preset_selected file, preset, crf, reason (con preset 'auto')
+    video_started       file, threads
+    video_progress      file, percent, fps, speed, eta_seconds,
+                        job_percent (cada PROGRESS_INTERVAL como máximo)
+    video_done          file, output, success, size_bytes, seconds,
+                        completed, total, percent
+    video_job_done      processed, failed, seconds
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from video_engine import (COMPRESSION_PRESETS, DEFAULT_PRESET, VideoEngine, new_compression_result,
+                          plan_concurrency, probe_video)
+from video_segments import SegmentedEncoder, auto_segments, plan_segment_concurrency
+from video_preset_selector import AUTO_PRESET, PresetSelector
+from progress_events import NULL_EMITTER, ProgressEmitter
+
+logger = logging.getLogger(__name__)
+
+class VideoQueue:
+    """Cola de videos comprimidos en paralelo con el mismo preset (o elegido por video)"""
+
+    def __init__(self, engine: Optional[VideoEngine] = None, max_jobs: Optional[int] = None,
+                 threads: Optional[int] = None, cpu_count: Optional[int] = None,
+                 segments: Optional[int] = None, compare_single: bool = False,
+                 selector: Optional[PresetSelector] = None, auto_targets: Optional[Dict] = None):
+        """
+        Args:
+            engine: Motor de compresión (por defecto uno con ffmpeg/ffprobe del PATH)
+            max_jobs: Límite de trabajos simultáneos (None = según núcleos y preset)
+            threads: Hilos por trabajo fijos (None = reparto automático)
+            cpu_count: Núcleos a repartir (por defecto los de la máquina)
+            segments: Codificar cada video por segmentos en paralelo (0 =
+                      automático); los videos se procesan entonces de uno en uno
+            compare_single: En modo por segmentos, medir también la ruta de un
+                            solo proceso para informar de la aceleración
+            selector: Selector de preset para preset='auto' (por defecto
+                      uno con los candidatos por defecto)
+            auto_targets: Objetivos de PresetSelector.select
+                          (target_size_bytes, target_ratio, time_budget_seconds)
+        """
+        self.engine = engine or VideoEngine()
+        self.max_jobs = max_jobs
+        self.threads = threads
+        self.cpu_count = cpu_count
+        self.segments = segments
+        self.compare_single = compare_single
+        self.selector = selector
+        self.auto_targets = auto_targets or {}
+        self.inputs = []
+
+    def add(self, input_path: str):
+        self.inputs.append(input_path)
+
+    def extend(self, input_paths: List[str]):
+        self.inputs.extend(input_paths)
+
+    def plan(self, preset: str) -> Tuple[int, Optional[int]]:
+        """Trabajos e hilos por trabajo con que se ejecutaría la cola"""
+        if self.segments is not None:
+            # El paralelismo está dentro de cada video
+            return 1, None
+        jobs, threads = plan_concurrency(preset, len(self.inputs), self.cpu_count, self.max_jobs)
+        if self.threads:
+            threads = self.threads
+        return jobs, threads
+
+    def _encode_plan(self, preset: str, info: Optional[Dict]) -> Tuple[int, Optional[int]]:
+        """
+        Procesos que codificarán a la vez un video con el preset e hilos de
+        cada uno (para que las muestras del modo automático se midan igual)
+        """
+        if self.segments is not None:
+            segments = self.segments or auto_segments((info or {}).get('duration'), self.cpu_count)
+            return plan_segment_concurrency(segments, self.cpu_count)
+        return 1, self.plan(preset)[1]
+
+    def run(self, output_dir: str, preset: str = DEFAULT_PRESET,
+            progress: Optional[ProgressEmitter] = None) -> Dict:
+        """
+        Comprime todos los videos de la cola
+
+        Con preset='auto' se elige antes el preset de cada video con
+        codificaciones de muestra (una tras otra, para que las medidas de
+        velocidad no se estorben, y con los hilos que cada candidato tendría
+        en la cola) y los trabajos se planifican con el preset elegido que
+        más hilos mínimos pide.
+
+        El progreso agregado ('percent') se pondera por la duración de cada
+        video, no por número de archivos.
+
+        Returns:
+            Diccionario con totales del lote, 'jobs', 'threads' y 'files'
+            (resultados de VideoEngine.compress en el orden de entrada)
+        """
+        progress = progress or NULL_EMITTER
+        if preset not in COMPRESSION_PRESETS and preset != AUTO_PRESET:
+            raise ValueError(f"Preset no soportado: {preset}")
+        os.makedirs(output_dir, exist_ok=True)
+        total = len(self.inputs)
+        start = time.perf_counter()
+
+        # Duración de cada video para ponderar el progreso (1 si no se conoce);
+        # la información se pasa al motor para no volver a ejecutar FFprobe
+        infos = [probe_video(path, self.engine.ffprobe) for path in self.inputs]
+        durations = [(info or {}).get('duration') or 1.0 for info in infos]
+        total_duration = sum(durations)
+
+        selections = [None] * total
+        if preset == AUTO_PRESET:
+            selector = self.selector or PresetSelector(self.engine)
+            for index, path in enumerate(self.inputs):
+                plans = {c['preset']: self._encode_plan(c['preset'], infos[index])
+                         for c in selector.candidates}
+                selections[index] = selector.select(path, info=infos[index], plans=plans,
+                                                    **self.auto_targets)
+                progress.emit('video_preset_selected', file=os.path.basename(path),
+                              preset=selections[index]['preset'], crf=selections[index]['crf'],
+                              reason=selections[index]['reason'] or selections[index]['error'])
+            chosen = [s['preset'] for s in selections if s['preset']] or [DEFAULT_PRESET]
+            plan_preset = max(chosen, key=lambda key: COMPRESSION_PRESETS[key]['min_threads'])
+        else:
+            plan_preset = preset
+
+        jobs, threads = self.plan(plan_preset)
+        logger.info(f"Comprimiendo {total} videos: {jobs} trabajos simultáneos, "
+                    f"{threads or 'todos los'} hilos por trabajo")
+        progress.emit('video_job_started', total_files=total, jobs=jobs, threads=threads)
+
+        files = [None] * total
+        completed = 0
+        # Fracción codificada de cada video, para el porcentaje del lote
+        fractions = [0.0] * total
+        lock = threading.Lock()
+
+        def job_percent() -> float:
+            done = sum(fraction * duration for fraction, duration in zip(fractions, durations))
+            return round(100.0 * done / total_duration, 1)
+
+        def compress(index: int) -> Dict:
+            path = self.inputs[index]
+            file_name = os.path.basename(path)
+            progress.emit('video_started', file=file_name, threads=threads)
+
+            def on_progress(snapshot: Dict):
+                if snapshot['percent'] is None:
+                    return
+                with lock:
+                    fractions[index] = snapshot['percent'] / 100.0
+                    overall = job_percent()
+                progress.emit('video_progress', file=file_name, percent=snapshot['percent'],
+                              fps=snapshot['fps'], speed=snapshot['speed'],
+                              eta_seconds=snapshot['eta_seconds'], job_percent=overall)
+
+            file_preset, crf = preset, None
+            selection = selections[index]
+            if selection is not None:
+                if selection['error']:
+                    result = new_compression_result(path, preset)
+                    result.update(error=selection['error'], auto_preset=selection)
+                    return result
+                file_preset, crf = selection['preset'], selection['crf']
+
+            if self.segments is not None:
+                encoder = SegmentedEncoder(self.engine, self.cpu_count)
+                result = encoder.compress(path, output_dir=output_dir, preset=file_preset,
+                                          segments=self.segments or None,
+                                          compare_single=self.compare_single,
+                                          on_progress=on_progress if progress.enabled else None,
+                                          crf=crf, info=infos[index])
+            else:
+                result = self.engine.compress(path, output_dir=output_dir, preset=file_preset,
+                                              threads=threads, info=infos[index],
+                                              on_progress=on_progress if progress.enabled else None,
+                                              crf=crf)
+            if selection is not None:
+                result['auto_preset'] = selection
+            return result
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(compress, index): index for index in range(total)}
+            for future in as_completed(futures):
+                index = futures[future]
+                file_result = future.result()
+                files[index] = file_result
+                completed += 1
+                with lock:
+                    fractions[index] = 1.0
+                    overall = job_percent()
+                progress.emit('video_done',
+                              file=os.path.basename(self.inputs[index]),
+                              output=file_result['output_path'],
+                              success=file_result['success'],
+                              size_bytes=file_result['output_size_bytes'],
+                              seconds=file_result['encode_seconds'],
+                              completed=completed,
+                              total=total,
+                              percent=overall)
+
+        seconds = time.perf_counter() - start
+        successful = [f for f in files if f['success']]
+        input_bytes = sum(f['input_size_bytes'] for f in successful)
+        output_bytes = sum(f['output_size_bytes'] for f in successful)
+        video_seconds = sum(f['duration_seconds'] or 0 for f in successful)
+        progress.emit('video_job_done', processed=len(successful),
+                      failed=total - len(successful), seconds=round(seconds, 3))
+
+        return {
+            'total_files': total,
+            'successful_files': len(successful),
+            'failed_files': total - len(successful),
+            'jobs': jobs,
+            'threads': threads,
+            'input_size_bytes': input_bytes,
+            'output_size_bytes': output_bytes,
+            'compression_ratio': round(output_bytes / input_bytes, 4) if input_bytes else None,
+            'wall_seconds': round(seconds, 3),
+            'encode_seconds': round(sum(f['encode_seconds'] or 0 for f in files), 3),
+            # Segundos de video comprimidos por segundo real con todos los trabajos
+            'throughput': round(video_seconds / seconds, 3) if seconds > 0 and video_seconds else None,
+            'files': files
+        }
+
+def compress_videos(input_paths: List[str], output_dir: str, preset: str = DEFAULT_PRESET,
+                    max_jobs: Optional[int] = None) -> Dict:
+    """Función de conveniencia para comprimir un lote de videos"""
+    video_queue = VideoQueue(max_jobs=max_jobs)
+    video_queue.extend(input_paths)
+    return video_queue.run(output_dir, preset)
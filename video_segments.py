@@ -0,0 +1,371 @@
+"""
+Codificación de video por segmentos en paralelo
+Un solo proceso de FFmpeg no aprovecha todos los núcleos de un nodo grande
+con presets lentos (x265 'slow' en 4K va muy por debajo de tiempo real).
+Este modo corta el video en N segmentos por fotogramas clave (copia de
+stream, sin recodificar), codifica los segmentos a la vez con el preset
+elegido y los une sin pérdida con el demuxer concat. El audio no se corta:
+se codifica de una vez desde el original al unir, así no hay huecos en las
+fronteras de los segmentos.
+
+Cada segmento empieza en un IDR y el control de tasa se reinicia en cada
+frontera, por lo que la salida puede ser ligeramente mayor que la de un
+solo proceso; con segmentos de al menos MIN_SEGMENT_SECONDS la diferencia
+es pequeña.
+"""
+
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from video_engine import (COMPRESSION_PRESETS, DEFAULT_PRESET, PROGRESS_INTERVAL, FFmpegProgress,
+                          VideoEngine, build_ffmpeg_command, fill_compression_stats,
+                          new_compression_result, output_name_for, probe_video, run_ffmpeg)
+
+logger = logging.getLogger(__name__)
+
+# Duración mínima de un segmento: por debajo pesan el IDR inicial y el
+# arranque del control de tasa/lookahead de cada segmento
+MIN_SEGMENT_SECONDS = 10.0
+
+# Máximo de segmentos en modo automático
+MAX_SEGMENTS = 64
+
+def keyframe_times(input_path: str, ffprobe: str = 'ffprobe') -> List[float]:
+    """
+    Instantes (s) de los fotogramas clave del primer stream de video
+
+    Se leen los flags de los paquetes, sin decodificar el video.
+    """
+    cmd = [
+        ffprobe, '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+        logger.error(f"No se pudieron leer los fotogramas clave: {e}")
+        return []
+    if result.returncode != 0:
+        return []
+
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' not in flags:
+            continue
+        try:
+            times.append(float(pts_time))
+        except ValueError:
+            continue
+    return sorted(set(times))
+
+def plan_segment_times(keyframes: List[float], duration: float, segments: int,
+                       min_seconds: float = MIN_SEGMENT_SECONDS) -> List[float]:
+    """
+    Puntos de corte en fotogramas clave para N segmentos de duración similar
+
+    Args:
+        keyframes: Instantes de los fotogramas clave
+        duration: Duración del video
+        segments: Segmentos deseados
+        min_seconds: Duración mínima de cada segmento
+
+    Returns:
+        Instantes de corte (vacío = un solo segmento)
+    """
+    if segments < 2 or not duration:
+        return []
+    cuts = []
+    previous = 0.0
+    for i in range(1, segments):
+        target = duration * i / segments
+        candidates = [k for k in keyframes
+                      if k - previous >= min_seconds and duration - k >= min_seconds]
+        if not candidates:
+            break
+        cut = min(candidates, key=lambda k: abs(k - target))
+        if cut <= previous:
+            continue
+        cuts.append(cut)
+        previous = cut
+    return cuts
+
+def plan_segment_concurrency(segments: int, cpu_count: Optional[int] = None) -> Tuple[int, Optional[int]]:
+    """
+    Trabajos simultáneos e hilos por trabajo para los segmentos de un video
+
+    Al pedir segmentos el paralelismo está en los segmentos, no en los
+    hilos de cada FFmpeg: se codifican hasta un segmento por núcleo y los
+    núcleos se reparten entre ellos (pools de x265), sin el mínimo de
+    hilos por trabajo de plan_concurrency.
+
+    Returns:
+        (trabajos, hilos por trabajo); los hilos son None con un solo trabajo
+    """
+    cores = cpu_count or os.cpu_count() or 1
+    jobs = max(1, min(segments, cores))
+    if jobs == 1:
+        return 1, None
+    return jobs, max(1, cores // jobs)
+
+def auto_segments(duration: Optional[float], cpu_count: Optional[int] = None) -> int:
+    """Segmentos para un video: uno por núcleo, sin bajar de MIN_SEGMENT_SECONDS"""
+    if not duration:
+        return 1
+    cores = cpu_count or os.cpu_count() or 1
+    return max(1, min(cores, MAX_SEGMENTS, int(duration // MIN_SEGMENT_SECONDS)))
+
+def _concat_list_line(path: str) -> str:
+    """Línea 'file' del demuxer concat con las comillas simples escapadas"""
+    return "file '" + os.path.abspath(path).replace("'", "'\\''") + "'\n"
+
+class SegmentedEncoder:
+    """Compresión de un video por segmentos codificados en paralelo"""
+
+    def __init__(self, engine: Optional[VideoEngine] = None, cpu_count: Optional[int] = None):
+        """
+        Args:
+            engine: Motor de compresión (ejecutables y ruta de un solo proceso)
+            cpu_count: Núcleos a repartir entre segmentos (por defecto los de la máquina)
+        """
+        self.engine = engine or VideoEngine()
+        self.cpu_count = cpu_count
+
+    def compress(self, input_path: str, output_path: Optional[str] = None,
+                 output_dir: Optional[str] = None, preset: str = DEFAULT_PRESET,
+                 segments: Optional[int] = None, compare_single: bool = False,
+                 on_progress: Optional[Callable[[Dict], None]] = None,
+                 crf: Optional[int] = None, info: Optional[Dict] = None) -> Dict:
+        """
+        Comprime un video por segmentos
+
+        Args:
+            input_path: Video de entrada
+            output_path: Ruta de salida (por defecto como VideoEngine.compress)
+            output_dir: Directorio de salida si no se indica output_path
+            preset: Clave de COMPRESSION_PRESETS
+            segments: Segmentos (None = según núcleos y duración); con
+                      uno solo se usa la ruta normal de un proceso
+            compare_single: Codificar también con un solo proceso y medir la
+                            aceleración (duplica el trabajo)
+            on_progress: Callback con el progreso agregado ('percent',
+                         'speed', 'eta_seconds', 'done')
+            crf: CRF en lugar del del preset
+            info: Resultado de probe_video si ya se obtuvo
+
+        Returns:
+            Resultado de VideoEngine.compress con además 'segments',
+            'segment_times', 'jobs', 'phases' (segundos de lectura de
+            fotogramas clave, corte, codificación y unión) y, con
+            compare_single, 'single_seconds', 'single_output_size_bytes' y
+            'speedup' (incluye la lectura de fotogramas clave)
+        """
+        if preset not in COMPRESSION_PRESETS:
+            result = new_compression_result(input_path, preset)
+            result['error'] = f"Preset no soportado: {preset}"
+            return result
+        if not os.path.isfile(input_path):
+            result = new_compression_result(input_path, preset)
+            result['error'] = f"Archivo no encontrado: {input_path}"
+            return result
+
+        if output_path is None:
+            output_dir = output_dir or os.path.dirname(os.path.abspath(input_path))
+            output_path = os.path.join(output_dir, output_name_for(input_path, preset))
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+        info = info or probe_video(input_path, self.engine.ffprobe)
+        duration = (info or {}).get('duration')
+        if segments is None:
+            segments = auto_segments(duration, self.cpu_count)
+        # La lectura de fotogramas clave recorre todo el video y solo la paga
+        # la ruta por segmentos: cuenta en el tiempo comparado con un proceso
+        start = time.perf_counter()
+        cuts = plan_segment_times(keyframe_times(input_path, self.engine.ffprobe),
+                                  duration, segments) if segments > 1 else []
+        keyframe_seconds = time.perf_counter() - start
+
+        # Carpeta de trabajo junto a la salida: los segmentos no cruzan de disco
+        work_dir = tempfile.mkdtemp(prefix='.segments_', dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            if cuts:
+                result = self._compress_segments(input_path, output_path, preset, info,
+                                                 cuts, work_dir, on_progress, crf)
+                result['phases']['keyframe_seconds'] = round(keyframe_seconds, 3)
+            else:
+                logger.info(f"{os.path.basename(input_path)}: sin cortes posibles, un solo proceso")
+                result = self.engine.compress(input_path, output_path=output_path, preset=preset,
+                                              info=info, on_progress=on_progress, crf=crf)
+                result.update(segments=1, segment_times=[], jobs=1, phases=None)
+            wall_seconds = time.perf_counter() - start
+
+            # Sin cortes la ruta ya es la de un solo proceso: no hay nada que comparar
+            if compare_single and cuts and result['success']:
+                self._compare_single(result, input_path, preset, info, work_dir, wall_seconds, crf)
+            return result
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _compress_segments(self, input_path: str, output_path: str, preset: str,
+                           info: Dict, cuts: List[float], work_dir: str,
+                           on_progress: Optional[Callable[[Dict], None]],
+                           crf: Optional[int] = None) -> Dict:
+        """Corte por fotogramas clave, codificación en paralelo y unión"""
+        ffmpeg = self.engine.ffmpeg
+        result = new_compression_result(input_path, preset)
+        result.update(
+            output_path=output_path,
+            codec=COMPRESSION_PRESETS[preset]['codec'],
+            crf=COMPRESSION_PRESETS[preset]['crf'] if crf is None else crf,
+            input_size_bytes=os.path.getsize(input_path),
+            duration_seconds=info['duration'],
+            frames=info['frames'],
+            segment_times=[round(cut, 3) for cut in cuts]
+        )
+        phases = {}
+        result['phases'] = phases
+        start = time.perf_counter()
+
+        # 1. Corte sin recodificar (solo video; el audio se toma del original al unir)
+        split_cmd = [
+            ffmpeg, '-v', 'error', '-i', input_path,
+            '-map', '0:v:0', '-c', 'copy',
+            '-f', 'segment', '-segment_times', ','.join(f"{cut:.6f}" for cut in cuts),
+            '-reset_timestamps', '1',
+            os.path.join(work_dir, 'source_%03d.mkv')
+        ]
+        returncode, tail = run_ffmpeg(split_cmd)
+        sources = sorted(os.path.join(work_dir, name) for name in os.listdir(work_dir)
+                         if name.startswith('source_'))
+        phases['split_seconds'] = round(time.perf_counter() - start, 3)
+        if returncode != 0 or not sources:
+            result['error'] = "Error cortando el video: " + ' | '.join(tail[-3:])
+            return result
+
+        # 2. Codificación en paralelo, con los núcleos repartidos entre segmentos
+        jobs, threads = plan_segment_concurrency(len(sources), self.cpu_count)
+        result.update(segments=len(sources), jobs=jobs, threads=threads)
+        if jobs == 1:
+            logger.warning(f"{os.path.basename(input_path)}: un solo núcleo disponible, "
+                           f"los {len(sources)} segmentos se codifican en serie")
+        logger.info(f"{os.path.basename(input_path)}: {len(sources)} segmentos, "
+                    f"{jobs} en paralelo con {threads or 'todos los'} hilos")
+
+        bounds = [0.0] + list(cuts) + [info['duration']]
+        seg_durations = [max(bounds[i + 1] - bounds[i], 0.001) for i in range(len(sources))]
+        encoded = [0.0] * len(sources)
+        lock = threading.Lock()
+        encode_start = time.perf_counter()
+
+        last_report = [0.0]
+
+        def report(index: int, snapshot: Dict):
+            now = time.perf_counter()
+            with lock:
+                encoded[index] = min(snapshot['out_time_seconds'] or 0.0, seg_durations[index])
+                done_seconds = sum(encoded)
+                # Cada segmento notifica por su cuenta: se limita el agregado
+                if not on_progress or now - last_report[0] < PROGRESS_INTERVAL:
+                    return
+                last_report[0] = now
+            elapsed = now - encode_start
+            speed = done_seconds / elapsed if elapsed > 0 else None
+            remaining = info['duration'] - done_seconds
+            on_progress({
+                'frame': None,
+                'fps': None,
+                'speed': round(speed, 3) if speed else None,
+                'out_time_seconds': round(done_seconds, 3),
+                'percent': round(min(99.9, 100.0 * done_seconds / info['duration']), 1),
+                'eta_seconds': round(max(0.0, remaining / speed), 1) if speed else None,
+                'done': False
+            })
+
+        def encode(index: int):
+            chunk = os.path.join(work_dir, f"encoded_{index:03d}.mkv")
+            cmd = build_ffmpeg_command(sources[index], chunk, preset, ffmpeg, threads,
+                                       audio=False, crf=crf)
+            tracker = FFmpegProgress(seg_durations[index], lambda snap: report(index, snap))
+            returncode, tail = run_ffmpeg(cmd, tracker)
+            return chunk, returncode, tail, tracker.last
+
+        chunks = [None] * len(sources)
+        errors = []
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(encode, index): index for index in range(len(sources))}
+            for future in as_completed(futures):
+                index = futures[future]
+                chunk, returncode, tail, last = future.result()
+                if returncode != 0 or not os.path.exists(chunk):
+                    errors.append(f"segmento {index}: " + ' | '.join(tail[-2:]))
+                chunks[index] = (chunk, last)
+        phases['encode_seconds'] = round(time.perf_counter() - encode_start, 3)
+        if errors:
+            result['error'] = "Error codificando segmentos: " + '; '.join(errors)
+            return result
+
+        # 3. Unión sin recodificar y audio del original en una sola pasada
+        concat_start = time.perf_counter()
+        list_path = os.path.join(work_dir, 'segments.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.writelines(_concat_list_line(chunk) for chunk, _ in chunks)
+        concat_cmd = [
+            ffmpeg, '-v', 'error',
+            '-f', 'concat', '-safe', '0', '-i', list_path,
+            '-i', input_path,
+            '-map', '0:v:0', '-map', '1:a:0?',
+            '-c:v', 'copy',
+            '-c:a', 'aac', '-b:a', '128k',
+            '-movflags', '+faststart',
+            '-y', output_path
+        ]
+        returncode, tail = run_ffmpeg(concat_cmd)
+        phases['concat_seconds'] = round(time.perf_counter() - concat_start, 3)
+        if returncode != 0 or not os.path.exists(output_path):
+            result['error'] = "Error uniendo los segmentos: " + ' | '.join(tail[-3:])
+            return result
+
+        encode_seconds = time.perf_counter() - start
+        result['success'] = True
+        result['encode_seconds'] = round(encode_seconds, 3)
+        result['output_size_bytes'] = os.path.getsize(output_path)
+        frames = sum((last or {}).get('frame') or 0 for _, last in chunks)
+        if frames:
+            result['frames'] = frames
+        fill_compression_stats(result, encode_seconds)
+        if on_progress:
+            on_progress({'frame': frames or None, 'fps': None, 'speed': result['speed'],
+                         'out_time_seconds': info['duration'], 'percent': 100.0,
+                         'eta_seconds': 0.0, 'done': True})
+        logger.info(f"Compresión por segmentos completada: {os.path.basename(output_path)} "
+                    f"en {encode_seconds:.1f}s (corte {phases['split_seconds']}s, "
+                    f"codificación {phases['encode_seconds']}s, unión {phases['concat_seconds']}s)")
+        return result
+
+    def _compare_single(self, result: Dict, input_path: str, preset: str, info: Optional[Dict],
+                        work_dir: str, wall_seconds: float, crf: Optional[int] = None):
+        """Codifica con un solo proceso y añade la aceleración al resultado"""
+        single_path = os.path.join(work_dir, 'single' + os.path.splitext(result['output_path'])[1])
+        single = self.engine.compress(input_path, output_path=single_path, preset=preset,
+                                      info=info, crf=crf)
+        if not single['success']:
+            logger.warning(f"No se pudo medir la ruta de un proceso: {single['error']}")
+            return
+        result['single_seconds'] = single['encode_seconds']
+        result['single_output_size_bytes'] = single['output_size_bytes']
+        result['speedup'] = round(single['encode_seconds'] / wall_seconds, 2) if wall_seconds > 0 else None
+        logger.info(f"Aceleración por segmentos: x{result['speedup']} "
+                    f"({single['encode_seconds']}s en un proceso frente a {wall_seconds:.1f}s)")
+
+def compress_video_segmented(input_path: str, output_dir: Optional[str] = None,
+                             preset: str = DEFAULT_PRESET, segments: Optional[int] = None) -> Dict:
+    """Función de conveniencia para comprimir un video por segmentos"""
+    encoder = SegmentedEncoder()
+    return encoder.compress(input_path, output_dir=output_dir, preset=preset, segments=segments)